@@ -7,23 +7,292 @@ Handles all database operations including:
 """
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, HAVE_CEXT, errorcode
 import aiomysql
-from typing import Optional, List, Dict, Any
+try:
+    # Optional Cython async driver, enabled with DB_ASYNC_DRIVER=asyncmy
+    import asyncmy
+    import asyncmy.errors
+except ImportError:
+    asyncmy = None
+from typing import Optional, List, Dict, Tuple, NamedTuple
 from datetime import datetime
+from contextlib import contextmanager
+import functools
 import logging
+import time
 import asyncio
-from bot.utils.config import get_database_config
+from bot.utils.config import Config, get_database_config
+from bot.utils.cache import KeyedLock, TTLCache, cached
+from bot.utils.helpers import escape_markdown_safe
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+def _markdown_or_none(text: Optional[str]) -> Optional[str]:
+    """Markdown-escaped copy of a display string stored next to the raw value"""
+    return None if text is None else escape_markdown_safe(text)
+
+
+def _name_has_username(name: Optional[str], username: Optional[str]) -> bool:
+    """Whether the stored name already shows the username (e.g. 'Qwerty (@s3s3s)')"""
+    return bool(name and username and f"(@{username})" in name)
+
+
+# SQL counterpart of _name_has_username() for rows updated in place
+_NAME_HAS_USERNAME_SQL = "COALESCE(LOCATE(CONCAT('(@', moderator_username, ')'), moderator_name) > 0, FALSE)"
+
+# Client errors meaning the server connection is gone and a reconnect may help
+_CONNECTION_LOST_ERRNOS = {errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST}
+
+# Async driver errors for a dead pooled connection; the pool discards such connections
+_ASYNC_OPERATIONAL_ERRORS = (aiomysql.OperationalError,) + (
+    (asyncmy.errors.OperationalError,) if asyncmy is not None else ()
+)
+_ASYNC_RETRY_DELAY = 0.1  # Seconds before retrying on a fresh pooled connection
+
+
+class ChatRow(NamedTuple):
+    """Chat administered by a user"""
+    chat_id: int
+    chat_title: Optional[str]
+    chat_type: Optional[str]
+    added_date: datetime
+    display_title: str  # Button label: title (or "Chat <id>") cut to 50 characters
+
+
+class ChatSettings(NamedTuple):
+    """Per-chat settings used by the edit handler and the settings menu"""
+    delete_enabled: bool
+    max_edit_time: int
+    channel_id: Optional[int]
+
+
+class ChatSettingsBundle(NamedTuple):
+    """Everything the settings menu shows for one chat and user"""
+    delete_enabled: bool
+    max_edit_time: int
+    channel_id: Optional[int]
+    role: Optional[str]  # 'admin', 'mod' or None
+    moderator_count: int  # Only counted for admins, 0 otherwise
+
+
+class ModeratorRow(NamedTuple):
+    """Active moderator of a chat"""
+    moderator_user_id: int
+    moderator_username: Optional[str]
+    moderator_name: Optional[str]
+    added_by_user_id: int
+    added_date: datetime
+    moderator_username_md: Optional[str]  # Markdown-escaped copies, filled at write time
+    moderator_name_md: Optional[str]
+    name_contains_username: bool  # moderator_name already contains "(@username)"
+
+
+class ModeratedChatRow(NamedTuple):
+    """Chat where a user is a moderator"""
+    chat_id: int
+    chat_title: Optional[str]
+    moderator_username: Optional[str]
+    moderator_name: Optional[str]
+    added_date: datetime
+    name_contains_username: bool
+    moderator_username_md: Optional[str]  # Markdown-escaped copies, filled at write time
+    moderator_name_md: Optional[str]
+
+
+class _ConnectionLost(Exception):
+    """Raised by _cursor() when the sync connection dropped (not a mysql.connector.Error on purpose,
+    so the methods' own `except Error` handlers let it through to _reconnect_once)"""
+
+    def __init__(self, error: Error):
+        super().__init__(str(error))
+        self.error = error
+
+
+def _reconnect_once(method):
+    """Reconnect and retry a sync database method once if the connection was lost"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except _ConnectionLost as e:
+            logger.warning("Database connection lost (%s), reconnecting", e)
+            self.connect()
+            # On the retry errors are handled by the method itself as usual
+            self._retrying = True
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._retrying = False
+    return wrapper
+
+
+def _retry_async_once(method):
+    """Retry an async pool read once, after a short delay, if its connection was dead.
+
+    Only for SELECTs: a write may have committed before the connection dropped, and
+    running it again would apply it twice.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        except _ASYNC_OPERATIONAL_ERRORS as e:
+            logger.warning("Pooled database connection failed (%s), retrying", e)
+            await asyncio.sleep(_ASYNC_RETRY_DELAY)
+            return await method(self, *args, **kwargs)
+    return wrapper
+
 
 class DatabaseManager:
     """Database manager class for handling all database operations"""
 
+    # Bump whenever create_tables() gains new DDL or migrations
+    CURRENT_SCHEMA_VERSION = 5
+
+    # Columns added after the initial schema: table -> [(column, definition)]
+    MIGRATED_COLUMNS = {
+        'bot_chats': [
+            ('delete_messages_enabled', 'BOOLEAN DEFAULT TRUE'),
+            ('max_edit_time_minutes', 'INT DEFAULT 20'),
+        ],
+        'chat_moderators': [
+            ('moderator_username', 'VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'),
+            ('moderator_name', 'VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'),
+            # Denormalized copies of bot_chats.chat_title / is_active (kept in sync by the app)
+            ('chat_title_cache', 'VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'),
+            ('chat_active_cache', 'BOOLEAN DEFAULT TRUE'),
+            # Markdown-escaped display strings (escaping can double the length)
+            ('moderator_username_md', 'VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'),
+            ('moderator_name_md', 'VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'),
+            ('name_contains_username', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+        ],
+    }
+
+    # Indexes added after the initial schema: table -> [(index, columns)]
+    MIGRATED_INDEXES = {
+        'bot_chats': [
+            # Covers the per-chat settings and admin lookups (index-only scans)
+            ('idx_chat_active', '(chat_id, is_active, delete_messages_enabled, max_edit_time_minutes, admin_user_id)'),
+        ],
+        'chat_moderators': [
+            # Single-table lookup of the chats a user moderates
+            ('idx_mod_user_active', '(moderator_user_id, is_active, chat_active_cache)'),
+        ],
+    }
+
+    # Redundant indexes removed from the schema: table -> [index]
+    # (idx_chat_id duplicates the UNIQUE key or is its leftmost prefix;
+    # idx_moderator_user_id is the leftmost prefix of idx_mod_user_active)
+    DROPPED_INDEXES = {
+        'bot_chats': ['idx_chat_id'],
+        'chat_channel_bindings': ['idx_chat_id'],
+        'chat_moderators': ['idx_chat_id', 'idx_moderator_user_id'],
+    }
+
+    # Hot read queries executed on (almost) every update or menu render; the sync methods
+    # run them through server-side prepared cursors (aiomysql has no prepare API, so the
+    # async methods send the same text)
+    HOT_QUERIES = {
+        'is_chat_admin': """
+            SELECT 1 FROM bot_chats
+            WHERE chat_id = %s AND admin_user_id = %s AND is_active = TRUE
+        """,
+        # Always returns one row; settings are NULL for unknown chats, channel_id when unbound
+        'chat_settings': """
+            SELECT bc.delete_messages_enabled, bc.max_edit_time_minutes, ccb.channel_id
+            FROM (SELECT %s AS chat_id) k
+            LEFT JOIN bot_chats bc ON bc.chat_id = k.chat_id AND bc.is_active = TRUE
+            LEFT JOIN chat_channel_bindings ccb ON ccb.chat_id = k.chat_id AND ccb.is_active = TRUE
+            LIMIT 1
+        """,
+        'delete_messages_setting': """
+            SELECT delete_messages_enabled
+            FROM bot_chats
+            WHERE chat_id = %s AND is_active = TRUE
+        """,
+        'max_edit_time_setting': """
+            SELECT max_edit_time_minutes
+            FROM bot_chats
+            WHERE chat_id = %s AND is_active = TRUE
+        """,
+        'is_moderator': """
+            SELECT 1 FROM chat_moderators
+            WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE
+        """,
+        'user_chats': """
+            SELECT chat_id, chat_title, chat_type, added_date,
+                   CASE
+                       WHEN CHAR_LENGTH(chat_title) > 50 THEN CONCAT(LEFT(chat_title, 50), '…')
+                       ELSE COALESCE(NULLIF(chat_title, ''), CONCAT('Chat ', chat_id))
+                   END AS display_title
+            FROM bot_chats
+            WHERE admin_user_id = %s AND is_active = TRUE
+            ORDER BY added_date DESC
+        """,
+        'chat_moderators': """
+            SELECT moderator_user_id, moderator_username, moderator_name, added_by_user_id, added_date,
+                   moderator_username_md, moderator_name_md, name_contains_username
+            FROM chat_moderators
+            WHERE chat_id = %s AND is_active = TRUE
+            ORDER BY added_date DESC
+        """,
+        'user_moderated_chats': """
+            SELECT chat_id, chat_title_cache AS chat_title, moderator_username, moderator_name, added_date,
+                   name_contains_username, moderator_username_md, moderator_name_md
+            FROM chat_moderators
+            WHERE moderator_user_id = %s AND is_active = TRUE AND chat_active_cache = TRUE
+            ORDER BY added_date DESC
+        """,
+        # Admin takes precedence over moderator when a user is both
+        'permission': """
+            (SELECT 'admin' AS role, 0 AS priority FROM bot_chats
+             WHERE chat_id = %s AND admin_user_id = %s AND is_active = TRUE LIMIT 1)
+            UNION ALL
+            (SELECT 'mod' AS role, 1 AS priority FROM chat_moderators
+             WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE LIMIT 1)
+            ORDER BY priority
+            LIMIT 1
+        """,
+        # Role plus the moderator count shown to admins in the settings menu
+        'role_and_moderator_count': """
+            SELECT
+                CASE
+                    WHEN EXISTS (SELECT 1 FROM bot_chats
+                                 WHERE chat_id = %s AND admin_user_id = %s AND is_active = TRUE) THEN 'admin'
+                    WHEN EXISTS (SELECT 1 FROM chat_moderators
+                                 WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE) THEN 'mod'
+                END,
+                (SELECT COUNT(*) FROM chat_moderators WHERE chat_id = %s AND is_active = TRUE)
+        """,
+    }
+
     def __init__(self):
         self.connection = None  # For synchronous operations (migrations, etc.)
         self.pool = None  # For asynchronous operations
+        self._pool_lock = asyncio.Lock()  # One pool even when first uses race
+        self._closed = False  # Set by close_async; the pool is never recreated after that
+        self._ping_task: Optional[asyncio.Task] = None  # Keep-alive task for the async pool
+        self._prepared_cursors = {}  # Server-side prepared statements by query name
+        self._retrying = False  # Set by _reconnect_once while retrying after a reconnect
+        # Write-through settings of every known chat, loaded at startup: chat_id -> ChatSettings
+        self._chat_settings: Dict[int, ChatSettings] = {}
+        self._chat_locks = KeyedLock()  # Serialize settings loads/writes per chat
+        # Bumped by every settings write, so a load that overlapped one does not store stale settings
+        self._settings_generation = 0
+        # Hot per-user reads: ('role'|'moderator', chat_id, user_id)
+        self._settings_cache = TTLCache(maxsize=10_000, ttl=30)
+        # Active chats per admin: admin_user_id -> tuple of ChatRow
+        self._user_chats_cache = TTLCache(maxsize=10_000, ttl=60)
+        # Chats per moderator: moderator_user_id -> tuple of ModeratedChatRow
+        self._moderated_chats_cache = TTLCache(maxsize=10_000, ttl=60)
+        # Hot async lookups with their SQL bound once: await self._q_settings(chat_id) -> row or None
+        self._q_permission = functools.partial(self._exec_one, self.HOT_QUERIES['permission'])
+        self._q_settings = functools.partial(self._exec_one, self.HOT_QUERIES['chat_settings'])
+        self._q_moderator = functools.partial(self._exec_one, self.HOT_QUERIES['is_moderator'])
         self.connect()
         self.create_tables()
     
@@ -31,10 +300,20 @@ class DatabaseManager:
         """Establish database connection"""
         try:
             config = get_database_config()
+            # Use the C extension (libmysqlclient binding) instead of the pure-Python protocol
+            config['use_pure'] = not HAVE_CEXT
+            # Every statement commits on its own - no explicit commit() round-trips
+            config['autocommit'] = True
+            if self.connection is not None:
+                try:
+                    self.connection.close()
+                except Error:
+                    pass
             self.connection = mysql.connector.connect(**config)
+            self._prepared_cursors = {}
             logger.info("Database connection established")
         except Error as e:
-            logger.error(f"Error connecting to database: {e}")
+            logger.error("Error connecting to database: %s", e)
             raise
     
     async def create_async_pool(self):
@@ -48,222 +327,506 @@ class DatabaseManager:
                 'user': config['user'],
                 'password': config['password'],
                 'db': config['database'],  # aiomysql uses 'db' instead of 'database'
-                'minsize': 5,  # Minimum connections in pool
-                'maxsize': 20,  # Maximum connections in pool
+                'minsize': Config.DB_POOL_MINSIZE,  # Minimum connections in pool
+                'maxsize': Config.DB_POOL_MAXSIZE,  # Maximum connections in pool
                 'charset': 'utf8mb4',
                 'autocommit': True,
-                'use_unicode': True
+                # Readers never wait on writers, and INSERT ... SELECT reads bot_chats without
+                # taking the shared next-key locks REPEATABLE READ would need
+                'init_command': "SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED",
+                'pool_recycle': 1800,  # Replace connections well before MySQL's wait_timeout drops them
+                'connect_timeout': 5,
+                'echo': False
             }
 
-            self.pool = await aiomysql.create_pool(**async_config)
-            logger.info("Asynchronous database connection pool created")
+            if Config.DB_ASYNC_DRIVER == 'asyncmy':
+                if asyncmy is None:
+                    raise RuntimeError("DB_ASYNC_DRIVER=asyncmy but asyncmy is not installed")
+                # asyncmy takes the same options, except 'database' instead of 'db'
+                async_config['database'] = async_config.pop('db')
+                self.pool = await asyncmy.create_pool(**async_config)
+            else:
+                self.pool = await aiomysql.create_pool(**async_config)
+            logger.info("Asynchronous database connection pool created (%s)", Config.DB_ASYNC_DRIVER)
+
+            if self._ping_task is None or self._ping_task.done():
+                self._ping_task = asyncio.create_task(self._ping_pool())
         except Exception as e:
-            logger.error(f"Error creating async database pool: {e}")
+            logger.error("Error creating async database pool: %s", e)
             raise
 
+    async def _ping_pool(self, interval: float = 300) -> None:
+        """Periodically run SELECT 1 on a pooled connection to keep the pool warm"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._exec_one("SELECT 1")
+            except Exception as e:
+                logger.warning("Database pool ping failed: %s", e)
+
+    def stop_pool_ping(self) -> None:
+        """Stop the keep-alive ping task (before closing the pool)"""
+        if self._ping_task is not None:
+            self._ping_task.cancel()
+            self._ping_task = None
+
+    async def _get_pool(self):
+        """Return the shared async connection pool, creating it on first use"""
+        if not self.pool:
+            async with self._pool_lock:
+                if self._closed:
+                    raise RuntimeError("Database is closed")
+                # Another caller may have created the pool meanwhile
+                if not self.pool:
+                    await self.create_async_pool()
+        return self.pool
+
+    @contextmanager
+    def _cursor(self, prepared: Optional[str] = None):
+        """Yield a sync cursor and close it afterwards (cached prepared cursors stay open)"""
+        cursor = None
+        try:
+            if prepared:
+                cursor = self._prepared_cursor(prepared)
+            else:
+                cursor = self.connection.cursor()
+            yield cursor
+        except Error as e:
+            lost = isinstance(e, InterfaceError) or e.errno in _CONNECTION_LOST_ERRNOS
+            if lost and not self._retrying:
+                raise _ConnectionLost(e) from e
+            raise
+        finally:
+            if cursor is not None and not prepared:
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+
+    def _prepared_cursor(self, name: str):
+        """Return a cached prepared cursor for a hot query (prepared once per connection)"""
+        cursor = self._prepared_cursors.get(name)
+        if cursor is None:
+            cursor = self.connection.cursor(prepared=True)
+            self._prepared_cursors[name] = cursor
+        return cursor
+
+    @_retry_async_once
+    async def _exec_one(self, sql: str, *args) -> Optional[tuple]:
+        """Run a query on the async pool and return its first row"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, args)
+                return await cursor.fetchone()
+
+    async def _exec_write(self, sql: str, *args) -> int:
+        """Run a data-modifying statement on the async pool and return the affected row count (never retried)"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, args)
+                return cursor.rowcount
+
+    @_retry_async_once
+    async def _exec_all(self, sql: str, *args) -> List[tuple]:
+        """Run a query on the async pool and return all rows"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, args)
+                return await cursor.fetchall()
+
+    def _invalidate_chat(self, chat_id: int) -> None:
+        """Drop every cached entry belonging to a chat"""
+        self._drop_settings(chat_id)
+        self._settings_cache.discard_where(lambda key, _: key[1] == chat_id)
+
+    def _discard_moderated_chat(self, chat_id: int) -> None:
+        """Drop cached moderated-chat lists that show a deactivated chat"""
+        self._moderated_chats_cache.discard_where(
+            lambda _, chats: any(chat.chat_id == chat_id for chat in chats)
+        )
+
+    def _drop_settings(self, *chat_ids: int) -> None:
+        """Forget the in-memory settings of chats after a write"""
+        self._settings_generation += 1
+        for chat_id in chat_ids:
+            self._chat_settings.pop(chat_id, None)
+
+    def _write_through_settings(self, chat_id: int, updated: bool, **changes) -> None:
+        """Apply a settings UPDATE to the in-memory copy (or drop it if no row changed)"""
+        self._settings_generation += 1
+        current = self._chat_settings.get(chat_id)
+        if current is None:
+            return
+        if updated:
+            self._chat_settings[chat_id] = current._replace(**changes)
+        else:
+            self._chat_settings.pop(chat_id, None)
+
+    @staticmethod
+    def _settings_from_row(row: Optional[tuple]) -> ChatSettings:
+        """Build ChatSettings from (delete_enabled, max_edit_time, channel_id), applying defaults"""
+        delete_enabled, max_edit_time, channel_id = row if row is not None else (None, None, None)
+        # Default to deletion enabled and 20 minutes if not found
+        return ChatSettings(
+            bool(delete_enabled) if delete_enabled is not None else True,
+            max_edit_time if max_edit_time is not None else 20,
+            channel_id
+        )
+
+    def _load_existing_columns(self) -> Dict[str, set]:
+        """Load existing columns of migrated tables with a single metadata query"""
+        columns = {table_name: set() for table_name in self.MIGRATED_COLUMNS}
+        with self._cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.execute(f"""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME IN ({placeholders})
+            """, tuple(columns))
+            for table_name, column_name in cursor.fetchall():
+                columns[table_name].add(column_name)
+            return columns
+
+    def _load_existing_indexes(self) -> Dict[str, set]:
+        """Load existing index names of migrated tables with a single metadata query"""
+        indexes = {table_name: set() for table_name in [*self.MIGRATED_INDEXES, *self.DROPPED_INDEXES]}
+        with self._cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(indexes))
+            cursor.execute(f"""
+                SELECT DISTINCT TABLE_NAME, INDEX_NAME
+                FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME IN ({placeholders})
+            """, tuple(indexes))
+            for table_name, index_name in cursor.fetchall():
+                indexes[table_name].add(index_name)
+            return indexes
+
+    @staticmethod
+    def _moderator_chat_cache_update(chat_ids: Optional[List[int]] = None) -> Tuple[str, Tuple]:
+        """Build the UPDATE copying chat title and status from bot_chats into chat_moderators"""
+        query = """
+            UPDATE chat_moderators cm
+            JOIN bot_chats bc ON cm.chat_id = bc.chat_id
+            SET cm.chat_title_cache = bc.chat_title,
+                cm.chat_active_cache = bc.is_active
+        """
+        params: Tuple = ()
+        if chat_ids is not None:
+            query += f" WHERE cm.chat_id IN ({', '.join(['%s'] * len(chat_ids))})"
+            params = tuple(chat_ids)
+        return query, params
+
+    def _refresh_moderator_chat_cache(self, cursor, chat_ids: Optional[List[int]] = None) -> None:
+        """Copy chat title and status from bot_chats into chat_moderators (all chats if chat_ids is None)"""
+        cursor.execute(*self._moderator_chat_cache_update(chat_ids))
+
+    def _get_schema_version(self) -> int:
+        """Read the applied schema version (0 if the schema was never versioned)"""
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT version FROM schema_meta WHERE id = 1")
+                row = cursor.fetchone()
+                return row[0] if row else 0
+        except Error as e:
+            if e.errno == errorcode.ER_NO_SUCH_TABLE:
+                return 0
+            raise
+
+    def _is_migration_applied(self, name: str) -> bool:
+        """Check if a one-off data migration has already been applied"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT 1 FROM bot_migrations WHERE name = %s", (name,))
+            return cursor.fetchone() is not None
+
+    def _mark_migration_applied(self, name: str) -> None:
+        """Persist that a one-off data migration has been applied"""
+        with self._cursor() as cursor:
+            cursor.execute("INSERT IGNORE INTO bot_migrations (name) VALUES (%s)", (name,))
+
+    @_reconnect_once
     def create_tables(self) -> None:
         """Create all necessary tables"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Table for storing chats where bot is admin
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS bot_chats (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    chat_id BIGINT UNIQUE NOT NULL,
-                    chat_title VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
-                    chat_type VARCHAR(50),
-                    admin_user_id BIGINT NOT NULL,
-                    added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    delete_messages_enabled BOOLEAN DEFAULT TRUE,
-                    INDEX idx_chat_id (chat_id),
-                    INDEX idx_admin_user_id (admin_user_id)
-                ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-            """)
-            
-            # Table for chat-channel bindings
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_channel_bindings (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    chat_id BIGINT NOT NULL,
-                    channel_id BIGINT NOT NULL,
-                    admin_user_id BIGINT NOT NULL,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    UNIQUE KEY unique_chat_channel (chat_id, channel_id),
-                    INDEX idx_chat_id (chat_id),
-                    INDEX idx_channel_id (channel_id),
-                    INDEX idx_admin_user_id (admin_user_id)
-                ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-            """)
+            # Up-to-date schema: skip all DDL and migration checks
+            schema_version = self._get_schema_version()
+            if schema_version == self.CURRENT_SCHEMA_VERSION:
+                logger.info("Database schema is up to date (version %s)", schema_version)
+                return
+
+            with self._cursor() as cursor:
+                # Table for storing chats where bot is admin
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS bot_chats (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        chat_id BIGINT UNIQUE NOT NULL,
+                        chat_title VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+                        chat_type VARCHAR(50),
+                        admin_user_id BIGINT NOT NULL,
+                        added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        is_active BOOLEAN DEFAULT TRUE,
+                        delete_messages_enabled BOOLEAN DEFAULT TRUE,
+                        INDEX idx_admin_user_id (admin_user_id)
+                    ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+                """)
             
-            # Add delete_messages_enabled column if it doesn't exist (migration)
-            try:
+                # Table for chat-channel bindings
                 cursor.execute("""
-                    ALTER TABLE bot_chats
-                    ADD COLUMN delete_messages_enabled BOOLEAN DEFAULT TRUE
+                    CREATE TABLE IF NOT EXISTS chat_channel_bindings (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        chat_id BIGINT NOT NULL,
+                        channel_id BIGINT NOT NULL,
+                        admin_user_id BIGINT NOT NULL,
+                        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        is_active BOOLEAN DEFAULT TRUE,
+                        UNIQUE KEY unique_chat_channel (chat_id, channel_id),
+                        INDEX idx_channel_id (channel_id),
+                        INDEX idx_admin_user_id (admin_user_id)
+                    ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
                 """)
-                self.connection.commit()
-                logger.info("Migration: added delete_messages_enabled column")
-            except Error as e:
-                if "Duplicate column name" in str(e):
-                    logger.info("Migration: delete_messages_enabled column already exists")
-                else:
-                    logger.warning(f"Migration warning for delete_messages_enabled: {e}")
-
-            # Add max_edit_time_minutes column if it doesn't exist (migration)
-            try:
+            
+                # Table for chat moderators
                 cursor.execute("""
-                    ALTER TABLE bot_chats
-                    ADD COLUMN max_edit_time_minutes INT DEFAULT 20
+                    CREATE TABLE IF NOT EXISTS chat_moderators (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        chat_id BIGINT NOT NULL,
+                        moderator_user_id BIGINT NOT NULL,
+                        moderator_username VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+                        moderator_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+                        moderator_username_md VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+                        moderator_name_md VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+                        name_contains_username BOOLEAN NOT NULL DEFAULT FALSE,
+                        added_by_user_id BIGINT NOT NULL,
+                        added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        is_active BOOLEAN DEFAULT TRUE,
+                        UNIQUE KEY unique_chat_moderator (chat_id, moderator_user_id),
+                        INDEX idx_added_by_user_id (added_by_user_id),
+                        FOREIGN KEY (chat_id) REFERENCES bot_chats(chat_id) ON DELETE CASCADE
+                    ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
                 """)
-                self.connection.commit()
-                logger.info("Migration: added max_edit_time_minutes column")
-            except Error as e:
-                if "Duplicate column name" in str(e):
-                    logger.info("Migration: max_edit_time_minutes column already exists")
-                else:
-                    logger.warning(f"Migration warning for max_edit_time_minutes: {e}")
-
-            # Table for chat moderators
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_moderators (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    chat_id BIGINT NOT NULL,
-                    moderator_user_id BIGINT NOT NULL,
-                    moderator_username VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
-                    moderator_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
-                    added_by_user_id BIGINT NOT NULL,
-                    added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    UNIQUE KEY unique_chat_moderator (chat_id, moderator_user_id),
-                    INDEX idx_chat_id (chat_id),
-                    INDEX idx_moderator_user_id (moderator_user_id),
-                    INDEX idx_added_by_user_id (added_by_user_id),
-                    FOREIGN KEY (chat_id) REFERENCES bot_chats(chat_id) ON DELETE CASCADE
-                ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-            """)
 
-            # Add moderator_username and moderator_name columns if they don't exist (migration)
-            try:
+                # Table holding the applied schema version (single row)
                 cursor.execute("""
-                    ALTER TABLE chat_moderators
-                    ADD COLUMN moderator_username VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+                    CREATE TABLE IF NOT EXISTS schema_meta (
+                        id TINYINT PRIMARY KEY DEFAULT 1,
+                        version INT NOT NULL
+                    ) ENGINE=InnoDB
                 """)
-                self.connection.commit()
-                logger.info("Migration: added moderator_username column")
-            except Error as e:
-                if "Duplicate column name" in str(e):
-                    logger.info("Migration: moderator_username column already exists")
-                else:
-                    logger.warning(f"Migration warning for moderator_username: {e}")
 
-            try:
+                # Table for tracking one-off data migrations
                 cursor.execute("""
-                    ALTER TABLE chat_moderators
-                    ADD COLUMN moderator_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+                    CREATE TABLE IF NOT EXISTS bot_migrations (
+                        name VARCHAR(100) PRIMARY KEY,
+                        applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
                 """)
-                self.connection.commit()
-                logger.info("Migration: added moderator_name column")
-            except Error as e:
-                if "Duplicate column name" in str(e):
-                    logger.info("Migration: moderator_name column already exists")
-                else:
-                    logger.warning(f"Migration warning for moderator_name: {e}")
 
-            # Run migration for existing moderators
-            try:
-                self.migrate_moderator_info()
-            except Exception as e:
-                logger.warning(f"Migration warning for moderator info: {e}")
+                # Add missing columns (migration) - existing columns are loaded in one query
+                # and all missing columns of a table are added with a single ALTER TABLE
+                existing_columns = self._load_existing_columns()
+                for table_name, table_columns in self.MIGRATED_COLUMNS.items():
+                    missing = [
+                        (column_name, definition)
+                        for column_name, definition in table_columns
+                        if column_name not in existing_columns[table_name]
+                    ]
+                    if not missing:
+                        continue
+
+                    add_clauses = ", ".join(
+                        f"ADD COLUMN {column_name} {definition}" for column_name, definition in missing
+                    )
+                    cursor.execute(f"ALTER TABLE {table_name} {add_clauses}")
+                    logger.info("Migration: added %s column(s) to %s", ', '.join(name for name, _ in missing), table_name)
 
-            self.connection.commit()
-            logger.info("Database tables created successfully")
+                # Add missing indexes (migration) - one ALTER TABLE per table
+                existing_indexes = self._load_existing_indexes()
+                for table_name, table_indexes in self.MIGRATED_INDEXES.items():
+                    missing = [
+                        (index_name, columns)
+                        for index_name, columns in table_indexes
+                        if index_name not in existing_indexes[table_name]
+                    ]
+                    if not missing:
+                        continue
+
+                    add_clauses = ", ".join(
+                        f"ADD INDEX {index_name} {columns}" for index_name, columns in missing
+                    )
+                    cursor.execute(f"ALTER TABLE {table_name} {add_clauses}")
+                    logger.info("Migration: added %s index(es) to %s", ', '.join(name for name, _ in missing), table_name)
+
+                # Drop redundant indexes still present on older databases
+                for table_name, index_names in self.DROPPED_INDEXES.items():
+                    present = [name for name in index_names if name in existing_indexes[table_name]]
+                    if not present:
+                        continue
+
+                    drop_clauses = ", ".join(f"DROP INDEX {index_name}" for index_name in present)
+                    cursor.execute(f"ALTER TABLE {table_name} {drop_clauses}")
+                    logger.info("Migration: dropped %s index(es) from %s", ', '.join(present), table_name)
+
+                # Run migration for existing moderators (only once)
+                if not self._is_migration_applied('moderator_info'):
+                    try:
+                        if self.migrate_moderator_info():
+                            self._mark_migration_applied('moderator_info')
+                    except Exception as e:
+                        logger.warning("Migration warning for moderator info: %s", e)
+
+                # Backfill the pre-escaped moderator display strings (only once)
+                if not self._is_migration_applied('moderator_md'):
+                    try:
+                        if self.migrate_moderator_markdown():
+                            self._mark_migration_applied('moderator_md')
+                    except Exception as e:
+                        logger.warning("Migration warning for moderator markdown: %s", e)
+
+                # Flag names that already show the username (only once)
+                if not self._is_migration_applied('moderator_name_username'):
+                    cursor.execute(f"UPDATE chat_moderators SET name_contains_username = {_NAME_HAS_USERNAME_SQL}")
+                    self._mark_migration_applied('moderator_name_username')
+
+                # Backfill the denormalized chat title/status on moderators (only once)
+                if not self._is_migration_applied('moderator_chat_cache'):
+                    self._refresh_moderator_chat_cache(cursor)
+                    self._mark_migration_applied('moderator_chat_cache')
+
+                cursor.execute(
+                    "INSERT INTO schema_meta (id, version) VALUES (1, %s) ON DUPLICATE KEY UPDATE version = VALUES(version)",
+                    (self.CURRENT_SCHEMA_VERSION,)
+                )
+                logger.info("Database tables created successfully (schema version %s -> %s)", schema_version, self.CURRENT_SCHEMA_VERSION)
             
         except Error as e:
-            logger.error(f"Error creating tables: {e}")
+            logger.error("Error creating tables: %s", e)
             raise
-        finally:
-            cursor.close()
     
+    @_reconnect_once
     def add_chat(self, chat_id: int, chat_title: str, chat_type: str, admin_user_id: int) -> bool:
         """Add a new chat where bot is admin (only for groups and supergroups)"""
         try:
             # Explicitly reject channels - they should only be managed via chat_channel_bindings
             if chat_type.lower() == 'channel':
-                logger.warning(f"Attempted to add channel {chat_id} to bot_chats table - channels are not allowed")
+                logger.warning("Attempted to add channel %s to bot_chats table - channels are not allowed", chat_id)
                 return False
                 
-            cursor = self.connection.cursor()
-            query = """
+            with self._cursor() as cursor:
+                query = """
+                    INSERT INTO bot_chats (chat_id, chat_title, chat_type, admin_user_id)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    chat_title = VALUES(chat_title),
+                    is_active = TRUE
+                """
+                cursor.execute(query, (chat_id, chat_title, chat_type, admin_user_id))
+                cursor.execute(
+                    "UPDATE chat_moderators SET chat_title_cache = %s, chat_active_cache = TRUE WHERE chat_id = %s",
+                    (chat_title, chat_id)
+                )
+                self._invalidate_chat(chat_id)
+                self._user_chats_cache.pop(('user_chats', admin_user_id))
+                # A re-added chat is missing from its moderators' cached lists, so drop them all
+                self._moderated_chats_cache.clear()
+                logger.info("Chat %s (%s) added/updated for admin %s", chat_id, chat_type, admin_user_id)
+                return True
+            
+        except Error as e:
+            logger.error("Error adding chat: %s", e)
+            return False
+
+    async def add_chat_async(self, chat_id: int, chat_title: str, chat_type: str, admin_user_id: int) -> bool:
+        """Add a new chat where bot is admin (asynchronous version)"""
+        if chat_type.lower() == 'channel':
+            logger.warning("Attempted to add channel %s to bot_chats table - channels are not allowed", chat_id)
+            return False
+        try:
+            await self._exec_write("""
                 INSERT INTO bot_chats (chat_id, chat_title, chat_type, admin_user_id)
                 VALUES (%s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                 chat_title = VALUES(chat_title),
                 is_active = TRUE
-            """
-            cursor.execute(query, (chat_id, chat_title, chat_type, admin_user_id))
-            self.connection.commit()
-            logger.info(f"Chat {chat_id} ({chat_type}) added/updated for admin {admin_user_id}")
+            """, chat_id, chat_title, chat_type, admin_user_id)
+            await self._exec_write(
+                "UPDATE chat_moderators SET chat_title_cache = %s, chat_active_cache = TRUE WHERE chat_id = %s",
+                chat_title, chat_id
+            )
+            self._invalidate_chat(chat_id)
+            self._user_chats_cache.pop(('user_chats', admin_user_id))
+            # A re-added chat is missing from its moderators' cached lists, so drop them all
+            self._moderated_chats_cache.clear()
+            logger.info("Chat %s (%s) added/updated for admin %s", chat_id, chat_type, admin_user_id)
             return True
-            
-        except Error as e:
-            logger.error(f"Error adding chat: {e}")
+        except Exception as e:
+            logger.error("Error adding chat: %s", e)
             return False
-        finally:
-            cursor.close()
-    
-    def get_user_chats(self, admin_user_id: int) -> List[Dict[str, Any]]:
-        """Get all active chats for a specific admin user"""
+
+    async def chat_exists_async(self, chat_id: int) -> bool:
+        """Check if a chat was ever added, active or not"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT chat_id, chat_title, chat_type, added_date
-                FROM bot_chats
-                WHERE admin_user_id = %s AND is_active = TRUE
-                ORDER BY added_date DESC
-            """
-            cursor.execute(query, (admin_user_id,))
-            chats = cursor.fetchall()
-            return chats
-            
-        except Error as e:
-            logger.error(f"Error getting user chats: {e}")
-            return []
-        finally:
-            cursor.close()
+            return await self._exec_one("SELECT 1 FROM bot_chats WHERE chat_id = %s LIMIT 1", chat_id) is not None
+        except Exception as e:
+            logger.error("Error checking chat %s: %s", chat_id, e)
+            return False
+
+    async def get_chat_admin_async(self, chat_id: int) -> Optional[int]:
+        """Get the admin user of an active chat, None if the chat is not active"""
+        try:
+            row = await self._exec_one(
+                "SELECT admin_user_id FROM bot_chats WHERE chat_id = %s AND is_active = TRUE LIMIT 1", chat_id
+            )
+            return row[0] if row else None
+        except Exception as e:
+            logger.error("Error getting admin of chat %s: %s", chat_id, e)
+            return None
     
+    @cached('_user_chats_cache', key=lambda admin_user_id: ('user_chats', admin_user_id))
+    async def _load_user_chats(self, admin_user_id: int) -> Tuple[ChatRow, ...]:
+        """Query the active chats of an admin user"""
+        cache = self._user_chats_cache
+        logger.debug("User chats cache miss for %s (hits=%s, misses=%s)", admin_user_id, cache.hits, cache.misses)
+        rows = await self._exec_all(self.HOT_QUERIES['user_chats'], admin_user_id)
+        return tuple(ChatRow(*row) for row in rows)
+
+    async def get_user_chats_async(self, admin_user_id: int) -> Tuple[ChatRow, ...]:
+        """Get all active chats for a specific admin user (asynchronous version, cached for 60s)"""
+        try:
+            return await self._load_user_chats(admin_user_id)
+        except Exception as e:
+            logger.error("Error getting user chats: %s", e)
+            return ()
+
+    @_reconnect_once
     def bind_chat_channel(self, chat_id: int, channel_id: int, admin_user_id: int) -> bool:
         """Bind a chat to a channel"""
         try:
-            cursor = self.connection.cursor()
-            query = """
-                INSERT INTO chat_channel_bindings (chat_id, channel_id, admin_user_id)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                is_active = TRUE,
-                created_date = CURRENT_TIMESTAMP
-            """
-            cursor.execute(query, (chat_id, channel_id, admin_user_id))
-            self.connection.commit()
-            logger.info(f"Chat {chat_id} bound to channel {channel_id}")
-            return True
+            with self._cursor() as cursor:
+                query = """
+                    INSERT INTO chat_channel_bindings (chat_id, channel_id, admin_user_id)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    is_active = TRUE,
+                    created_date = CURRENT_TIMESTAMP
+                """
+                cursor.execute(query, (chat_id, channel_id, admin_user_id))
+                self._drop_settings(chat_id)
+                logger.debug("Chat %s bound to channel %s", chat_id, channel_id)
+                return True
             
         except Error as e:
-            logger.error(f"Error binding chat to channel: {e}")
+            logger.error("Error binding chat to channel: %s", e)
             return False
-        finally:
-            cursor.close()
 
     async def bind_chat_channel_async(self, chat_id: int, channel_id: int, admin_user_id: int) -> bool:
         """Bind a chat to a channel (asynchronous version)"""
-        if not self.pool:
-            logger.error("Async pool not initialized")
-            return False
-
         try:
-            async with self.pool.acquire() as conn:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
                 async with conn.cursor() as cursor:
                     query = """
                         INSERT INTO chat_channel_bindings (chat_id, channel_id, admin_user_id)
@@ -273,246 +836,308 @@ class DatabaseManager:
                         created_date = CURRENT_TIMESTAMP
                     """
                     await cursor.execute(query, (chat_id, channel_id, admin_user_id))
-                    logger.info(f"Chat {chat_id} bound to channel {channel_id}")
+                    self._drop_settings(chat_id)
+                    logger.debug("Chat %s bound to channel %s", chat_id, channel_id)
                     return True
         except Exception as e:
-            logger.error(f"Error binding chat to channel: {e}")
+            logger.error("Error binding chat to channel: %s", e)
             return False
 
-    def get_chat_channel(self, chat_id: int) -> Optional[int]:
-        """Get bound channel for a chat"""
+    async def get_chat_channel_async(self, chat_id: int) -> Optional[int]:
+        """Get channel ID for a chat (asynchronous version)"""
+        return (await self.get_chat_settings_async(chat_id)).channel_id
+
+    @_reconnect_once
+    def is_chat_admin(self, chat_id: int, user_id: int) -> bool:
+        """Check if user is admin of the chat in bot's database"""
         try:
-            cursor = self.connection.cursor()
-            query = """
-                SELECT channel_id
-                FROM chat_channel_bindings
-                WHERE chat_id = %s AND is_active = TRUE
-                LIMIT 1
-            """
-            cursor.execute(query, (chat_id,))
-            result = cursor.fetchone()
-            return result[0] if result else None
-            
+            with self._cursor(prepared='is_chat_admin') as cursor:
+                cursor.execute(self.HOT_QUERIES['is_chat_admin'], (chat_id, user_id))
+                result = cursor.fetchall()
+                return len(result) > 0
+
         except Error as e:
-            logger.error(f"Error getting chat channel: {e}")
-            return None
-        finally:
-            cursor.close()
+            logger.error("Error checking chat admin: %s", e)
+            return False
 
-    async def get_chat_channel_async(self, chat_id: int) -> Optional[int]:
-        """Get channel ID for a chat (asynchronous version)"""
-        if not self.pool:
-            logger.error("Async pool not initialized")
+    async def check_permission_async(self, chat_id: int, user_id: int) -> Optional[str]:
+        """Get the user's role in the chat with one query: 'admin', 'mod' or None"""
+        try:
+            row = await self._settings_cache.get_or_load(
+                ('role', chat_id, user_id), self._q_permission, chat_id, user_id, chat_id, user_id
+            )
+            return row[0] if row else None
+        except Exception as e:
+            logger.error("Error checking permissions: %s", e)
             return None
 
+    async def _load_role_and_moderator_count(self, chat_id: int, user_id: int) -> Tuple[Optional[str], int]:
+        """Query the user's role and, for admins, the moderator count; a cached non-admin role needs no query"""
+        role_key = ('role', chat_id, user_id)
+        cached = self._settings_cache.get(role_key, _MISSING)
+        if cached is not _MISSING and (cached is None or cached[0] != 'admin'):
+            return (cached[0] if cached else None), 0
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    query = """
-                        SELECT channel_id
-                        FROM chat_channel_bindings
-                        WHERE chat_id = %s AND is_active = TRUE
-                        LIMIT 1
-                    """
-                    await cursor.execute(query, (chat_id,))
-                    result = await cursor.fetchone()
-                    return result[0] if result else None
+            role, moderator_count = await self._exec_one(
+                self.HOT_QUERIES['role_and_moderator_count'], chat_id, user_id, chat_id, user_id, chat_id
+            )
+            # Same shape as the 'permission' query row, so check_permission_async can reuse it
+            self._settings_cache[role_key] = (role,) if role else None
+            return role, moderator_count if role == 'admin' else 0
         except Exception as e:
-            logger.error(f"Error getting chat channel: {e}")
-            return None
+            logger.error("Error getting role and moderator count: %s", e)
+            return None, 0
 
-    def is_chat_admin(self, chat_id: int, user_id: int) -> bool:
-        """Check if user is admin of the chat in bot's database"""
+    async def get_chat_settings_bundle_async(self, chat_id: int, user_id: int) -> ChatSettingsBundle:
+        """Get the chat settings, the user's role and the moderator count for the settings menu"""
+        settings, (role, moderator_count) = await asyncio.gather(
+            self.get_chat_settings_async(chat_id),
+            self._load_role_and_moderator_count(chat_id, user_id)
+        )
+        return ChatSettingsBundle(*settings, role, moderator_count)
+
+    async def is_chat_admin_async(self, chat_id: int, user_id: int) -> bool:
+        """Check if user is admin of the chat in bot's database (asynchronous version)"""
+        return await self.check_permission_async(chat_id, user_id) == 'admin'
+
+    @_reconnect_once
+    def deactivate_chat(self, chat_id: int) -> bool:
+        """Deactivate a chat (when bot is removed)"""
         try:
-            cursor = self.connection.cursor()
-            query = """
-                SELECT 1 FROM bot_chats
-                WHERE chat_id = %s AND admin_user_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (chat_id, user_id))
-            result = cursor.fetchone()
-            return result is not None
+            with self._cursor() as cursor:
+                query = "UPDATE bot_chats SET is_active = FALSE WHERE chat_id = %s"
+                cursor.execute(query, (chat_id,))
+                cursor.execute("UPDATE chat_moderators SET chat_active_cache = FALSE WHERE chat_id = %s", (chat_id,))
+                self._invalidate_chat(chat_id)
+                self._user_chats_cache.discard_where(
+                    lambda _, chats: any(chat.chat_id == chat_id for chat in chats)
+                )
+                self._discard_moderated_chat(chat_id)
+                logger.info("Chat %s deactivated", chat_id)
+                return True
             
         except Error as e:
-            logger.error(f"Error checking chat admin: {e}")
+            logger.error("Error deactivating chat: %s", e)
             return False
-        finally:
-            cursor.close()
-    
-    def deactivate_chat(self, chat_id: int) -> bool:
-        """Deactivate a chat (when bot is removed)"""
+
+    async def deactivate_chat_async(self, chat_id: int) -> bool:
+        """Deactivate a chat (asynchronous version)"""
         try:
-            cursor = self.connection.cursor()
-            query = "UPDATE bot_chats SET is_active = FALSE WHERE chat_id = %s"
-            cursor.execute(query, (chat_id,))
-            self.connection.commit()
-            logger.info(f"Chat {chat_id} deactivated")
+            await self._exec_write("UPDATE bot_chats SET is_active = FALSE WHERE chat_id = %s", chat_id)
+            await self._exec_write("UPDATE chat_moderators SET chat_active_cache = FALSE WHERE chat_id = %s", chat_id)
+            self._invalidate_chat(chat_id)
+            self._user_chats_cache.discard_where(
+                lambda _, chats: any(chat.chat_id == chat_id for chat in chats)
+            )
+            self._discard_moderated_chat(chat_id)
+            logger.info("Chat %s deactivated", chat_id)
             return True
-            
-        except Error as e:
-            logger.error(f"Error deactivating chat: {e}")
+        except Exception as e:
+            logger.error("Error deactivating chat: %s", e)
             return False
-        finally:
-            cursor.close()
     
+    @_reconnect_once
     def remove_chat_channel_binding(self, chat_id: int) -> bool:
         """Deactivate channel bindings for a chat (when bot is removed)"""
         try:
-            cursor = self.connection.cursor()
-            
-            # First check if there are any active bindings
-            check_query = "SELECT COUNT(*) FROM chat_channel_bindings WHERE chat_id = %s AND is_active = TRUE"
-            cursor.execute(check_query, (chat_id,))
-            count = cursor.fetchone()[0]
-            
-            if count > 0:
-                # Deactivate all bindings for this chat instead of deleting
+            with self._cursor() as cursor:
+
+                # Deactivate all active bindings for this chat instead of deleting
                 update_query = "UPDATE chat_channel_bindings SET is_active = FALSE WHERE chat_id = %s AND is_active = TRUE"
                 cursor.execute(update_query, (chat_id,))
-                self.connection.commit()
-                logger.info(f"Deactivated {count} channel binding(s) for chat {chat_id}")
-                return True
-            else:
-                logger.debug(f"No active channel bindings found for chat {chat_id}")
-                return False
-                
+                count = cursor.rowcount
+                self._drop_settings(chat_id)
+
+                if count > 0:
+                    logger.info("Deactivated %s channel binding(s) for chat %s", count, chat_id)
+                    return True
+                else:
+                    logger.debug("No active channel bindings found for chat %s", chat_id)
+                    return False
+
         except Error as e:
-            logger.error(f"Error removing channel bindings for chat {chat_id}: {e}")
+            logger.error("Error removing channel bindings for chat %s: %s", chat_id, e)
+            return False
+
+    async def remove_chat_channel_binding_async(self, chat_id: int) -> bool:
+        """Deactivate channel bindings for a chat (asynchronous version)"""
+        try:
+            count = await self._exec_write(
+                "UPDATE chat_channel_bindings SET is_active = FALSE WHERE chat_id = %s AND is_active = TRUE", chat_id
+            )
+            self._drop_settings(chat_id)
+            if count > 0:
+                logger.info("Deactivated %s channel binding(s) for chat %s", count, chat_id)
+                return True
+            logger.debug("No active channel bindings found for chat %s", chat_id)
+            return False
+        except Exception as e:
+            logger.error("Error removing channel bindings for chat %s: %s", chat_id, e)
             return False
-        finally:
-            cursor.close()
     
+    @_reconnect_once
     def deactivate_channel_bindings(self, channel_id: int) -> bool:
         """Deactivate channel bindings when bot is removed from channel"""
         try:
-            cursor = self.connection.cursor()
-            
-            # First check if there are any active bindings for this channel
-            check_query = "SELECT COUNT(*) FROM chat_channel_bindings WHERE channel_id = %s AND is_active = TRUE"
-            cursor.execute(check_query, (channel_id,))
-            count = cursor.fetchone()[0]
-            
-            if count > 0:
-                # Deactivate all bindings for this channel
+            with self._cursor() as cursor:
+
+                # Deactivate all active bindings for this channel
                 update_query = "UPDATE chat_channel_bindings SET is_active = FALSE WHERE channel_id = %s AND is_active = TRUE"
                 cursor.execute(update_query, (channel_id,))
-                self.connection.commit()
-                logger.info(f"Deactivated {count} binding(s) for channel {channel_id}")
-                return True
-            else:
-                logger.debug(f"No active bindings found for channel {channel_id}")
-                return False
-                
+                count = cursor.rowcount
+                self._drop_settings(*[cid for cid, cur in self._chat_settings.items() if cur.channel_id == channel_id])
+
+                if count > 0:
+                    logger.info("Deactivated %s binding(s) for channel %s", count, channel_id)
+                    return True
+                else:
+                    logger.debug("No active bindings found for channel %s", channel_id)
+                    return False
+
         except Error as e:
-            logger.error(f"Error deactivating channel bindings for channel {channel_id}: {e}")
+            logger.error("Error deactivating channel bindings for channel %s: %s", channel_id, e)
+            return False
+
+    async def deactivate_channel_bindings_async(self, channel_id: int) -> bool:
+        """Deactivate channel bindings when bot is removed from channel (asynchronous version)"""
+        try:
+            count = await self._exec_write(
+                "UPDATE chat_channel_bindings SET is_active = FALSE WHERE channel_id = %s AND is_active = TRUE",
+                channel_id
+            )
+            self._drop_settings(*[cid for cid, cur in self._chat_settings.items() if cur.channel_id == channel_id])
+            if count > 0:
+                logger.info("Deactivated %s binding(s) for channel %s", count, channel_id)
+                return True
+            logger.debug("No active bindings found for channel %s", channel_id)
+            return False
+        except Exception as e:
+            logger.error("Error deactivating channel bindings for channel %s: %s", channel_id, e)
             return False
-        finally:
-            cursor.close()
     
+    async def load_chat_settings_async(self) -> int:
+        """Load the settings of all active chats into memory with one query (call at startup)"""
+        try:
+            generation = self._settings_generation
+            rows = await self._exec_all("""
+                SELECT bc.chat_id, bc.delete_messages_enabled, bc.max_edit_time_minutes, ccb.channel_id
+                FROM bot_chats bc
+                LEFT JOIN chat_channel_bindings ccb ON ccb.chat_id = bc.chat_id AND ccb.is_active = TRUE
+                WHERE bc.is_active = TRUE
+            """)
+            if generation != self._settings_generation:
+                # A write landed during the query; chats load on demand instead
+                logger.info("Chat settings changed while loading, skipping preload")
+                return 0
+            for chat_id, *settings in rows:
+                self._chat_settings[chat_id] = self._settings_from_row(settings)
+            logger.info("Loaded settings for %s chats", len(rows))
+            return len(rows)
+        except Exception as e:
+            logger.error("Error loading chat settings: %s", e)
+            return 0
+
+    async def get_chat_settings_async(self, chat_id: int) -> ChatSettings:
+        """Get delete setting, max edit time and bound channel for a chat (in memory after the first load)"""
+        settings = self._chat_settings.get(chat_id)
+        if settings is not None:
+            return settings
+        try:
+            async with self._chat_locks(chat_id):
+                # Another waiter may have loaded the settings meanwhile
+                settings = self._chat_settings.get(chat_id)
+                if settings is None:
+                    generation = self._settings_generation
+                    settings = self._settings_from_row(await self._q_settings(chat_id))
+                    # A write during the query may have made this row stale: use it, but don't keep it
+                    if generation == self._settings_generation:
+                        self._chat_settings[chat_id] = settings
+                return settings
+        except Exception as e:
+            logger.error("Error getting settings for chat %s: %s", chat_id, e)
+            return ChatSettings(True, 20, None)  # Defaults
+
+    @_reconnect_once
     def get_delete_messages_setting(self, chat_id: int) -> bool:
         """Get the delete messages setting for a chat"""
+        settings = self._chat_settings.get(chat_id)
+        if settings is not None:
+            return settings.delete_enabled
         try:
-            cursor = self.connection.cursor()
-            query = """
-                SELECT delete_messages_enabled
-                FROM bot_chats
-                WHERE chat_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (chat_id,))
-            result = cursor.fetchone()
-            # Default to True if not found
-            return result[0] if result else True
+            with self._cursor(prepared='delete_messages_setting') as cursor:
+                cursor.execute(self.HOT_QUERIES['delete_messages_setting'], (chat_id,))
+                result = cursor.fetchall()
+                # Default to True if not found
+                return bool(result[0][0]) if result else True
 
         except Error as e:
-            logger.error(f"Error getting delete messages setting for chat {chat_id}: {e}")
+            logger.error("Error getting delete messages setting for chat %s: %s", chat_id, e)
             return True  # Default to enabled
-        finally:
-            cursor.close()
 
     async def get_delete_messages_setting_async(self, chat_id: int) -> bool:
         """Get the delete messages setting for a chat (asynchronous version)"""
-        if not self.pool:
-            logger.error("Async pool not initialized")
-            return True  # Default to enabled
+        return (await self.get_chat_settings_async(chat_id)).delete_enabled
+
+    @_reconnect_once
+    def set_delete_messages_setting(self, chat_id: int, enabled: bool) -> bool:
+        """Set the delete messages setting for a chat"""
+        try:
+            with self._cursor() as cursor:
+                query = """
+                    UPDATE bot_chats
+                    SET delete_messages_enabled = %s
+                    WHERE chat_id = %s AND is_active = TRUE
+                """
+                cursor.execute(query, (enabled, chat_id))
+                self._write_through_settings(chat_id, cursor.rowcount > 0, delete_enabled=bool(enabled))
+                logger.info("Set delete messages setting for chat %s to %s", chat_id, enabled)
+                return True
+
+        except Error as e:
+            logger.error("Error setting delete messages setting for chat %s: %s", chat_id, e)
+            return False
 
+    async def set_delete_messages_setting_async(self, chat_id: int, enabled: bool) -> bool:
+        """Set the delete messages setting for a chat (asynchronous version)"""
         try:
-            async with self.pool.acquire() as conn:
+            pool = await self._get_pool()
+            async with self._chat_locks(chat_id), pool.acquire() as conn:
                 async with conn.cursor() as cursor:
                     query = """
-                        SELECT delete_messages_enabled
-                        FROM bot_chats
+                        UPDATE bot_chats
+                        SET delete_messages_enabled = %s
                         WHERE chat_id = %s AND is_active = TRUE
                     """
-                    await cursor.execute(query, (chat_id,))
-                    result = await cursor.fetchone()
-                    # Default to True if not found
-                    return result[0] if result else True
+                    await cursor.execute(query, (enabled, chat_id))
+                    self._write_through_settings(chat_id, cursor.rowcount > 0, delete_enabled=bool(enabled))
+                    logger.info("Set delete messages setting for chat %s to %s", chat_id, enabled)
+                    return True
         except Exception as e:
-            logger.error(f"Error getting delete messages setting for chat {chat_id}: {e}")
-            return True  # Default to enabled
-
-    def set_delete_messages_setting(self, chat_id: int, enabled: bool) -> bool:
-        """Set the delete messages setting for a chat"""
-        try:
-            cursor = self.connection.cursor()
-            query = """
-                UPDATE bot_chats
-                SET delete_messages_enabled = %s
-                WHERE chat_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (enabled, chat_id))
-            self.connection.commit()
-            logger.info(f"Set delete messages setting for chat {chat_id} to {enabled}")
-            return True
-
-        except Error as e:
-            logger.error(f"Error setting delete messages setting for chat {chat_id}: {e}")
+            logger.error("Error setting delete messages setting for chat %s: %s", chat_id, e)
             return False
-        finally:
-            cursor.close()
 
+    @_reconnect_once
     def get_max_edit_time_setting(self, chat_id: int) -> int:
         """Get the maximum edit time setting for a chat in minutes"""
+        settings = self._chat_settings.get(chat_id)
+        if settings is not None:
+            return settings.max_edit_time
         try:
-            cursor = self.connection.cursor()
-            query = """
-                SELECT max_edit_time_minutes
-                FROM bot_chats
-                WHERE chat_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (chat_id,))
-            result = cursor.fetchone()
-            # Default to 20 minutes if not found
-            return result[0] if result else 20
+            with self._cursor(prepared='max_edit_time_setting') as cursor:
+                cursor.execute(self.HOT_QUERIES['max_edit_time_setting'], (chat_id,))
+                result = cursor.fetchall()
+                # Default to 20 minutes if not found
+                return result[0][0] if result else 20
 
         except Error as e:
-            logger.error(f"Error getting max edit time setting for chat {chat_id}: {e}")
+            logger.error("Error getting max edit time setting for chat %s: %s", chat_id, e)
             return 20  # Default to 20 minutes
-        finally:
-            cursor.close()
 
     async def get_max_edit_time_setting_async(self, chat_id: int) -> int:
         """Get the maximum edit time setting for a chat in minutes (asynchronous version)"""
-        if not self.pool:
-            logger.error("Async pool not initialized")
-            return 20  # Default to 20 minutes
-
-        try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    query = """
-                        SELECT max_edit_time_minutes
-                        FROM bot_chats
-                        WHERE chat_id = %s AND is_active = TRUE
-                    """
-                    await cursor.execute(query, (chat_id,))
-                    result = await cursor.fetchone()
-                    # Default to 20 minutes if not found
-                    return result[0] if result else 20
-        except Exception as e:
-            logger.error(f"Error getting max edit time setting for chat {chat_id}: {e}")
-            return 20  # Default to 20 minutes
+        return (await self.get_chat_settings_async(chat_id)).max_edit_time
 
+    @_reconnect_once
     def set_max_edit_time_setting(self, chat_id: int, minutes: int) -> bool:
         """Set the maximum edit time setting for a chat in minutes"""
         try:
@@ -522,223 +1147,386 @@ class DatabaseManager:
             elif minutes > 20:
                 minutes = 20
 
-            cursor = self.connection.cursor()
-            query = """
-                UPDATE bot_chats
-                SET max_edit_time_minutes = %s
-                WHERE chat_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (minutes, chat_id))
-            self.connection.commit()
-            logger.info(f"Set max edit time setting for chat {chat_id} to {minutes} minutes")
-            return True
+            with self._cursor() as cursor:
+                query = """
+                    UPDATE bot_chats
+                    SET max_edit_time_minutes = %s
+                    WHERE chat_id = %s AND is_active = TRUE
+                """
+                cursor.execute(query, (minutes, chat_id))
+                self._write_through_settings(chat_id, cursor.rowcount > 0, max_edit_time=minutes)
+                logger.info("Set max edit time setting for chat %s to %s minutes", chat_id, minutes)
+                return True
 
         except Error as e:
-            logger.error(f"Error setting max edit time setting for chat {chat_id}: {e}")
+            logger.error("Error setting max edit time setting for chat %s: %s", chat_id, e)
+            return False
+
+    async def set_max_edit_time_setting_async(self, chat_id: int, minutes: int) -> bool:
+        """Set the maximum edit time setting for a chat in minutes (asynchronous version)"""
+        # Validate minutes range (0-20 minutes)
+        minutes = min(max(minutes, 0), 20)
+        try:
+            pool = await self._get_pool()
+            async with self._chat_locks(chat_id), pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    query = """
+                        UPDATE bot_chats
+                        SET max_edit_time_minutes = %s
+                        WHERE chat_id = %s AND is_active = TRUE
+                    """
+                    await cursor.execute(query, (minutes, chat_id))
+                    self._write_through_settings(chat_id, cursor.rowcount > 0, max_edit_time=minutes)
+                    logger.info("Set max edit time setting for chat %s to %s minutes", chat_id, minutes)
+                    return True
+        except Exception as e:
+            logger.error("Error setting max edit time setting for chat %s: %s", chat_id, e)
             return False
-        finally:
-            cursor.close()
 
+    @_reconnect_once
     def add_moderator(self, chat_id: int, moderator_user_id: int, added_by_user_id: int,
                      moderator_username: Optional[str] = None, moderator_name: Optional[str] = None) -> bool:
         """Add a moderator to a chat"""
         try:
-            cursor = self.connection.cursor()
+            with self._cursor() as cursor:
+                query = """
+                    INSERT INTO chat_moderators (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                                                moderator_username_md, moderator_name_md, name_contains_username)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    is_active = TRUE,
+                    added_by_user_id = VALUES(added_by_user_id),
+                    moderator_username = VALUES(moderator_username),
+                    moderator_name = VALUES(moderator_name),
+                    moderator_username_md = VALUES(moderator_username_md),
+                    moderator_name_md = VALUES(moderator_name_md),
+                    name_contains_username = VALUES(name_contains_username),
+                    added_date = CURRENT_TIMESTAMP
+                """
+                cursor.execute(query, (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                                       _markdown_or_none(moderator_username), _markdown_or_none(moderator_name),
+                                       _name_has_username(moderator_name, moderator_username)))
+                self._refresh_moderator_chat_cache(cursor, [chat_id])
+                self._settings_cache.pop(('moderator', chat_id, moderator_user_id))
+                self._settings_cache.pop(('role', chat_id, moderator_user_id))
+                self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
+                logger.debug("Moderator %s (%s, @%s) added to chat %s by %s", moderator_user_id, moderator_name, moderator_username, chat_id, added_by_user_id)
+                return True
+
+        except Error as e:
+            logger.error("Error adding moderator: %s", e)
+            return False
+
+    async def add_moderator_async(self, chat_id: int, moderator_user_id: int, added_by_user_id: int,
+                                  moderator_username: Optional[str] = None,
+                                  moderator_name: Optional[str] = None) -> bool:
+        """Add a moderator to a chat (asynchronous version)"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    query = """
+                        INSERT INTO chat_moderators (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                                                    moderator_username_md, moderator_name_md, name_contains_username)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                        is_active = TRUE,
+                        added_by_user_id = VALUES(added_by_user_id),
+                        moderator_username = VALUES(moderator_username),
+                        moderator_name = VALUES(moderator_name),
+                        moderator_username_md = VALUES(moderator_username_md),
+                        moderator_name_md = VALUES(moderator_name_md),
+                        name_contains_username = VALUES(name_contains_username),
+                        added_date = CURRENT_TIMESTAMP
+                    """
+                    await cursor.execute(query, (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                                                 _markdown_or_none(moderator_username), _markdown_or_none(moderator_name),
+                                                 _name_has_username(moderator_name, moderator_username)))
+                    await cursor.execute(*self._moderator_chat_cache_update([chat_id]))
+                    self._settings_cache.pop(('moderator', chat_id, moderator_user_id))
+                    self._settings_cache.pop(('role', chat_id, moderator_user_id))
+                    self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
+                    logger.debug("Moderator %s (%s, @%s) added to chat %s by %s", moderator_user_id, moderator_name, moderator_username, chat_id, added_by_user_id)
+                    return True
+        except Exception as e:
+            logger.error("Error adding moderator: %s", e)
+            return False
+
+    async def add_moderator_if_admin_async(self, chat_id: int, moderator_user_id: int, added_by_user_id: int,
+                                           moderator_username: Optional[str] = None,
+                                           moderator_name: Optional[str] = None) -> Optional[str]:
+        """Add a moderator in one statement if added_by_user_id administers the chat and the user is not
+        an active moderator yet; returns 'added', 'exists', 'forbidden' or None on error"""
+        try:
+            # The admin check, the duplicate check and the chat title/status copy all happen in the SELECT
             query = """
-                INSERT INTO chat_moderators (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO chat_moderators (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                                             moderator_username_md, moderator_name_md, name_contains_username,
+                                             chat_title_cache, chat_active_cache)
+                SELECT bc.chat_id, %s, %s, %s, %s, %s, %s, %s, bc.chat_title, bc.is_active
+                FROM bot_chats bc
+                WHERE bc.chat_id = %s AND bc.admin_user_id = %s AND bc.is_active = TRUE
+                  AND NOT EXISTS (
+                      SELECT 1 FROM chat_moderators cm
+                      WHERE cm.chat_id = %s AND cm.moderator_user_id = %s AND cm.is_active = TRUE
+                  )
                 ON DUPLICATE KEY UPDATE
-                is_active = TRUE,
+                chat_moderators.is_active = TRUE,
                 added_by_user_id = VALUES(added_by_user_id),
                 moderator_username = VALUES(moderator_username),
                 moderator_name = VALUES(moderator_name),
-                added_date = CURRENT_TIMESTAMP
+                moderator_username_md = VALUES(moderator_username_md),
+                moderator_name_md = VALUES(moderator_name_md),
+                name_contains_username = VALUES(name_contains_username),
+                chat_title_cache = VALUES(chat_title_cache),
+                chat_active_cache = VALUES(chat_active_cache),
+                chat_moderators.added_date = CURRENT_TIMESTAMP
             """
-            cursor.execute(query, (chat_id, moderator_user_id, moderator_username, moderator_name, added_by_user_id))
-            self.connection.commit()
-            logger.info(f"Moderator {moderator_user_id} ({moderator_name}, @{moderator_username}) added to chat {chat_id} by {added_by_user_id}")
-            return True
+            inserted = await self._exec_write(
+                query,
+                moderator_user_id, moderator_username, moderator_name, added_by_user_id,
+                _markdown_or_none(moderator_username), _markdown_or_none(moderator_name),
+                _name_has_username(moderator_name, moderator_username),
+                chat_id, added_by_user_id, chat_id, moderator_user_id
+            )
+            if inserted:
+                self._settings_cache.pop(('moderator', chat_id, moderator_user_id))
+                self._settings_cache.pop(('role', chat_id, moderator_user_id))
+                self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
+                logger.debug("Moderator %s (%s, @%s) added to chat %s by %s", moderator_user_id, moderator_name, moderator_username, chat_id, added_by_user_id)
+                return 'added'
 
-        except Error as e:
-            logger.error(f"Error adding moderator: {e}")
-            return False
-        finally:
-            cursor.close()
+            # Nothing inserted: only the refusal path pays for telling the two reasons apart
+            if await self.check_permission_async(chat_id, added_by_user_id) == 'admin':
+                return 'exists'
+            return 'forbidden'
+        except Exception as e:
+            logger.error("Error adding moderator: %s", e)
+            return None
 
+    @_reconnect_once
     def remove_moderator(self, chat_id: int, moderator_user_id: int) -> bool:
         """Remove a moderator from a chat"""
         try:
-            cursor = self.connection.cursor()
-            query = """
-                UPDATE chat_moderators
-                SET is_active = FALSE
-                WHERE chat_id = %s AND moderator_user_id = %s
-            """
-            cursor.execute(query, (chat_id, moderator_user_id))
-            self.connection.commit()
-            logger.info(f"Moderator {moderator_user_id} removed from chat {chat_id}")
-            return True
+            with self._cursor() as cursor:
+                query = """
+                    UPDATE chat_moderators
+                    SET is_active = FALSE
+                    WHERE chat_id = %s AND moderator_user_id = %s
+                """
+                cursor.execute(query, (chat_id, moderator_user_id))
+                self._settings_cache.pop(('moderator', chat_id, moderator_user_id))
+                self._settings_cache.pop(('role', chat_id, moderator_user_id))
+                self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
+                logger.info("Moderator %s removed from chat %s", moderator_user_id, chat_id)
+                return True
 
         except Error as e:
-            logger.error(f"Error removing moderator: {e}")
+            logger.error("Error removing moderator: %s", e)
+            return False
+
+    async def remove_moderator_async(self, chat_id: int, moderator_user_id: int) -> bool:
+        """Remove a moderator from a chat (asynchronous version)"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    query = """
+                        UPDATE chat_moderators
+                        SET is_active = FALSE
+                        WHERE chat_id = %s AND moderator_user_id = %s
+                    """
+                    await cursor.execute(query, (chat_id, moderator_user_id))
+                    self._settings_cache.pop(('moderator', chat_id, moderator_user_id))
+                    self._settings_cache.pop(('role', chat_id, moderator_user_id))
+                    self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
+                    logger.info("Moderator %s removed from chat %s", moderator_user_id, chat_id)
+                    return True
+        except Exception as e:
+            logger.error("Error removing moderator: %s", e)
             return False
-        finally:
-            cursor.close()
 
+    @_reconnect_once
     def is_moderator(self, chat_id: int, user_id: int) -> bool:
         """Check if user is a moderator in the chat"""
         try:
-            cursor = self.connection.cursor()
-            query = """
-                SELECT 1 FROM chat_moderators
-                WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE
-            """
-            cursor.execute(query, (chat_id, user_id))
-            result = cursor.fetchone()
-            return result is not None
+            with self._cursor(prepared='is_moderator') as cursor:
+                cursor.execute(self.HOT_QUERIES['is_moderator'], (chat_id, user_id))
+                result = cursor.fetchall()
+                return len(result) > 0
 
         except Error as e:
-            logger.error(f"Error checking moderator status: {e}")
+            logger.error("Error checking moderator status: %s", e)
             return False
-        finally:
-            cursor.close()
 
     async def is_moderator_async(self, chat_id: int, user_id: int) -> bool:
         """Check if user is a moderator in the chat (asynchronous version)"""
-        if not self.pool:
-            logger.error("Async pool not initialized")
-            return False
-
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    query = """
-                        SELECT 1 FROM chat_moderators
-                        WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE
-                    """
-                    await cursor.execute(query, (chat_id, user_id))
-                    result = await cursor.fetchone()
-                    return result is not None
+            row = await self._settings_cache.get_or_load(('moderator', chat_id, user_id), self._q_moderator, chat_id, user_id)
+            return row is not None
         except Exception as e:
-            logger.error(f"Error checking moderator status: {e}")
+            logger.error("Error checking moderator status: %s", e)
             return False
 
-    def get_chat_moderators(self, chat_id: int) -> List[Dict[str, Any]]:
-        """Get all moderators for a chat"""
+    async def get_chat_moderators_async(self, chat_id: int) -> List[ModeratorRow]:
+        """Get all moderators for a chat (asynchronous version)"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT moderator_user_id, moderator_username, moderator_name, added_by_user_id, added_date
-                FROM chat_moderators
-                WHERE chat_id = %s AND is_active = TRUE
-                ORDER BY added_date DESC
-            """
-            cursor.execute(query, (chat_id,))
-            moderators = cursor.fetchall()
-            return moderators
-
-        except Error as e:
-            logger.error(f"Error getting chat moderators: {e}")
+            rows = await self._exec_all(self.HOT_QUERIES['chat_moderators'], chat_id)
+            return [ModeratorRow(*row) for row in rows]
+        except Exception as e:
+            logger.error("Error getting chat moderators: %s", e)
             return []
-        finally:
-            cursor.close()
 
-    def get_user_moderated_chats(self, user_id: int) -> List[Dict[str, Any]]:
-        """Get all chats where user is a moderator"""
-        try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT cm.chat_id, bc.chat_title, cm.moderator_username, cm.moderator_name, cm.added_date
-                FROM chat_moderators cm
-                JOIN bot_chats bc ON cm.chat_id = bc.chat_id
-                WHERE cm.moderator_user_id = %s AND cm.is_active = TRUE AND bc.is_active = TRUE
-                ORDER BY cm.added_date DESC
-            """
-            cursor.execute(query, (user_id,))
-            chats = cursor.fetchall()
-            return chats
+    @cached('_moderated_chats_cache', key=lambda user_id: ('moderated_chats', user_id))
+    async def _load_user_moderated_chats(self, user_id: int) -> Tuple[ModeratedChatRow, ...]:
+        """Query the chats where a user is an active moderator"""
+        rows = await self._exec_all(self.HOT_QUERIES['user_moderated_chats'], user_id)
+        return tuple(ModeratedChatRow(*row) for row in rows)
 
-        except Error as e:
-            logger.error(f"Error getting user moderated chats: {e}")
-            return []
-        finally:
-            cursor.close()
+    async def get_user_moderated_chats_async(self, user_id: int) -> Tuple[ModeratedChatRow, ...]:
+        """Get all chats where user is a moderator (asynchronous version, cached for 60s)"""
+        try:
+            return await self._load_user_moderated_chats(user_id)
+        except Exception as e:
+            logger.error("Error getting user moderated chats: %s", e)
+            return ()
 
-    def migrate_moderator_info(self) -> bool:
+    @_reconnect_once
+    def migrate_moderator_info(self, batch_size: int = 1000) -> bool:
         """Migrate existing moderators to include username and name fields"""
         try:
-            cursor = self.connection.cursor()
+            with self._cursor() as cursor:
+                # Give moderators without a name a default one - it can be updated later
+                # when more info is available. Runs in small batches so each autocommitted
+                # UPDATE only locks a bounded number of rows.
+                update_query = """
+                    UPDATE chat_moderators
+                    SET moderator_name = CONCAT('Пользователь ', moderator_user_id)
+                    WHERE moderator_name IS NULL
+                    LIMIT %s
+                """
+                updated_count = 0
+                while True:
+                    cursor.execute(update_query, (batch_size,))
+                    if cursor.rowcount <= 0:
+                        break
+                    updated_count += cursor.rowcount
+                    time.sleep(0.01)  # Let concurrent writes through between batches
 
-            # Update existing moderators that have NULL values for username and name
-            # Set default values - these can be updated later when more info is available
-            update_query = """
-                UPDATE chat_moderators
-                SET moderator_username = NULL,
-                    moderator_name = CONCAT('Пользователь ', moderator_user_id)
-                WHERE moderator_username IS NULL OR moderator_name IS NULL
-            """
-            cursor.execute(update_query)
-            updated_count = cursor.rowcount
+                logger.info("Migration completed: updated %s moderator records", updated_count)
+                return True
 
-            self.connection.commit()
-            logger.info(f"Migration completed: updated {updated_count} moderator records")
-            return True
+        except Error as e:
+            logger.error("Error migrating moderator info: %s", e)
+            return False
+
+    @_reconnect_once
+    def migrate_moderator_markdown(self, batch_size: int = 1000) -> bool:
+        """Fill the Markdown-escaped display columns of existing moderators"""
+        try:
+            with self._cursor() as cursor:
+                select_query = """
+                    SELECT id, moderator_username, moderator_name
+                    FROM chat_moderators
+                    WHERE (moderator_username IS NOT NULL AND moderator_username_md IS NULL)
+                       OR (moderator_name IS NOT NULL AND moderator_name_md IS NULL)
+                    LIMIT %s
+                """
+                update_query = """
+                    UPDATE chat_moderators
+                    SET moderator_username_md = %s, moderator_name_md = %s
+                    WHERE id = %s
+                """
+                updated_count = 0
+                while True:
+                    cursor.execute(select_query, (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    cursor.executemany(update_query, [
+                        (_markdown_or_none(username), _markdown_or_none(name), row_id)
+                        for row_id, username, name in rows
+                    ])
+                    updated_count += len(rows)
+                    time.sleep(0.01)  # Let concurrent writes through between batches
+
+                logger.info("Migration completed: escaped %s moderator records", updated_count)
+                return True
 
         except Error as e:
-            logger.error(f"Error migrating moderator info: {e}")
+            logger.error("Error migrating moderator markdown: %s", e)
             return False
-        finally:
-            cursor.close()
 
+    @_reconnect_once
     def update_moderator_info(self, chat_id: int, moderator_user_id: int,
                              username: Optional[str] = None, name: Optional[str] = None) -> bool:
         """Update username and name for an existing moderator"""
         try:
-            cursor = self.connection.cursor()
+            with self._cursor() as cursor:
 
-            # Build update query based on what fields are provided
-            update_fields = []
-            values = []
+                # Build update query based on what fields are provided
+                update_fields = []
+                values = []
 
-            if username is not None:
-                update_fields.append("moderator_username = %s")
-                values.append(username)
+                if username is not None:
+                    update_fields.append("moderator_username = %s, moderator_username_md = %s")
+                    values.extend([username, _markdown_or_none(username)])
 
-            if name is not None:
-                update_fields.append("moderator_name = %s")
-                values.append(name)
+                if name is not None:
+                    update_fields.append("moderator_name = %s, moderator_name_md = %s")
+                    values.extend([name, _markdown_or_none(name)])
 
-            if not update_fields:
-                logger.warning("No fields to update for moderator info")
-                return False
+                if not update_fields:
+                    logger.warning("No fields to update for moderator info")
+                    return False
 
-            # Add WHERE conditions
-            values.extend([chat_id, moderator_user_id])
+                # Assignments apply left to right, so this sees the new name/username
+                update_fields.append(f"name_contains_username = {_NAME_HAS_USERNAME_SQL}")
 
-            query = f"""
-                UPDATE chat_moderators
-                SET {', '.join(update_fields)}
-                WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE
-            """
+                # Add WHERE conditions
+                values.extend([chat_id, moderator_user_id])
+
+                query = f"""
+                    UPDATE chat_moderators
+                    SET {', '.join(update_fields)}
+                    WHERE chat_id = %s AND moderator_user_id = %s AND is_active = TRUE
+                """
 
-            cursor.execute(query, values)
-            self.connection.commit()
+                cursor.execute(query, values)
+                self._moderated_chats_cache.pop(('moderated_chats', moderator_user_id))
 
-            affected_rows = cursor.rowcount
-            logger.info(f"Updated moderator info for user {moderator_user_id} in chat {chat_id}: {affected_rows} rows affected")
-            return affected_rows > 0
+                affected_rows = cursor.rowcount
+                logger.info("Updated moderator info for user %s in chat %s: %s rows affected", moderator_user_id, chat_id, affected_rows)
+                return affected_rows > 0
 
         except Error as e:
-            logger.error(f"Error updating moderator info: {e}")
+            logger.error("Error updating moderator info: %s", e)
             return False
-        finally:
-            cursor.close()
+
+    async def close_async(self) -> None:
+        """Close the async pool after in-flight queries finish, then the sync connection (idempotent)"""
+        self._closed = True
+        self.stop_pool_ping()
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            logger.info("Closing database pool (size=%s, free=%s)", pool.size, pool.freesize)
+            pool.close()
+            # wait_closed() returns once every acquired connection has been released
+            await pool.wait_closed()
+            logger.info("Database connections closed")
+        self.close()
 
     def close(self) -> None:
         """Close database connection"""
-        if self.connection and self.connection.is_connected():
+        if self.connection is None:
+            return
+        try:
             self.connection.close()
             logger.info("Database connection closed")
+        except Error as e:
+            logger.warning("Error closing database connection: %s", e)
+        finally:
+            self.connection = None
 
 
 # Global database instance
@@ -3,125 +3,284 @@ Command handlers for the Telegram bot
 Handles /start and /chats commands in private messages
 """
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Chat, Update, User, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from telegram.error import BadRequest
 from telegram.constants import ChatType
+import asyncio
 import logging
+import string
+import time
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Iterator, NamedTuple, Optional, Tuple
 
-from bot.database.database import db
-from bot.utils.helpers import format_chat_title, is_bot_admin, escape_markdown_safe
+from bot.database.database import db, ChatRow, ChatSettingsBundle, ModeratedChatRow, ModeratorRow
+from bot.utils.helpers import format_chat_title, is_bot_admin, escape_markdown_safe, role_cache_key
 
 logger = logging.getLogger(__name__)
 
+class Op:
+    """Callback data opcodes; layout is <op>:<chat_id>[:<arg>], e.g. "ST:-100123:5"""
+    SETUP_CHAT = 'SC'
+    SETUP_CHANNEL = 'SCH'
+    TOGGLE_DELETE = 'TD'
+    SET_EDIT_TIME = 'ET'
+    SET_TIME = 'ST'
+    CUSTOM_TIME = 'CT'
+    MANAGE_MODERATORS = 'MM'
+    ADD_MODERATOR_OPTIONS = 'AM'
+    ADD_MODERATOR_MANUAL = 'AMM'
+    ADD_MODERATOR_FORWARD = 'AMF'
+    REMOVE_MODERATOR = 'RM'
+    CONFIRM_REMOVE_MODERATOR = 'CRM'
+
+
+CB_OPS = frozenset(value for name, value in vars(Op).items() if name.isupper())
+
+
+class CallbackData(NamedTuple):
+    """Parsed callback data"""
+    op: str
+    chat_id: int
+    arg: Optional[int]
+
+
+def parse_cb(data: str) -> Optional[CallbackData]:
+    """Parse "<op>:<chat_id>[:<arg>]" callback data, None if it does not fit the layout"""
+    op, _, rest = data.partition(':')
+    if op not in CB_OPS:
+        return None
+    chat_id, has_arg, arg = rest.partition(':')
+    try:
+        return CallbackData(op, int(chat_id), int(arg) if has_arg else None)
+    except ValueError:
+        # Missing or non-numeric fields, or more than one argument
+        return None
+
+
+def parse_chat_cb(data: str) -> Optional[CallbackData]:
+    """Parse callback data that must target a group chat (negative chat_id), None otherwise"""
+    cb = parse_cb(data)
+    if cb is None or cb.chat_id >= 0:
+        return None
+    return cb
+
+
+# user_data keys owned by the settings/moderator input flows; everything else
+# (e.g. memoized roles) survives a flow reset
+_MODERATOR_FLOW_KEYS = ('waiting_for_moderator_forward', 'waiting_for_moderator_id')
+_FLOW_KEYS = ('selected_chat_id', 'waiting_for_channel', 'waiting_for_custom_time') + _MODERATOR_FLOW_KEYS
+
+
+def _reset_flow(context: ContextTypes.DEFAULT_TYPE, keys: Tuple[str, ...] = _FLOW_KEYS) -> None:
+    """Forget the pending input state of the settings/moderator flows (or only the given keys)"""
+    user_data = context.user_data
+    for key in keys:
+        user_data.pop(key, None)
+
+
+ROLE_CACHE_TTL = 30  # Seconds a user's role is memoized in user_data along a click path
+
+
+async def _require_admin(chat_id: int, user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Check that the user is the chat's admin; a positive verdict is memoized in user_data for ROLE_CACHE_TTL seconds"""
+    key = role_cache_key(chat_id)
+    now = time.monotonic()
+    cached = context.user_data.get(key)
+    if cached is not None and cached[1] > now:
+        return cached[0] == 'admin'
+    role = await db.check_permission_async(chat_id, user_id)
+    if role == 'admin':
+        context.user_data[key] = (role, now + ROLE_CACHE_TTL)
+        return True
+    # Refusals are not memoized, so a user who just became admin is let in right away
+    context.user_data.pop(key, None)
+    return False
+
+
+async def ack_and_edit(query, text: str, **kwargs) -> None:
+    """Answer the callback query and edit its message in parallel"""
+    try:
+        await asyncio.gather(query.answer(), query.edit_message_text(text, **kwargs))
+    except BadRequest as e:
+        # Re-rendering an identical message (e.g. a double tap) is not an error
+        if "message is not modified" not in str(e).lower():
+            raise
+
+
+async def ack_and_edit_panel(query, text: str, reply_markup: InlineKeyboardMarkup, **kwargs) -> None:
+    """Edit a Markdown panel, sending only the keyboard when the visible text is unchanged"""
+    message = query.message
+    # Telegram sends the rendered text without Markdown markers; panels only use '*' markup
+    if message is not None and message.text == text.replace('*', '').strip():
+        try:
+            await asyncio.gather(query.answer(), query.edit_message_reply_markup(reply_markup=reply_markup))
+        except BadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                raise
+    else:
+        await ack_and_edit(query, text, reply_markup=reply_markup, **kwargs)
+
+
+WELCOME_TEXT = string.Template("👋 Привет, $first_name!\n\n🤖 Мониторю редактируемые сообщения в чатах")
+
+CHATS_HEADER = "📋 **Ваши чаты где я администратор:**\n\n"
+CHATS_TEXT = CHATS_HEADER + "Выберите чат для настройки:"
+CHATS_COMMAND_TEXT = CHATS_HEADER + "Выберите чат для настройки канала пересылки:"
+
+SETTINGS_HEADER = "⚙️ **Настройки чата**\n\n"
+SETTINGS_TEXT = string.Template(SETTINGS_HEADER + "$status_text\n\nВыберите действие:")
+
+OUTDATED_BUTTON_TEXT = "⚠️ Кнопка устарела"
+
+NO_CHATS_TEXT = (
+    "📭 У вас пока нет активных чатов.\n\n"
+    "Добавьте меня в групповой чат как администратора, "
+    "и я автоматически добавлю его в список."
+)
+
+ADD_MODERATOR_MANUAL_TEXT = (
+    "👤 **Добавление модератора**\n\n"
+    "Отправьте ID пользователя, которого хотите добавить как модератора.\n\n"
+    "ID можно узнать через бота @userinfobot или посмотреть в логах бота."
+)
+ADD_MODERATOR_FORWARD_TEXT = (
+    "📨 **Добавление модератора через пересылку**\n\n"
+    "Перешлите любое сообщение от пользователя, которого хотите добавить как модератора.\n\n"
+    "❗ **Важно:** Сообщение должно быть переслано из личного чата или группы, а не из канала."
+)
+
+MODERATOR_INFO_HEADER = "👨‍💼 **Информация о правах**\n\n"
+MODERATOR_RIGHTS_TEXT = (
+    "**Ваши права:**\n"
+    "✅ Неограниченное редактирование сообщений\n"
+    "✅ Ваши отредактированные сообщения не удаляются\n"
+    "✅ Ваши изменения не пересылаются в канал\n\n"
+    "Вы можете редактировать сообщения в любое время без последствий."
+)
+NO_RIGHTS_INFO_TEXT = (
+    MODERATOR_INFO_HEADER
+    + "У вас нет активных прав модератора или администратора ни в одном чате.\n\n"
+    "Обратитесь к администратору чата для получения прав."
+)
+
+HELP_TEXT = (
+    "📋 **Как настроить бота:**\n\n"
+    "1. Добавьте меня в групповой чат как администратора\n"
+    "2. Добавьте меня в канал как администратора\n"
+    "3. Нажмите \"⚙️ Настроить чаты\" для связи чат→канал\n\n"
+    "❗ **Важно:** Я должен быть администратором везде!"
+)
+
+# Static keyboards (markups are immutable, so one instance serves every reply)
+START_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⚙️ Настроить чаты", callback_data="main_menu")],
+    [InlineKeyboardButton("❓ Помощь", callback_data="help")]
+])
+HELP_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data="main_menu")]])
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 На главную", callback_data="main_menu")]])
+
+
+@lru_cache(maxsize=1024)
+def _back_to_settings_markup(chat_id: int) -> InlineKeyboardMarkup:
+    """Keyboard with a single "back to settings" button for a chat"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"{Op.SETUP_CHAT}:{chat_id}")]])
+
+
+@lru_cache(maxsize=1024)
+def _back_to_moderators_markup(chat_id: int, text: str = "⬅️ Назад к управлению модераторами") -> InlineKeyboardMarkup:
+    """Keyboard with a single "back to moderator management" button for a chat"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(text, callback_data=f"{Op.MANAGE_MODERATORS}:{chat_id}")]])
+
+
+@lru_cache(maxsize=1024)
+def _add_moderator_options_markup(chat_id: int) -> InlineKeyboardMarkup:
+    """Keyboard with the two ways of adding a moderator"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔢 Ввести ID вручную", callback_data=f"{Op.ADD_MODERATOR_MANUAL}:{chat_id}")],
+        [InlineKeyboardButton("📨 Переслать сообщение", callback_data=f"{Op.ADD_MODERATOR_FORWARD}:{chat_id}")],
+        [InlineKeyboardButton("⬅️ Назад к управлению", callback_data=f"{Op.MANAGE_MODERATORS}:{chat_id}")]
+    ])
+
+
+@lru_cache(maxsize=1024)
+def _build_chats_keyboard(chats: Tuple[Tuple[int, str], ...]) -> InlineKeyboardMarkup:
+    """Build the chat list keyboard from (chat_id, display_title) pairs (memoized)"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(display_title, callback_data=f"{Op.SETUP_CHAT}:{chat_id}")]
+        for chat_id, display_title in chats
+    ])
+
+
+def _chats_markup(user_chats: Tuple[ChatRow, ...]) -> InlineKeyboardMarkup:
+    """Chat list keyboard, shared by every user that sees the same chats"""
+    # Titles arrive formatted from the database (display_title), so rows are used as-is
+    return _build_chats_keyboard(tuple((chat.chat_id, chat.display_title) for chat in user_chats))
+
+
+async def _render_chat_list(user_id: int, send: Callable[..., Awaitable[Any]], text: str = CHATS_TEXT) -> int:
+    """Show the user's chat list through `send(text, **kwargs)` (reply or edit); returns the chat count"""
+    # One (cached) list query answers both "any chats?" and what to render
+    user_chats = await db.get_user_chats_async(user_id)
+    if not user_chats:
+        await send(NO_CHATS_TEXT)
+        return 0
+
+    await send(text, reply_markup=_chats_markup(user_chats), parse_mode='Markdown')
+    return len(user_chats)
+
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /start command"""
+    # Registered with filters.ChatType.PRIVATE, so this is always a private chat
     user = update.effective_user
-    chat = update.effective_chat
-    
-    # Only respond to private messages
-    if chat.type != ChatType.PRIVATE:
-        return
-    
-    welcome_text = f"👋 Привет, {user.first_name}!\n\n🤖 Мониторю редактируемые сообщения в чатах"
 
-    # Create inline keyboard with action buttons
-    keyboard = [
-        [InlineKeyboardButton("⚙️ Настроить чаты", callback_data="main_menu")],
-        [InlineKeyboardButton("❓ Помощь", callback_data="help")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    welcome_text = WELCOME_TEXT.safe_substitute(first_name=user.first_name)
 
     await update.message.reply_text(
         welcome_text,
-        reply_markup=reply_markup,
+        reply_markup=START_MARKUP,
         parse_mode='Markdown'
     )
-    logger.info(f"Start command from user {user.id}")
+    logger.info("Start command from user %s", user.id)
 
 
 async def chats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /chats command"""
+    # Registered with filters.ChatType.PRIVATE, so this is always a private chat
     user = update.effective_user
-    chat = update.effective_chat
-    
-    # Only respond to private messages
-    if chat.type != ChatType.PRIVATE:
-        return
-    
-    # Get user's chats from database
-    user_chats = db.get_user_chats(user.id)
-    
-    if not user_chats:
-        await update.message.reply_text(
-            "📭 У вас пока нет активных чатов.\n\n"
-            "Добавьте меня в групповой чат как администратора, "
-            "и я автоматически добавлю его в список."
-        )
-        return
-    
-    # Create inline keyboard with chat buttons
-    keyboard = []
-    for chat_data in user_chats:
-        chat_title = format_chat_title_from_data(chat_data)
-        callback_data = f"setup_chat_{chat_data['chat_id']}"
-        keyboard.append([InlineKeyboardButton(chat_title, callback_data=callback_data)])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(
-        "📋 **Ваши чаты где я администратор:**\n\n"
-        "Выберите чат для настройки канала пересылки:",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
-    logger.info(f"Chats command from user {user.id}, found {len(user_chats)} chats")
 
+    chat_count = await _render_chat_list(user.id, update.message.reply_text, CHATS_COMMAND_TEXT)
+    logger.info("Chats command from user %s, found %s chats", user.id, chat_count)
 
-async def setup_chat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle chat setup callback"""
-    query = update.callback_query
-    user = query.from_user
-
-    await query.answer()
-
-    # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
-
-    # Store selected chat in user context
-    context.user_data['selected_chat_id'] = chat_id
 
-    # Get current settings for this chat
-    delete_enabled = db.get_delete_messages_setting(chat_id)
-    channel_id = db.get_chat_channel(chat_id)
-    max_edit_time = db.get_max_edit_time_setting(chat_id)
+def _build_settings_panel(chat_id: int, bundle: ChatSettingsBundle) -> Tuple[str, InlineKeyboardMarkup]:
+    """Build the chat settings panel text and keyboard"""
+    delete_enabled, max_edit_time, channel_id, role, moderator_count = bundle
+    is_admin = role == 'admin'
+    is_moderator = role == 'mod'
 
     # Create menu with options
     keyboard = []
 
     # Channel setup button
     if channel_id:
-        keyboard.append([InlineKeyboardButton("🔄 Изменить канал пересылки", callback_data=f"setup_channel_{chat_id}")])
+        keyboard.append([InlineKeyboardButton("🔄 Изменить канал пересылки", callback_data=f"{Op.SETUP_CHANNEL}:{chat_id}")])
     else:
-        keyboard.append([InlineKeyboardButton("📺 Настроить канал пересылки", callback_data=f"setup_channel_{chat_id}")])
+        keyboard.append([InlineKeyboardButton("📺 Настроить канал пересылки", callback_data=f"{Op.SETUP_CHANNEL}:{chat_id}")])
 
     # Toggle deletion button
     toggle_text = "🗑️ Отключить удаление сообщений" if delete_enabled else "✅ Включить удаление сообщений"
-    keyboard.append([InlineKeyboardButton(toggle_text, callback_data=f"toggle_delete_{chat_id}")])
+    keyboard.append([InlineKeyboardButton(toggle_text, callback_data=f"{Op.TOGGLE_DELETE}:{chat_id}")])
 
     # Edit time button
     time_text = f"⏱️ Время редактирования: {max_edit_time} мин" if max_edit_time > 0 else "⏱️ Время редактирования: без ограничений"
-    keyboard.append([InlineKeyboardButton(time_text, callback_data=f"set_edit_time_{chat_id}")])
-
-    # Check user role for moderator visibility
-    is_admin = db.is_chat_admin(chat_id, user.id)
-    is_moderator = db.is_moderator(chat_id, user.id)
+    keyboard.append([InlineKeyboardButton(time_text, callback_data=f"{Op.SET_EDIT_TIME}:{chat_id}")])
 
     # Add moderator button only for chat admins
     if is_admin:
-        moderators = db.get_chat_moderators(chat_id)
-        moderator_text = f"👥 Модераторы: {len(moderators)} чел."
-        keyboard.append([InlineKeyboardButton(moderator_text, callback_data=f"manage_moderators_{chat_id}")])
+        moderator_text = f"👥 Модераторы: {moderator_count} чел."
+        keyboard.append([InlineKeyboardButton(moderator_text, callback_data=f"{Op.MANAGE_MODERATORS}:{chat_id}")])
     elif is_moderator or is_admin:
         # Show moderator status for moderators and admins (since admins have same privileges)
         if is_admin:
@@ -149,34 +308,46 @@ async def setup_chat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     else:
         status_text += "\n👤 Обычный пользователь"
 
-    await query.edit_message_text(
-        f"⚙️ **Настройки чата**\n\n"
-        f"{status_text}\n\n"
-        f"Выберите действие:",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
-    logger.info(f"User {user.id} opened settings for chat {chat_id}")
+    return SETTINGS_TEXT.substitute(status_text=status_text), reply_markup
 
 
-async def handle_forwarded_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Unified handler for all forwarded messages in private chats"""
-    user = update.effective_user
-    message = update.message
+async def setup_chat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle chat setup callback"""
+    query = update.callback_query
+    user = query.from_user
 
-    logger.info(f"handle_forwarded_message called for user {user.id}")
+    # Extract chat_id from callback data
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
-    # Check user context to determine what to do with the forwarded message
-    if context.user_data.get('waiting_for_channel'):
+    # Store selected chat in user context
+    context.user_data['selected_chat_id'] = chat_id
+
+    # Settings, the user's role and the moderator count (admins only) in at most one query
+    bundle = await db.get_chat_settings_bundle_async(chat_id, user.id)
+
+    text, reply_markup = _build_settings_panel(chat_id, bundle)
+    await ack_and_edit_panel(query, text, reply_markup, parse_mode='Markdown')
+    logger.info("User %s opened settings for chat %s", user.id, chat_id)
+
+
+async def handle_forwarded_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Unified handler for all forwarded messages in private chats"""
+    # Check user context first to determine what to do with the forwarded message
+    user_data = context.user_data
+    if user_data.get('waiting_for_channel'):
         # User is setting up a channel
         await _handle_channel_setup_internal(update, context)
-    elif context.user_data.get('waiting_for_moderator_forward'):
+    elif user_data.get('waiting_for_moderator_forward'):
         # User is adding a moderator
         await _handle_moderator_forward_internal(update, context)
     else:
         # User is not expecting any forwarded message
-        logger.info(f"User {user.id} sent unexpected forwarded message")
-        await message.reply_text(
+        logger.info("User %s sent unexpected forwarded message", update.effective_user.id)
+        await update.message.reply_text(
             "❌ Я не ожидаю пересланное сообщение в данный момент.\n\n"
             "Используйте /chats чтобы настроить чаты или модераторов."
         )
@@ -186,24 +357,19 @@ async def _handle_channel_setup_internal(update: Update, context: ContextTypes.D
     user = update.effective_user
     message = update.message
 
-    logger.info(f"Processing channel setup for user {user.id}")
+    logger.info("Processing channel setup for user %s", user.id)
 
     # Check if message is forwarded from a channel
     # Support both old and new forward formats
-    forward_chat = None
-
-    # Check new format (forward_origin) from api_kwargs
-    if hasattr(message, 'api_kwargs') and 'forward_origin' in message.api_kwargs:
-        forward_origin = message.api_kwargs['forward_origin']
-        if isinstance(forward_origin, dict) and forward_origin.get('type') == 'channel':
-            chat_data = forward_origin.get('chat')
-            if chat_data:
-                # Create Chat object from dict
-                from telegram import Chat
-                forward_chat = Chat.de_json(chat_data, context.bot)
-    elif hasattr(message, 'forward_from_chat'):
-        # Old format (forward_from_chat)
-        forward_chat = message.forward_from_chat
+    forward_origin = message.api_kwargs.get('forward_origin')
+    if isinstance(forward_origin, dict):
+        # New format (forward_origin) that this PTB version leaves in api_kwargs
+        chat_data = forward_origin.get('chat') if forward_origin.get('type') == 'channel' else None
+        forward_chat = Chat.de_json(chat_data, context.bot) if chat_data else None
+    else:
+        # Parsed forward_origin on newer PTB versions, else the old forward_from_chat
+        forward_chat = (getattr(getattr(message, 'forward_origin', None), 'chat', None)
+                        or getattr(message, 'forward_from_chat', None))
 
     if not forward_chat or forward_chat.type != ChatType.CHANNEL:
         await message.reply_text(
@@ -223,31 +389,30 @@ async def _handle_channel_setup_internal(update: Update, context: ContextTypes.D
         )
         return
 
-    # Save chat-channel binding to database
-    success = await db.bind_chat_channel_async(selected_chat_id, channel_id, user.id)
-
-    if success:
-        # Create keyboard with "main menu" button
-        keyboard = [[InlineKeyboardButton("🏠 На главную", callback_data="main_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await message.reply_text(
+    # Save the binding and send the (optimistic) confirmation concurrently
+    success, _ = await asyncio.gather(
+        db.bind_chat_channel_async(selected_chat_id, channel_id, user.id),
+        message.reply_text(
             f"✅ **Настройка завершена!**\n\n"
             f"📺 Канал: {channel_title}\n"
             f"🔗 Связан с выбранным чатом\n\n"
             f"Теперь все отредактированные сообщения будут пересылаться в этот канал.",
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=MAIN_MENU_MARKUP
         )
-        logger.info(f"Successfully bound chat {selected_chat_id} to channel {channel_id} for user {user.id}")
+    )
+
+    if success:
+        logger.info("Successfully bound chat %s to channel %s for user %s", selected_chat_id, channel_id, user.id)
     else:
+        # The confirmation is already out - correct it
         await message.reply_text(
-            "❌ Произошла ошибка при сохранении настроек. Попробуйте позже."
+            "❌ Произошла ошибка при сохранении настроек. Канал не был привязан, попробуйте позже."
         )
-        logger.error(f"Failed to bind chat {selected_chat_id} to channel {channel_id} for user {user.id}")
+        logger.error("Failed to bind chat %s to channel %s for user %s", selected_chat_id, channel_id, user.id)
 
     # Clear user context
-    context.user_data.clear()
+    _reset_flow(context)
 
 
 async def setup_channel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -255,23 +420,26 @@ async def setup_channel_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
     # Store selected chat in user context
     context.user_data['selected_chat_id'] = chat_id
     context.user_data['waiting_for_channel'] = True
 
-    await query.edit_message_text(
+    await ack_and_edit(
+        query,
         f"✅ Чат выбран!\n\n"
         f"📺 Теперь перешлите любое сообщение из канала, куда я должен пересылать "
         f"отредактированные сообщения.\n\n"
         f"❗ **Важно:** Я должен быть администратором в этом канале!",
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} started channel setup for chat {chat_id}")
+    logger.info("User %s started channel setup for chat %s", user.id, chat_id)
 
 
 async def toggle_delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -279,39 +447,41 @@ async def toggle_delete_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
     # Get current setting
-    current_setting = db.get_delete_messages_setting(chat_id)
+    current_setting = await db.get_delete_messages_setting_async(chat_id)
     new_setting = not current_setting
 
     # Update setting
-    success = db.set_delete_messages_setting(chat_id, new_setting)
+    success = await db.set_delete_messages_setting_async(chat_id, new_setting)
 
     if success:
         status = "включено" if new_setting else "отключено"
         action = "включено" if new_setting else "отключено"
 
-        # Create keyboard with "main menu" button
-        keyboard = [[InlineKeyboardButton("🏠 На главную", callback_data="main_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = MAIN_MENU_MARKUP
 
-        await query.edit_message_text(
+        await ack_and_edit_panel(
+            query,
             f"✅ **Настройка обновлена!**\n\n"
             f"🗑️ Удаление отредактированных сообщений: {status}\n\n"
             f"Используйте /chats чтобы вернуться к настройкам.",
-            parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup,
+            parse_mode='Markdown'
         )
-        logger.info(f"User {user.id} {'enabled' if new_setting else 'disabled'} message deletion for chat {chat_id}")
+        logger.info("User %s %s message deletion for chat %s", user.id, 'enabled' if new_setting else 'disabled', chat_id)
     else:
-        await query.edit_message_text(
+        await ack_and_edit(
+            query,
             "❌ Произошла ошибка при обновлении настроек. Попробуйте позже."
         )
-        logger.error(f"Failed to toggle delete setting for chat {chat_id} by user {user.id}")
+        logger.error("Failed to toggle delete setting for chat %s by user %s", chat_id, user.id)
 
 
 async def back_to_chats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -319,38 +489,11 @@ async def back_to_chats_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Clear user context
-    context.user_data.clear()
+    _reset_flow(context)
 
-    # Get user's chats from database
-    user_chats = db.get_user_chats(user.id)
-
-    if not user_chats:
-        await query.edit_message_text(
-            "📭 У вас пока нет активных чатов.\n\n"
-            "Добавьте меня в групповой чат как администратора, "
-            "и я автоматически добавлю его в список."
-        )
-        return
-
-    # Create inline keyboard with chat buttons
-    keyboard = []
-    for chat_data in user_chats:
-        chat_title = format_chat_title_from_data(chat_data)
-        callback_data = f"setup_chat_{chat_data['chat_id']}"
-        keyboard.append([InlineKeyboardButton(chat_title, callback_data=callback_data)])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.edit_message_text(
-        "📋 **Ваши чаты где я администратор:**\n\n"
-        "Выберите чат для настройки:",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
-    logger.info(f"User {user.id} returned to chats list")
+    await _render_chat_list(user.id, partial(ack_and_edit, query))
+    logger.info("User %s returned to chats list", user.id)
 
 
 async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -358,38 +501,11 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Clear user context
-    context.user_data.clear()
-
-    # Get user's chats from database
-    user_chats = db.get_user_chats(user.id)
+    _reset_flow(context)
 
-    if not user_chats:
-        await query.edit_message_text(
-            "📭 У вас пока нет активных чатов.\n\n"
-            "Добавьте меня в групповой чат как администратора, "
-            "и я автоматически добавлю его в список."
-        )
-        return
-
-    # Create inline keyboard with chat buttons
-    keyboard = []
-    for chat_data in user_chats:
-        chat_title = format_chat_title_from_data(chat_data)
-        callback_data = f"setup_chat_{chat_data['chat_id']}"
-        keyboard.append([InlineKeyboardButton(chat_title, callback_data=callback_data)])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.edit_message_text(
-        "📋 **Ваши чаты где я администратор:**\n\n"
-        "Выберите чат для настройки:",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
-    logger.info(f"User {user.id} returned to main menu")
+    await _render_chat_list(user.id, partial(ack_and_edit, query))
+    logger.info("User %s returned to main menu", user.id)
 
 
 async def set_edit_time_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -397,13 +513,15 @@ async def set_edit_time_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
     # Get current setting
-    current_time = db.get_max_edit_time_setting(chat_id)
+    current_time = await db.get_max_edit_time_setting_async(chat_id)
 
     # Create inline keyboard with time options
     keyboard = []
@@ -420,17 +538,18 @@ async def set_edit_time_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     for minutes, label in time_options:
         button_text = f"✅ {label}" if minutes == current_time else label
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"set_time_{chat_id}_{minutes}")])
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"{Op.SET_TIME}:{chat_id}:{minutes}")])
 
     # Custom time input option
-    keyboard.append([InlineKeyboardButton("⌨️ Ввести вручную", callback_data=f"custom_time_{chat_id}")])
+    keyboard.append([InlineKeyboardButton("⌨️ Ввести вручную", callback_data=f"{Op.CUSTOM_TIME}:{chat_id}")])
 
     # Back button
-    keyboard.append([InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"setup_chat_{chat_id}")])
+    keyboard.append([InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"{Op.SETUP_CHAT}:{chat_id}")])
 
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    await query.edit_message_text(
+    await ack_and_edit(
+        query,
         f"⏱️ **Настройка времени редактирования**\n\n"
         f"Текущее значение: {current_time} мин\n\n"
         f"Выберите время для контроля редактирования сообщений "
@@ -441,7 +560,7 @@ async def set_edit_time_callback(update: Update, context: ContextTypes.DEFAULT_T
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} opened edit time settings for chat {chat_id}")
+    logger.info("User %s opened edit time settings for chat %s", user.id, chat_id)
 
 
 async def set_time_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -449,36 +568,41 @@ async def set_time_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id and minutes from callback data
-    parts = query.data.split('_')
-    chat_id = int(parts[2])
-    minutes = int(parts[3])
+    cb = parse_chat_cb(query.data)
+    if cb is None or cb.arg is None or not 0 <= cb.arg <= 20:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    _, chat_id, minutes = cb
+
+    # Re-picking the current option (its ✅ button stays clickable) needs no write or edit
+    if minutes == await db.get_max_edit_time_setting_async(chat_id):
+        await query.answer("Уже выбрано")
+        return
 
     # Set the new time limit
-    success = db.set_max_edit_time_setting(chat_id, minutes)
+    success = await db.set_max_edit_time_setting_async(chat_id, minutes)
 
     if success:
         time_text = f"{minutes} мин" if minutes > 0 else "без ограничений"
 
-        # Create keyboard with "back to settings" button
-        keyboard = [[InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"setup_chat_{chat_id}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _back_to_settings_markup(chat_id)
 
-        await query.edit_message_text(
+        await ack_and_edit_panel(
+            query,
             f"✅ **Настройка обновлена!**\n\n"
             f"⏱️ Максимальное время редактирования: {time_text}\n\n"
             f"Используйте /chats чтобы вернуться к настройкам.",
-            parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup,
+            parse_mode='Markdown'
         )
-        logger.info(f"User {user.id} set edit time limit for chat {chat_id} to {minutes} minutes")
+        logger.info("User %s set edit time limit for chat %s to %s minutes", user.id, chat_id, minutes)
     else:
-        await query.edit_message_text(
+        await ack_and_edit(
+            query,
             "❌ Произошла ошибка при обновлении настроек. Попробуйте позже."
         )
-        logger.error(f"Failed to set edit time limit for chat {chat_id} by user {user.id}")
+        logger.error("Failed to set edit time limit for chat %s by user %s", chat_id, user.id)
 
 
 async def custom_time_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -486,15 +610,18 @@ async def custom_time_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
     # Store chat_id in user context
     context.user_data['waiting_for_custom_time'] = chat_id
 
-    await query.edit_message_text(
+    await ack_and_edit(
+        query,
         f"⌨️ **Ввод времени вручную**\n\n"
         f"Введите число от 0 до 20 (минуты):\n\n"
         f"• 0 = без ограничений\n"
@@ -502,7 +629,7 @@ async def custom_time_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         f"Отправьте число в ответном сообщении:",
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} started custom time input for chat {chat_id}")
+    logger.info("User %s started custom time input for chat %s", user.id, chat_id)
 
 
 async def handle_custom_time_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -516,42 +643,38 @@ async def handle_custom_time_input(update: Update, context: ContextTypes.DEFAULT
 
     chat_id = context.user_data['waiting_for_custom_time']
 
-    try:
-        # Parse the input
-        minutes = int(message.text.strip())
-
-        # Validate range
-        if minutes < 0 or minutes > 20:
-            raise ValueError("Time out of range")
-
-        # Set the time limit
-        success = db.set_max_edit_time_setting(chat_id, minutes)
-
-        if success:
-            time_text = f"{minutes} мин" if minutes > 0 else "без ограничений"
-
-            await message.reply_text(
-                f"✅ **Настройка обновлена!**\n\n"
-                f"⏱️ Максимальное время редактирования: {time_text}\n\n"
-                f"Используйте /chats чтобы вернуться к настройкам.",
-                parse_mode='Markdown'
-            )
-            logger.info(f"User {user.id} set custom edit time limit for chat {chat_id} to {minutes} minutes")
-        else:
-            await message.reply_text(
-                "❌ Произошла ошибка при сохранении настроек. Попробуйте позже."
-            )
-            logger.error(f"Failed to save custom edit time for chat {chat_id} by user {user.id}")
-
-    except ValueError:
+    # Validate without exceptions; the length cap rejects huge inputs before int()
+    # (isdecimal() rather than isdigit(): int() cannot parse characters like '²')
+    text = (message.text or "").strip()
+    if len(text) > 2 or not text.isdecimal() or int(text) > 20:
         await message.reply_text(
             "❌ Пожалуйста, введите число от 0 до 20.\n\n"
             "Попробуйте еще раз или используйте /chats для возврата к меню."
         )
         return
+    minutes = int(text)
+
+    # Set the time limit
+    success = await db.set_max_edit_time_setting_async(chat_id, minutes)
+
+    if success:
+        time_text = f"{minutes} мин" if minutes > 0 else "без ограничений"
+
+        await message.reply_text(
+            f"✅ **Настройка обновлена!**\n\n"
+            f"⏱️ Максимальное время редактирования: {time_text}\n\n"
+            f"Используйте /chats чтобы вернуться к настройкам.",
+            parse_mode='Markdown'
+        )
+        logger.info("User %s set custom edit time limit for chat %s to %s minutes", user.id, chat_id, minutes)
+    else:
+        await message.reply_text(
+            "❌ Произошла ошибка при сохранении настроек. Попробуйте позже."
+        )
+        logger.error("Failed to save custom edit time for chat %s by user %s", chat_id, user.id)
 
     # Clear user context
-    context.user_data.clear()
+    _reset_flow(context)
 
 
 async def help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -561,24 +684,52 @@ async def help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     await query.answer()
 
-    help_text = (
-        "📋 **Как настроить бота:**\n\n"
-        "1. Добавьте меня в групповой чат как администратора\n"
-        "2. Добавьте меня в канал как администратора\n"
-        "3. Нажмите \"⚙️ Настроить чаты\" для связи чат→канал\n\n"
-        "❗ **Важно:** Я должен быть администратором везде!"
-    )
-
-    # Create keyboard with back button
-    keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="main_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     await query.edit_message_text(
-        help_text,
-        reply_markup=reply_markup,
+        HELP_TEXT,
+        reply_markup=HELP_MARKUP,
         parse_mode='Markdown'
     )
-    logger.info(f"Help shown to user {user.id}")
+    logger.info("Help shown to user %s", user.id)
+
+
+async def outdated_button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answer callback queries no other handler matched, e.g. buttons from an older callback layout"""
+    query = update.callback_query
+    logger.info("Outdated callback data %r from user %s", query.data, query.from_user.id)
+    await query.answer(OUTDATED_BUTTON_TEXT)
+
+
+def _render_moderator(chat_id: int, moderator: ModeratorRow) -> Tuple[InlineKeyboardButton, str]:
+    """Render a moderator as a remove button and a Markdown line for the moderator list"""
+    moderator_id = moderator.moderator_user_id
+    moderator_username = moderator.moderator_username
+    moderator_name = moderator.moderator_name
+
+    # Skip the username when moderator_name already contains it (e.g., "Qwerty (@s3s3s)")
+    show_username = moderator_username and not moderator.name_contains_username
+
+    # Button: plain text, truncated
+    button_parts = []
+    if moderator_name:
+        button_parts.append(moderator_name)
+    if show_username:
+        button_parts.append(f"@{moderator_username}")
+    if not button_parts:
+        button_parts.append(f"ID: {moderator_id}")
+    display_name = " | ".join(button_parts)
+    if len(display_name) > 30:  # Truncate if too long
+        display_name = display_name[:27] + "..."
+    button = InlineKeyboardButton(f"👤 {display_name}", callback_data=f"{Op.REMOVE_MODERATOR}:{chat_id}:{moderator_id}")
+
+    # List line: Markdown pre-escaped at write time, with the ID always shown
+    line_parts = []
+    if moderator_name:
+        line_parts.append(f"Имя: {moderator.moderator_name_md}")
+    if show_username:
+        line_parts.append(f"Username: @{moderator.moderator_username_md}")
+    line_parts.append(f"ID: `{moderator_id}`")
+
+    return button, "• " + " | ".join(line_parts)
 
 
 async def manage_moderators_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -586,106 +737,55 @@ async def manage_moderators_callback(update: Update, context: ContextTypes.DEFAU
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
-    # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    await query.answer()
+
+    # Check admin rights and load the current moderators concurrently
+    is_admin, moderators = await asyncio.gather(
+        _require_admin(chat_id, user.id, context),
+        db.get_chat_moderators_async(chat_id)
+    )
+    if not is_admin:
         await query.edit_message_text(
             "❌ У вас нет прав для управления модераторами этого чата."
         )
         return
 
-    # Get current moderators
-    moderators = db.get_chat_moderators(chat_id)
-
-    # Create keyboard
+    # One pass over the moderators renders both the remove buttons and the text lines
     keyboard = []
-
-    # List current moderators
-    if moderators:
-        for moderator in moderators:
-            moderator_id = moderator['moderator_user_id']
-            moderator_username = moderator.get('moderator_username')
-            moderator_name = moderator.get('moderator_name')
-
-            # Create display name
-            display_parts = []
-
-            # Check if moderator_name already contains username in parentheses
-            name_has_username = False
-            if moderator_name and moderator_username:
-                # Check if username is already in the name (e.g., "Qwerty (@s3s3s)")
-                name_has_username = f"(@{moderator_username})" in moderator_name
-
-            if moderator_name:
-                display_parts.append(moderator_name)
-
-            # Only add separate username if it's not already in the name
-            if moderator_username and not name_has_username:
-                display_parts.append(f"@{moderator_username}")
-
-            if not display_parts:
-                display_parts.append(f"ID: {moderator_id}")
-
-            display_name = " | ".join(display_parts)
-            if len(display_name) > 30:  # Truncate if too long
-                display_name = display_name[:27] + "..."
-
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"👤 {display_name}",
-                    callback_data=f"remove_moderator_{chat_id}_{moderator_id}"
-                )
-            ])
+    moderator_list = []
+    for moderator in moderators:
+        button, line = _render_moderator(chat_id, moderator)
+        keyboard.append([button])
+        moderator_list.append(line)
 
     # Add new moderator button
-    keyboard.append([InlineKeyboardButton("➕ Добавить модератора", callback_data=f"add_moderator_options_{chat_id}")])
+    keyboard.append([InlineKeyboardButton("➕ Добавить модератора", callback_data=f"{Op.ADD_MODERATOR_OPTIONS}:{chat_id}")])
 
     # Back button
-    keyboard.append([InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"setup_chat_{chat_id}")])
+    keyboard.append([InlineKeyboardButton("⬅️ Назад к настройкам", callback_data=f"{Op.SETUP_CHAT}:{chat_id}")])
 
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    if moderators:
-        moderator_list = []
-        for mod in moderators:
-            moderator_id = mod['moderator_user_id']
-            moderator_username = mod.get('moderator_username')
-            moderator_name = mod.get('moderator_name')
-
-            # Create display info
-            display_parts = []
-
-            # Check if moderator_name already contains username in parentheses
-            name_has_username = False
-            if moderator_name and moderator_username:
-                # Check if username is already in the name (e.g., "Qwerty (@s3s3s)")
-                name_has_username = f"(@{moderator_username})" in moderator_name
-
-            if moderator_name:
-                display_parts.append(f"Имя: {escape_markdown_safe(moderator_name)}")
-
-            # Only add separate username field if it's not already in the name
-            if moderator_username and not name_has_username:
-                display_parts.append(f"Username: @{escape_markdown_safe(moderator_username)}")
-
-            display_parts.append(f"ID: `{moderator_id}`")
-
-            moderator_list.append("• " + " | ".join(display_parts))
-
-        text = f"👥 **Управление модераторами**\n\nТекущие модераторы:\n" + "\n".join(moderator_list) + "\n\nВыберите действие:"
+    # Build the text in a single formatting step instead of chained concatenations
+    if moderator_list:
+        body = "Текущие модераторы:\n" + "\n".join(moderator_list)
     else:
-        text = f"👥 **Управление модераторами**\n\nВ этом чате пока нет модераторов.\n\nВыберите действие:"
+        body = "В этом чате пока нет модераторов."
+    text = f"👥 **Управление модераторами**\n\n{body}\n\nВыберите действие:"
 
     await query.edit_message_text(
         text,
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} opened moderator management for chat {chat_id}")
+    logger.info("User %s opened moderator management for chat %s", user.id, chat_id)
 
 
 async def add_moderator_options_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -693,25 +793,23 @@ async def add_moderator_options_callback(update: Update, context: ContextTypes.D
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
+
+    await query.answer()
 
     # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    if not await _require_admin(chat_id, user.id, context):
         await query.edit_message_text(
             "❌ У вас нет прав для добавления модераторов."
         )
         return
 
-    # Create keyboard with two options
-    keyboard = [
-        [InlineKeyboardButton("🔢 Ввести ID вручную", callback_data=f"add_moderator_manual_{chat_id}")],
-        [InlineKeyboardButton("📨 Переслать сообщение", callback_data=f"add_moderator_forward_{chat_id}")],
-        [InlineKeyboardButton("⬅️ Назад к управлению", callback_data=f"manage_moderators_{chat_id}")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = _add_moderator_options_markup(chat_id)
 
     await query.edit_message_text(
         f"👤 **Добавление модератора**\n\n"
@@ -719,7 +817,7 @@ async def add_moderator_options_callback(update: Update, context: ContextTypes.D
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} opened moderator addition options for chat {chat_id}")
+    logger.info("User %s opened moderator addition options for chat %s", user.id, chat_id)
 
 
 async def remove_moderator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -727,15 +825,17 @@ async def remove_moderator_callback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id and moderator_id from callback data
-    parts = query.data.split('_')
-    chat_id = int(parts[2])
-    moderator_id = int(parts[3])
+    cb = parse_chat_cb(query.data)
+    if cb is None or cb.arg is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    _, chat_id, moderator_id = cb
+
+    await query.answer()
 
     # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    if not await _require_admin(chat_id, user.id, context):
         await query.edit_message_text(
             "❌ У вас нет прав для удаления модераторов."
         )
@@ -743,8 +843,8 @@ async def remove_moderator_callback(update: Update, context: ContextTypes.DEFAUL
 
     # Create confirmation keyboard
     keyboard = [
-        [InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_remove_moderator_{chat_id}_{moderator_id}")],
-        [InlineKeyboardButton("❌ Отмена", callback_data=f"manage_moderators_{chat_id}")]
+        [InlineKeyboardButton("✅ Да, удалить", callback_data=f"{Op.CONFIRM_REMOVE_MODERATOR}:{chat_id}:{moderator_id}")],
+        [InlineKeyboardButton("❌ Отмена", callback_data=f"{Op.MANAGE_MODERATORS}:{chat_id}")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -755,7 +855,7 @@ async def remove_moderator_callback(update: Update, context: ContextTypes.DEFAUL
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} requested to remove moderator {moderator_id} from chat {chat_id}")
+    logger.info("User %s requested to remove moderator %s from chat %s", user.id, moderator_id, chat_id)
 
 
 async def confirm_remove_moderator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -763,27 +863,27 @@ async def confirm_remove_moderator_callback(update: Update, context: ContextType
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id and moderator_id from callback data
-    parts = query.data.split('_')
-    chat_id = int(parts[3])
-    moderator_id = int(parts[4])
+    cb = parse_chat_cb(query.data)
+    if cb is None or cb.arg is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    _, chat_id, moderator_id = cb
+
+    await query.answer()
 
     # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    if not await _require_admin(chat_id, user.id, context):
         await query.edit_message_text(
             "❌ У вас нет прав для удаления модераторов."
         )
         return
 
     # Remove moderator
-    success = db.remove_moderator(chat_id, moderator_id)
+    success = await db.remove_moderator_async(chat_id, moderator_id)
 
     if success:
-        # Create keyboard with back button
-        keyboard = [[InlineKeyboardButton("⬅️ Назад к управлению", callback_data=f"manage_moderators_{chat_id}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _back_to_moderators_markup(chat_id, "⬅️ Назад к управлению")
 
         await query.edit_message_text(
             f"✅ **Модератор удален!**\n\n"
@@ -792,12 +892,12 @@ async def confirm_remove_moderator_callback(update: Update, context: ContextType
             reply_markup=reply_markup,
             parse_mode='Markdown'
         )
-        logger.info(f"User {user.id} successfully removed moderator {moderator_id} from chat {chat_id}")
+        logger.info("User %s successfully removed moderator %s from chat %s", user.id, moderator_id, chat_id)
     else:
         await query.edit_message_text(
             "❌ Произошла ошибка при удалении модератора. Попробуйте позже."
         )
-        logger.error(f"Failed to remove moderator {moderator_id} from chat {chat_id} by user {user.id}")
+        logger.error("Failed to remove moderator %s from chat %s by user %s", moderator_id, chat_id, user.id)
 
 
 # Handler for moderator ID input
@@ -820,28 +920,25 @@ async def handle_moderator_id_input(update: Update, context: ContextTypes.DEFAUL
         if moderator_id <= 0:
             raise ValueError("Invalid user ID")
 
-        # Check if user is admin of this chat
-        if not db.is_chat_admin(chat_id, user.id):
+        # Admin check, duplicate check and insert in one statement
+        # (username and name will be None for manual ID input)
+        status = await db.add_moderator_if_admin_async(chat_id, moderator_id, user.id, None, None)
+
+        if status == 'forbidden':
             await message.reply_text(
                 "❌ У вас нет прав для добавления модераторов."
             )
             return
 
-        # Check if user is already a moderator
-        if db.is_moderator(chat_id, moderator_id):
+        if status == 'exists':
             await message.reply_text(
                 f"❌ Пользователь `{moderator_id}` уже является модератором этого чата.",
                 parse_mode='Markdown'
             )
             return
 
-        # Add moderator (username and name will be None for manual ID input)
-        success = db.add_moderator(chat_id, moderator_id, user.id, None, None)
-
-        if success:
-            # Create keyboard with back button to moderator management
-            keyboard = [[InlineKeyboardButton("⬅️ Назад к управлению модераторами", callback_data=f"manage_moderators_{chat_id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        if status == 'added':
+            reply_markup = _back_to_moderators_markup(chat_id)
 
             await message.reply_text(
                 f"✅ **Модератор добавлен!**\n\n"
@@ -850,12 +947,12 @@ async def handle_moderator_id_input(update: Update, context: ContextTypes.DEFAUL
                 parse_mode='Markdown',
                 reply_markup=reply_markup
             )
-            logger.info(f"User {user.id} successfully added moderator {moderator_id} to chat {chat_id}")
+            logger.info("User %s successfully added moderator %s to chat %s", user.id, moderator_id, chat_id)
         else:
             await message.reply_text(
                 "❌ Произошла ошибка при добавлении модератора. Попробуйте позже."
             )
-            logger.error(f"Failed to add moderator {moderator_id} to chat {chat_id} by user {user.id}")
+            logger.error("Failed to add moderator %s to chat %s by user %s", moderator_id, chat_id, user.id)
 
     except ValueError:
         await message.reply_text(
@@ -864,8 +961,8 @@ async def handle_moderator_id_input(update: Update, context: ContextTypes.DEFAUL
         )
         return
 
-    # Clear user context
-    context.user_data.clear()
+    # Clear only the moderator input state; other flows keep theirs
+    _reset_flow(context, _MODERATOR_FLOW_KEYS)
 
 
 async def add_moderator_manual_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -873,13 +970,16 @@ async def add_moderator_manual_callback(update: Update, context: ContextTypes.DE
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
-    # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    # Check if user is admin of this chat while the callback is being answered
+    _, is_admin = await asyncio.gather(query.answer(), _require_admin(chat_id, user.id, context))
+    if not is_admin:
         await query.edit_message_text(
             "❌ У вас нет прав для добавления модераторов."
         )
@@ -888,13 +988,8 @@ async def add_moderator_manual_callback(update: Update, context: ContextTypes.DE
     # Store chat_id in user context
     context.user_data['waiting_for_moderator_id'] = chat_id
 
-    await query.edit_message_text(
-        f"👤 **Добавление модератора**\n\n"
-        f"Отправьте ID пользователя, которого хотите добавить как модератора.\n\n"
-        f"ID можно узнать через бота @userinfobot или посмотреть в логах бота.",
-        parse_mode='Markdown'
-    )
-    logger.info(f"User {user.id} started manual moderator addition for chat {chat_id}")
+    await query.edit_message_text(ADD_MODERATOR_MANUAL_TEXT, parse_mode='Markdown')
+    logger.info("User %s started manual moderator addition for chat %s", user.id, chat_id)
 
 
 async def add_moderator_forward_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -902,13 +997,16 @@ async def add_moderator_forward_callback(update: Update, context: ContextTypes.D
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
     # Extract chat_id from callback data
-    chat_id = int(query.data.split('_')[-1])
+    cb = parse_chat_cb(query.data)
+    if cb is None:
+        await query.answer(OUTDATED_BUTTON_TEXT)
+        return
+    chat_id = cb.chat_id
 
-    # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
+    # Check if user is admin of this chat while the callback is being answered
+    _, is_admin = await asyncio.gather(query.answer(), _require_admin(chat_id, user.id, context))
+    if not is_admin:
         await query.edit_message_text(
             "❌ У вас нет прав для добавления модераторов."
         )
@@ -917,13 +1015,8 @@ async def add_moderator_forward_callback(update: Update, context: ContextTypes.D
     # Store chat_id in user context
     context.user_data['waiting_for_moderator_forward'] = chat_id
 
-    await query.edit_message_text(
-        f"📨 **Добавление модератора через пересылку**\n\n"
-        f"Перешлите любое сообщение от пользователя, которого хотите добавить как модератора.\n\n"
-        f"❗ **Важно:** Сообщение должно быть переслано из личного чата или группы, а не из канала.",
-        parse_mode='Markdown'
-    )
-    logger.info(f"User {user.id} started forward moderator addition for chat {chat_id}")
+    await query.edit_message_text(ADD_MODERATOR_FORWARD_TEXT, parse_mode='Markdown')
+    logger.info("User %s started forward moderator addition for chat %s", user.id, chat_id)
 
 
 async def _handle_moderator_forward_internal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -931,51 +1024,50 @@ async def _handle_moderator_forward_internal(update: Update, context: ContextTyp
     user = update.effective_user
     message = update.message
 
-    logger.info(f"Processing moderator addition for user {user.id}")
+    logger.info("Processing moderator addition for user %s", user.id)
 
     chat_id = context.user_data['waiting_for_moderator_forward']
 
-    # Check if user is admin of this chat
-    if not db.is_chat_admin(chat_id, user.id):
-        await message.reply_text(
-            "❌ У вас нет прав для добавления модераторов."
-        )
-        return
-
     # Check if message is forwarded and get user info
     moderator_user = None
 
     # Try new format first (forward_origin from api_kwargs)
-    if hasattr(message, 'api_kwargs') and 'forward_origin' in message.api_kwargs:
-        forward_origin = message.api_kwargs['forward_origin']
-        if isinstance(forward_origin, dict):
-            forward_type = forward_origin.get('type')
-            if forward_type == 'user':
-                sender_user_data = forward_origin.get('sender_user')
-                if sender_user_data:
-                    from telegram import User
-                    moderator_user = User.de_json(sender_user_data, context.bot)
-                    logger.info(f"Using api_kwargs forward_origin.sender_user format for user {moderator_user.id}")
-            elif forward_type == 'hidden_user':
-                # Handle hidden user case - cannot add as moderator due to privacy settings
-                logger.info(f"Forwarded message is from hidden user: {forward_origin.get('sender_user_name', 'unknown')}")
-                await message.reply_text(
-                    "❌ Невозможно добавить этого пользователя как модератора.\n\n"
-                    "У пользователя установлены настройки приватности, которые не позволяют "
-                    "видеть его профиль и идентификатор.\n\n"
-                    "Попробуйте ввести ID пользователя вручную или попросите пользователя "
-                    "изменить настройки приватности."
-                )
-                return
+    forward_origin = message.api_kwargs.get('forward_origin')
+    if isinstance(forward_origin, dict):
+        forward_type = forward_origin.get('type')
+        if forward_type == 'user':
+            sender_user_data = forward_origin.get('sender_user')
+            if sender_user_data:
+                moderator_user = User.de_json(sender_user_data, context.bot)
+                logger.info("Using api_kwargs forward_origin.sender_user format for user %s", moderator_user.id)
+        elif forward_type == 'hidden_user':
+            # Handle hidden user case - cannot add as moderator due to privacy settings
+            logger.info("Forwarded message is from hidden user: %s", forward_origin.get('sender_user_name', 'unknown'))
+            await message.reply_text(
+                "❌ Невозможно добавить этого пользователя как модератора.\n\n"
+                "У пользователя установлены настройки приватности, которые не позволяют "
+                "видеть его профиль и идентификатор.\n\n"
+                "Попробуйте ввести ID пользователя вручную или попросите пользователя "
+                "изменить настройки приватности."
+            )
+            return
+    else:
+        # Parsed forward_origin on newer PTB versions
+        moderator_user = getattr(getattr(message, 'forward_origin', None), 'sender_user', None)
 
     # Fallback to old format (forward_from)
-    if not moderator_user and hasattr(message, 'forward_from') and message.forward_from:
-        moderator_user = message.forward_from
-        logger.info(f"Using forward_from format for user {moderator_user.id}")
+    if not moderator_user:
+        moderator_user = getattr(message, 'forward_from', None)
+        if moderator_user:
+            logger.info("Using forward_from format for user %s", moderator_user.id)
 
     # If still no user info, error
     if not moderator_user:
-        logger.warning(f"No user info found in forwarded message. api_kwargs forward_origin: {message.api_kwargs.get('forward_origin') if hasattr(message, 'api_kwargs') else None}, forward_from: {getattr(message, 'forward_from', None)}")
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "No user info found in forwarded message. api_kwargs forward_origin: %s, forward_from: %s",
+                forward_origin, getattr(message, 'forward_from', None)
+            )
         await message.reply_text(
             "❌ Не удалось получить информацию о пользователе из пересланного сообщения.\n\n"
             "Убедитесь, что пересылаете сообщение от пользователя (не от канала или бота).\n"
@@ -988,39 +1080,43 @@ async def _handle_moderator_forward_internal(update: Update, context: ContextTyp
         moderator_id = moderator_user.id
         moderator_name = moderator_user.first_name or "Пользователь"
 
-        if hasattr(moderator_user, 'last_name') and moderator_user.last_name:
-            moderator_name += f" {moderator_user.last_name}"
+        last_name = getattr(moderator_user, 'last_name', None)
+        if last_name:
+            moderator_name += f" {last_name}"
 
-        if hasattr(moderator_user, 'username') and moderator_user.username:
-            moderator_name += f" (@{moderator_user.username})"
+        username = getattr(moderator_user, 'username', None)
+        if username:
+            moderator_name += f" (@{username})"
 
-        logger.info(f"Extracted moderator info: ID={moderator_id}, Name='{moderator_name}'")
+        logger.info("Extracted moderator info: ID=%s, Name=%r", moderator_id, moderator_name)
 
     except Exception as e:
-        logger.error(f"Error extracting user info from moderator_user object: {e}")
-        logger.error(f"moderator_user object: {moderator_user}")
+        logger.error("Error extracting user info from moderator_user object: %s", e)
+        logger.error("moderator_user object: %s", moderator_user)
         await message.reply_text(
             "❌ Произошла ошибка при обработке данных пользователя.\n\n"
             "Попробуйте ввести ID пользователя вручную."
         )
         return
 
-    # Check if user is already a moderator
-    is_already_moderator = await db.is_moderator_async(chat_id, moderator_id)
-    if is_already_moderator:
+    # Admin check, duplicate check and insert in one statement
+    status = await db.add_moderator_if_admin_async(chat_id, moderator_id, user.id, moderator_user.username, moderator_name)
+
+    if status == 'forbidden':
+        await message.reply_text(
+            "❌ У вас нет прав для добавления модераторов."
+        )
+        return
+
+    if status == 'exists':
         await message.reply_text(
             f"❌ Пользователь {escape_markdown_safe(moderator_name)} (ID: `{moderator_id}`) уже является модератором этого чата.",
             parse_mode='Markdown'
         )
         return
 
-    # Add moderator with username and name
-    success = db.add_moderator(chat_id, moderator_id, user.id, moderator_user.username, moderator_name)
-
-    if success:
-        # Create keyboard with back button to moderator management
-        keyboard = [[InlineKeyboardButton("⬅️ Назад к управлению модераторами", callback_data=f"manage_moderators_{chat_id}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    if status == 'added':
+        reply_markup = _back_to_moderators_markup(chat_id)
 
         await message.reply_text(
             f"✅ **Модератор добавлен!**\n\n"
@@ -1030,15 +1126,27 @@ async def _handle_moderator_forward_internal(update: Update, context: ContextTyp
             parse_mode='Markdown',
             reply_markup=reply_markup
         )
-        logger.info(f"User {user.id} successfully added moderator {moderator_id} via forward for chat {chat_id}")
+        logger.info("User %s successfully added moderator %s via forward for chat %s", user.id, moderator_id, chat_id)
     else:
         await message.reply_text(
             "❌ Произошла ошибка при добавлении модератора. Попробуйте позже."
         )
-        logger.error(f"Failed to add moderator {moderator_id} via forward for chat {chat_id} by user {user.id}")
+        logger.error("Failed to add moderator %s via forward for chat %s by user %s", moderator_id, chat_id, user.id)
+
+    # Clear only the moderator input state; other flows keep theirs
+    _reset_flow(context, _MODERATOR_FLOW_KEYS)
 
-    # Clear user context
-    context.user_data.clear()
+
+def _moderated_chat_parts(chat: ModeratedChatRow) -> Iterator[str]:
+    """Yield the display fields of a chat where the user is a moderator (Markdown pre-escaped at write time)"""
+    yield f"{chat.chat_title} (ID: `{chat.chat_id}`)"
+
+    if chat.moderator_name:
+        yield f"Ваш ник: {chat.moderator_name_md}"
+
+    # Only add separate username field if it's not already in the name (e.g., "Qwerty (@s3s3s)")
+    if chat.moderator_username and not chat.name_contains_username:
+        yield f"Ваш username: @{chat.moderator_username_md}"
 
 
 async def moderator_info_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1046,73 +1154,37 @@ async def moderator_info_callback(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     user = query.from_user
 
-    await query.answer()
-
-    # Find chats where user is moderator
-    moderated_chats = db.get_user_moderated_chats(user.id)
-
-    # Also check for admin chats
-    admin_chats = db.get_user_chats(user.id)
+    # Chats where user is moderator and admin chats are independent - fetch both
+    # at once, together with answering the callback
+    _, moderated_chats, admin_chats = await asyncio.gather(
+        query.answer(),
+        db.get_user_moderated_chats_async(user.id),
+        db.get_user_chats_async(user.id)
+    )
 
     if moderated_chats or admin_chats:
-        text = f"👨‍💼 **Информация о правах**\n\n"
+        parts = [MODERATOR_INFO_HEADER]
 
         if moderated_chats:
-            chat_list = []
-            for chat in moderated_chats:
-                chat_title = chat['chat_title']
-                chat_id = chat['chat_id']
-                moderator_username = chat.get('moderator_username')
-                moderator_name = chat.get('moderator_name')
-
-                # Create display info
-                display_parts = [f"{chat_title} (ID: `{chat_id}`)"]
-
-                # Check if moderator_name already contains username in parentheses
-                name_has_username = False
-                if moderator_name and moderator_username:
-                    # Check if username is already in the name (e.g., "Qwerty (@s3s3s)")
-                    name_has_username = f"(@{moderator_username})" in moderator_name
-
-                if moderator_name:
-                    display_parts.append(f"Ваш ник: {escape_markdown_safe(moderator_name)}")
-
-                # Only add separate username field if it's not already in the name
-                if moderator_username and not name_has_username:
-                    display_parts.append(f"Ваш username: @{escape_markdown_safe(moderator_username)}")
-
-                chat_list.append("• " + " | ".join(display_parts))
-
-            text += f"**Вы модератор в следующих чатах:**\n" + "\n".join(chat_list) + "\n\n"
+            chat_list = "\n".join("• " + " | ".join(_moderated_chat_parts(chat)) for chat in moderated_chats)
+            parts.append(f"**Вы модератор в следующих чатах:**\n{chat_list}\n\n")
 
         if admin_chats:
-            admin_chat_list = "\n".join([f"• {chat['chat_title']} (ID: `{chat['chat_id']}`)" for chat in admin_chats])
-            text += f"**Вы администратор в следующих чатах:**\n{admin_chat_list}\n\n"
-
-        text += f"**Ваши права:**\n" \
-                f"✅ Неограниченное редактирование сообщений\n" \
-                f"✅ Ваши отредактированные сообщения не удаляются\n" \
-                f"✅ Ваши изменения не пересылаются в канал\n\n" \
-                f"Вы можете редактировать сообщения в любое время без последствий."
+            admin_chat_list = "\n".join(f"• {chat.chat_title} (ID: `{chat.chat_id}`)" for chat in admin_chats)
+            parts.append(f"**Вы администратор в следующих чатах:**\n{admin_chat_list}\n\n")
+
+        parts.append(MODERATOR_RIGHTS_TEXT)
+        text = "".join(parts)
     else:
-        text = f"👨‍💼 **Информация о правах**\n\n" \
-               f"У вас нет активных прав модератора или администратора ни в одном чате.\n\n" \
-               f"Обратитесь к администратору чата для получения прав."
+        text = NO_RIGHTS_INFO_TEXT
 
     # Create keyboard with back button (we need to find a way to get back to the original chat)
     # For now, just go to main menu
-    keyboard = [[InlineKeyboardButton("🏠 На главную", callback_data="main_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = MAIN_MENU_MARKUP
 
     await query.edit_message_text(
         text,
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
-    logger.info(f"User {user.id} viewed moderator information")
-
-
-def format_chat_title_from_data(chat_data: dict) -> str:
-    """Format chat title from database data"""
-    title = chat_data.get('chat_title', f"Chat {chat_data['chat_id']}")
-    return title[:50] + "..." if len(title) > 50 else title
\ No newline at end of file
+    logger.info("User %s viewed moderator information", user.id)
@@ -6,8 +6,12 @@ Handles message editing events and forwarding
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ChatType
+import asyncio
 import logging
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Tuple
 from datetime import datetime, timedelta
+from string import Template
 
 from bot.database.database import db
 from bot.utils.helpers import (
@@ -19,11 +23,94 @@ from bot.utils.helpers import (
     check_bot_channel_permissions,
     safe_send_to_channel,
     forward_message_to_channel,
-    send_media_to_channel
+    send_media_to_channel,
+    invalidate_cached_roles
 )
 
 logger = logging.getLogger(__name__)
 
+# Per-chat edit queues and their workers: chats are processed in parallel, edits within a chat in order
+_chat_queues: Dict[int, asyncio.Queue] = {}
+_chat_workers: Dict[int, asyncio.Task] = {}
+# Seconds a worker waits on an empty queue before exiting
+_WORKER_IDLE_TIMEOUT = 60
+# Pending edits per chat; when full, the handler waits for the worker to catch up
+_EDIT_QUEUE_MAXSIZE = 100
+
+# Channel notification layout; optional lines are rendered into the *_extra and media_block slots
+NOTIFICATION_TEMPLATE = Template("""🔄 **ОТРЕДАКТИРОВАННОЕ СООБЩЕНИЕ УДАЛЕНО**
+
+👤 **ДАННЫЕ ПОЛЬЗОВАТЕЛЯ:**
+• ID: `$user_id`
+• Имя: $user_name
+• Username: $username
+• Тип: $user_type$user_extra
+
+📍 **ДАННЫЕ ЧАТА:**
+• Название: $chat_title
+• ID чата: `$chat_id`
+• Тип чата: `$chat_type`$chat_extra
+
+📝 **ДАННЫЕ СООБЩЕНИЯ:**
+• ID сообщения: `$message_id`$message_extra$media_block
+
+💬 **СОДЕРЖИМОЕ:**
+$content
+⚠️ **Действие:** $action""")
+
+# Constant labels, escaped once at import time
+_YES = escape_markdown('Да')
+_NO = escape_markdown('Нет')
+_ADDED = escape_markdown('Добавлен')
+_NOT_ADDED = escape_markdown('Не добавлен')
+
+
+@lru_cache(maxsize=None)
+def _escaped_chat_type(chat_type: ChatType) -> str:
+    """Escaped chat type label; there are only a handful of ChatType values"""
+    return escape_markdown(chat_type.value)
+
+
+# Optional user attributes kept when truthy
+_USER_OPTIONAL_FIELDS = ('last_name', 'username', 'language_code', 'is_premium', 'added_to_attachment_menu')
+
+# Bot-only capability attributes and their notification labels, kept when not None
+_BOT_FIELDS = (
+    ('can_join_groups', 'Может присоединяться к группам'),
+    ('can_read_all_group_messages', 'Читает все сообщения'),
+    ('supports_inline_queries', 'Поддерживает inline'),
+    ('can_connect_to_business', 'Бизнес подключение'),
+    ('has_main_web_app', 'Есть Web App'),
+)
+
+
+def _photo_info(photo) -> dict:
+    largest = photo[-1]  # Последний - самый большой
+    return {
+        'type': 'photo',
+        'count': len(photo),
+        'file_id': largest.file_id,
+        'width': largest.width,
+        'height': largest.height
+    }
+
+
+def _file_info(media_type: str, fields: Tuple[str, ...], media) -> dict:
+    info = {'type': media_type, 'file_id': media.file_id}
+    for field in fields:
+        info[field] = getattr(media, field, None)
+    return info
+
+
+# Media attribute -> media_info extractor, checked in this order (first match wins)
+_MEDIA_EXTRACTORS: Dict[str, Callable[[Any], dict]] = {
+    'photo': _photo_info,
+    'video': partial(_file_info, 'video', ('duration', 'width', 'height', 'file_size')),
+    'document': partial(_file_info, 'document', ('file_name', 'mime_type', 'file_size')),
+    'audio': partial(_file_info, 'audio', ('duration', 'title', 'performer', 'file_size')),
+    'voice': partial(_file_info, 'voice', ('duration', 'file_size')),
+}
+
 
 async def send_channel_notification(edited_message, chat, user, edited_text, has_media, media_type, media_info, media_forward_success, delete_success, channel_id, context):
     """Send notification about edited message to channel"""
@@ -36,32 +123,20 @@ async def send_channel_notification(edited_message, chat, user, edited_text, has
     user_data['first_name'] = user.first_name
 
     # Опциональные поля пользователя
-    if hasattr(user, 'last_name') and user.last_name:
-        user_data['last_name'] = user.last_name
-    if hasattr(user, 'username') and user.username:
-        user_data['username'] = user.username
-    if hasattr(user, 'language_code') and user.language_code:
-        user_data['language_code'] = user.language_code
-    if hasattr(user, 'is_premium') and user.is_premium:
-        user_data['is_premium'] = user.is_premium
-    if hasattr(user, 'added_to_attachment_menu') and user.added_to_attachment_menu:
-        user_data['added_to_attachment_menu'] = user.added_to_attachment_menu
+    for attr in _USER_OPTIONAL_FIELDS:
+        value = getattr(user, attr, None)
+        if value:
+            user_data[attr] = value
 
     # Дополнительные поля для ботов (обычно недоступны в сообщениях от пользователей)
     if user.is_bot:
-        if hasattr(user, 'can_join_groups') and user.can_join_groups is not None:
-            user_data['can_join_groups'] = user.can_join_groups
-        if hasattr(user, 'can_read_all_group_messages') and user.can_read_all_group_messages is not None:
-            user_data['can_read_all_group_messages'] = user.can_read_all_group_messages
-        if hasattr(user, 'supports_inline_queries') and user.supports_inline_queries is not None:
-            user_data['supports_inline_queries'] = user.supports_inline_queries
-        if hasattr(user, 'can_connect_to_business') and user.can_connect_to_business is not None:
-            user_data['can_connect_to_business'] = user.can_connect_to_business
-        if hasattr(user, 'has_main_web_app') and user.has_main_web_app is not None:
-            user_data['has_main_web_app'] = user.has_main_web_app
+        for attr, _ in _BOT_FIELDS:
+            value = getattr(user, attr, None)
+            if value is not None:
+                user_data[attr] = value
 
     # Логирование всех данных пользователя
-    logger.info(f"Complete user data: {user_data}")
+    logger.info("Complete user data: %s", user_data)
 
     # Создаем детальное сообщение с безопасной обработкой данных
     user_display_name = user_data.get('first_name', 'Unknown')
@@ -70,150 +145,116 @@ async def send_channel_notification(edited_message, chat, user, edited_text, has
 
     username_display = f"@{user_data['username']}" if user_data.get('username') else "без username"
 
-    # Создаем сообщение с максимальной информацией, используя безопасное экранирование
-    formatted_message = f"""🔄 **ОТРЕДАКТИРОВАННОЕ СООБЩЕНИЕ УДАЛЕНО**
-
-👤 **ДАННЫЕ ПОЛЬЗОВАТЕЛЯ:**
-• ID: `{escape_markdown(str(user_data['id']))}`
-• Имя: {escape_markdown_safe(user_display_name)}
-• Username: {escape_markdown_safe(username_display)}
-• Тип: {'🤖 Бот' if user_data['is_bot'] else '👨‍💻 Пользователь'}"""
-
-    # Добавляем опциональные данные если они есть
+    # Собираем необязательные строки каждого раздела, затем рендерим весь шаблон за один проход
+    user_lines = []
     if user_data.get('language_code'):
-        formatted_message += f"\n• Язык: `{escape_markdown(user_data['language_code'])}`"
+        user_lines.append(f"\n• Язык: `{escape_markdown(user_data['language_code'])}`")
 
     if user_data.get('is_premium'):
-        formatted_message += f"\n• 💎 Telegram Premium: {escape_markdown('Да' if user_data['is_premium'] else 'Нет')}"
+        user_lines.append(f"\n• 💎 Telegram Premium: {_YES if user_data['is_premium'] else _NO}")
 
     if user_data.get('added_to_attachment_menu'):
-        formatted_message += f"\n• Меню вложений: {escape_markdown('Добавлен' if user_data['added_to_attachment_menu'] else 'Не добавлен')}"
+        user_lines.append(f"\n• Меню вложений: {_ADDED if user_data['added_to_attachment_menu'] else _NOT_ADDED}")
 
     # Для ботов - дополнительная информация
     if user_data['is_bot']:
-        if user_data.get('can_join_groups') is not None:
-            formatted_message += f"\n• Может присоединяться к группам: {'Да' if user_data['can_join_groups'] else 'Нет'}"
-        if user_data.get('can_read_all_group_messages') is not None:
-            formatted_message += f"\n• Читает все сообщения: {'Да' if user_data['can_read_all_group_messages'] else 'Нет'}"
-        if user_data.get('supports_inline_queries') is not None:
-            formatted_message += f"\n• Поддерживает inline: {'Да' if user_data['supports_inline_queries'] else 'Нет'}"
-        if user_data.get('can_connect_to_business') is not None:
-            formatted_message += f"\n• Бизнес подключение: {'Да' if user_data['can_connect_to_business'] else 'Нет'}"
-        if user_data.get('has_main_web_app') is not None:
-            formatted_message += f"\n• Есть Web App: {'Да' if user_data['has_main_web_app'] else 'Нет'}"
-
-    # Информация о чате
-    chat_title = escape_markdown_safe(chat.title or "Неизвестный чат")
-    formatted_message += f"""
+        for attr, label in _BOT_FIELDS:
+            if user_data.get(attr) is not None:
+                user_lines.append(f"\n• {label}: {_YES if user_data[attr] else _NO}")
 
-📍 **ДАННЫЕ ЧАТА:**
-• Название: {chat_title}
-• ID чата: `{escape_markdown(str(chat.id))}`
-• Тип чата: `{escape_markdown(chat.type.value)}`"""
-
-    # Добавляем дополнительные данные чата если доступны
+    # Дополнительные данные чата если доступны
+    chat_lines = []
     if hasattr(chat, 'username') and chat.username:
-        formatted_message += f"\n• Username чата: @{escape_markdown(chat.username)}"
+        chat_lines.append(f"\n• Username чата: @{escape_markdown(chat.username)}")
 
     if hasattr(chat, 'description') and chat.description:
         chat_desc = escape_markdown_safe(truncate_text(chat.description, 100))
-        formatted_message += f"\n• Описание: {chat_desc}"
-
-    # Информация о сообщении
-    formatted_message += f"""
+        chat_lines.append(f"\n• Описание: {chat_desc}")
 
-📝 **ДАННЫЕ СООБЩЕНИЯ:**
-• ID сообщения: `{escape_markdown(str(edited_message.message_id))}`"""
-
-    # Время редактирования
+    # Время редактирования и отправки, пересылка и reply
+    message_lines = []
     if edited_message.edit_date:
         edit_time = edited_message.edit_date.strftime('%d.%m.%Y %H:%M:%S')
-        formatted_message += f"\n• Время редактирования: `{escape_markdown(edit_time)}`"
+        message_lines.append(f"\n• Время редактирования: `{escape_markdown(edit_time)}`")
 
-    # Время отправки оригинального сообщения
     if edited_message.date:
         send_time = edited_message.date.strftime('%d.%m.%Y %H:%M:%S')
-        formatted_message += f"\n• Время отправки: `{escape_markdown(send_time)}`"
+        message_lines.append(f"\n• Время отправки: `{escape_markdown(send_time)}`")
 
-    # Добавляем информацию о пересылке если есть
     if hasattr(edited_message, 'forward_origin') and edited_message.forward_origin:
-        formatted_message += f"\n• Переслано: Да"
+        message_lines.append("\n• Переслано: Да")
 
-    # Информация о reply если есть
     if hasattr(edited_message, 'reply_to_message') and edited_message.reply_to_message:
-        formatted_message += f"\n• Ответ на сообщение: `{escape_markdown(str(edited_message.reply_to_message.message_id))}`"
+        message_lines.append(f"\n• Ответ на сообщение: `{escape_markdown(str(edited_message.reply_to_message.message_id))}`")
 
-    # Добавляем информацию о медиа если есть
+    # Информация о медиа если есть
+    media_lines = []
     if has_media:
-        formatted_message += f"""
-
-📎 **МЕДИА-ФАЙЛ:**
-• Тип: {media_type.upper()}"""
+        media_lines.append(f"\n\n📎 **МЕДИА-ФАЙЛ:**\n• Тип: {media_type.upper()}")
 
         if media_type == 'photo':
-            formatted_message += f"\n• Количество размеров: {escape_markdown(str(media_info['count']))}"
-            largest = media_info['sizes'][-1]  # Последний - самый большой
-            formatted_message += f"\n• Разрешение: {escape_markdown(str(largest['width']))}x{escape_markdown(str(largest['height']))}"
+            media_lines.append(f"\n• Количество размеров: {escape_markdown(str(media_info['count']))}")
+            media_lines.append(f"\n• Разрешение: {escape_markdown(str(media_info['width']))}x{escape_markdown(str(media_info['height']))}")
         elif media_type == 'video':
             if media_info.get('duration'):
-                formatted_message += f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек"
+                media_lines.append(f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек")
             if media_info.get('width') and media_info.get('height'):
-                formatted_message += f"\n• Разрешение: {escape_markdown(str(media_info['width']))}x{escape_markdown(str(media_info['height']))}"
+                media_lines.append(f"\n• Разрешение: {escape_markdown(str(media_info['width']))}x{escape_markdown(str(media_info['height']))}")
             if media_info.get('file_size'):
                 file_size_mb = media_info['file_size'] / 1024 / 1024
-                formatted_message += f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB"
+                media_lines.append(f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB")
         elif media_type == 'document':
             if media_info.get('file_name'):
-                formatted_message += f"\n• Имя файла: {escape_markdown_safe(media_info['file_name'])}"
+                media_lines.append(f"\n• Имя файла: {escape_markdown_safe(media_info['file_name'])}")
             if media_info.get('mime_type'):
-                formatted_message += f"\n• Тип файла: {escape_markdown(media_info['mime_type'])}"
+                media_lines.append(f"\n• Тип файла: {escape_markdown(media_info['mime_type'])}")
             if media_info.get('file_size'):
                 file_size_mb = media_info['file_size'] / 1024 / 1024
-                formatted_message += f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB"
+                media_lines.append(f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB")
         elif media_type == 'audio':
             if media_info.get('title'):
-                formatted_message += f"\n• Название: {escape_markdown_safe(media_info['title'])}"
+                media_lines.append(f"\n• Название: {escape_markdown_safe(media_info['title'])}")
             if media_info.get('performer'):
-                formatted_message += f"\n• Исполнитель: {escape_markdown_safe(media_info['performer'])}"
+                media_lines.append(f"\n• Исполнитель: {escape_markdown_safe(media_info['performer'])}")
             if media_info.get('duration'):
-                formatted_message += f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек"
+                media_lines.append(f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек")
             if media_info.get('file_size'):
                 file_size_mb = media_info['file_size'] / 1024 / 1024
-                formatted_message += f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB"
+                media_lines.append(f"\n• Размер файла: {escape_markdown(f'{file_size_mb:.1f}')} MB")
         elif media_type == 'voice':
             if media_info.get('duration'):
-                formatted_message += f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек"
+                media_lines.append(f"\n• Длительность: {escape_markdown(str(media_info['duration']))} сек")
             if media_info.get('file_size'):
                 file_size_kb = media_info['file_size'] / 1024
-                formatted_message += f"\n• Размер файла: {escape_markdown(f'{file_size_kb:.1f}')} KB"
-
-        formatted_message += f"\n• Пересылка: {'✅ Успешно' if media_forward_success else '❌ Не удалось'}"
-
-    # Добавляем текст сообщения
-    safe_text = escape_markdown(truncate_text(edited_text, 1000))
-    if edited_text != 'Текст недоступен' or has_media:
-        formatted_message += f"""
-
-💬 **СОДЕРЖИМОЕ:**
-{safe_text}
-"""
-    else:
-        formatted_message += f"""
-
-💬 **СОДЕРЖИМОЕ:**
-{safe_text}
-"""
-
-    formatted_message += f"⚠️ **Действие:** {'Сообщение удалено из чата' if delete_success else 'Сообщение оставлено в чате (удаление отключено)'}"
+                media_lines.append(f"\n• Размер файла: {escape_markdown(f'{file_size_kb:.1f}')} KB")
+
+        media_lines.append(f"\n• Пересылка: {'✅ Успешно' if media_forward_success else '❌ Не удалось'}")
+
+    formatted_message = NOTIFICATION_TEMPLATE.substitute(
+        user_id=escape_markdown(str(user_data['id'])),
+        user_name=escape_markdown_safe(user_display_name),
+        username=escape_markdown_safe(username_display),
+        user_type='🤖 Бот' if user_data['is_bot'] else '👨‍💻 Пользователь',
+        user_extra=''.join(user_lines),
+        chat_title=escape_markdown_safe(chat.title or "Неизвестный чат"),
+        chat_id=escape_markdown(str(chat.id)),
+        chat_type=_escaped_chat_type(chat.type),
+        chat_extra=''.join(chat_lines),
+        message_id=escape_markdown(str(edited_message.message_id)),
+        message_extra=''.join(message_lines),
+        media_block=''.join(media_lines),
+        content=escape_markdown(truncate_text(edited_text, 1000)),
+        action='Сообщение удалено из чата' if delete_success else 'Сообщение оставлено в чате (удаление отключено)',
+    )
 
     # Send notification to channel
-    logger.info(f"Sending notification to channel {channel_id}")
+    logger.info("Sending notification to channel %s", channel_id)
     success = await safe_send_to_channel(channel_id, formatted_message, context, 'MarkdownV2')
 
     if success:
-        logger.info(f"Successfully sent edited message notification to channel {channel_id}")
+        logger.info("Successfully sent edited message notification to channel %s", channel_id)
     else:
-        logger.error(f"Failed to send notification to channel {channel_id} - check bot permissions")
+        logger.error("Failed to send notification to channel %s - check bot permissions", channel_id)
 
         # Создаем простое текстовое сообщение как последний fallback
         try:
@@ -252,8 +293,7 @@ ID: {edited_message.message_id}
                 final_fallback_message += f"""Медиа: {media_type.upper()}
 """
                 if media_type == 'photo':
-                    largest = media_info['sizes'][-1]
-                    final_fallback_message += f"Разрешение: {largest['width']}x{largest['height']}\n"
+                    final_fallback_message += f"Разрешение: {media_info['width']}x{media_info['height']}\n"
                 elif media_type == 'video' and media_info.get('duration'):
                     final_fallback_message += f"Длительность: {media_info['duration']} сек\n"
                 elif media_type == 'document' and media_info.get('file_name'):
@@ -273,96 +313,108 @@ ID: {edited_message.message_id}
                 chat_id=channel_id,
                 text=final_fallback_message
             )
-            logger.info(f"Sent final fallback message to channel {channel_id}")
+            logger.info("Sent final fallback message to channel %s", channel_id)
         except Exception as final_error:
-            logger.error(f"Final fallback also failed for channel {channel_id}: {final_error}")
+            logger.error("Final fallback also failed for channel %s: %s", channel_id, final_error)
             logger.error("Check if bot is properly added to the channel and has required permissions")
 
 
 async def handle_edited_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle edited messages in group chats"""
+    """Handle edited messages in group chats by queueing them on their chat's worker"""
     logger.info("handle_edited_message called")
     
     # Check if this update contains an edited message
     if not update.edited_message:
         logger.debug("No edited_message in update, skipping")
         return
-    
+
+    chat_id = update.edited_message.chat.id
+    queue = _chat_queues.get(chat_id)
+    if queue is None:
+        queue = _chat_queues[chat_id] = asyncio.Queue(maxsize=_EDIT_QUEUE_MAXSIZE)
+        _chat_workers[chat_id] = asyncio.create_task(_chat_worker(chat_id, queue))
+    await queue.put((update, context))
+
+
+async def _chat_worker(chat_id: int, queue: asyncio.Queue) -> None:
+    """Process one chat's edited messages in arrival order, exiting after an idle period"""
+    try:
+        while True:
+            try:
+                update, context = await asyncio.wait_for(queue.get(), timeout=_WORKER_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # An item may have arrived while the timed-out get was being cancelled
+                if queue.empty():
+                    return
+                continue
+            try:
+                await _process_edited_message(update, context)
+            except Exception as e:
+                # Hand the error to the application's error handlers, like a handler error
+                await context.application.process_error(update, e)
+            finally:
+                queue.task_done()
+    finally:
+        if _chat_queues.get(chat_id) is queue:
+            del _chat_queues[chat_id]
+            _chat_workers.pop(chat_id, None)
+
+
+async def shutdown_edit_workers(timeout: float) -> None:
+    """Let queued edits finish for up to `timeout` seconds, then cancel the chat workers"""
+    queues = list(_chat_queues.values())
+    if queues:
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Edited message queues not drained within %s seconds, cancelling workers", timeout)
+
+    workers = list(_chat_workers.values())
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _process_edited_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Check and act on a single edited message"""
     edited_message = update.edited_message
     
-    logger.info(f"Processing edited message {edited_message.message_id} in chat {edited_message.chat.id}")
+    logger.info("Processing edited message %s in chat %s", edited_message.message_id, edited_message.chat.id)
     
     chat = edited_message.chat
     user = edited_message.from_user
     
-    logger.info(f"Chat type: {chat.type}, Chat ID: {chat.id}")
-    logger.info(f"User: {user.id} (@{user.username if user.username else 'no_username'})")
+    logger.info("Chat type: %s, Chat ID: %s", chat.type, chat.id)
+    logger.info("User: %s (@%s)", user.id, user.username if user.username else 'no_username')
     
     # Only process group/supergroup messages
     if chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
-        logger.info(f"Ignoring edited message from non-group chat {chat.id} (type: {chat.type})")
+        logger.info("Ignoring edited message from non-group chat %s (type: %s)", chat.id, chat.type)
         return
     
     # Ignore messages from bots
     if user.is_bot:
-        logger.info(f"Ignoring edited message from bot {user.id}")
+        logger.info("Ignoring edited message from bot %s", user.id)
         return
     
-    # Check if user is a moderator in the chat - moderators can edit without restrictions
-    try:
-        is_moderator = await db.is_moderator_async(chat.id, user.id)
-        logger.info(f"User {user.id} moderator status: {is_moderator}")
-        if is_moderator:
-            logger.info(f"Ignoring edited message from moderator {user.id} in chat {chat.id}")
-            return
-    except Exception as e:
-        logger.error(f"Error checking moderator status: {e}")
-        # Continue processing if we can't check moderator status
-
-    # Check if user is admin in the chat - admins should also be able to edit without restrictions
-    try:
-        is_admin = await is_user_admin(chat.id, user.id, context)
-        logger.info(f"User {user.id} admin status: {is_admin}")
-        if is_admin:
-            logger.info(f"Ignoring edited message from admin {user.id} in chat {chat.id}")
-            return
-    except Exception as e:
-        logger.error(f"Error checking admin status: {e}")
-        # Continue processing if we can't check admin status
-
-    # Admins are now checked above and their edits are ignored
-    
-    # Get channel for this chat
+    # Load channel, delete and max edit time settings for this chat in a single query.
+    # Settings are served from memory, so the edit-time limit is checked before the
+    # moderator and admin lookups, which most edits (within the limit) never need
     try:
-        channel_id = await db.get_chat_channel_async(chat.id)
-        logger.info(f"Channel ID for chat {chat.id}: {channel_id}")
-        if not channel_id:
-            logger.warning(f"No channel configured for chat {chat.id}")
-            return
+        delete_enabled, max_edit_time, channel_id = await db.get_chat_settings_async(chat.id)
+        logger.info("Settings for chat %s: channel=%s, delete=%s, max edit time=%s minutes", chat.id, channel_id, delete_enabled, max_edit_time)
     except Exception as e:
-        logger.error(f"Error getting channel for chat {chat.id}: {e}")
+        logger.error("Error getting settings for chat %s: %s", chat.id, e)
         return
 
-    # Check if message deletion is enabled for this chat
-    try:
-        delete_enabled = await db.get_delete_messages_setting_async(chat.id)
-        logger.info(f"Delete messages setting for chat {chat.id}: {delete_enabled}")
-    except Exception as e:
-        logger.error(f"Error getting delete setting for chat {chat.id}: {e}")
-        delete_enabled = True  # Default to enabled if error
-
-    # Check maximum edit time setting for this chat
-    try:
-        max_edit_time = await db.get_max_edit_time_setting_async(chat.id)
-        logger.info(f"Max edit time setting for chat {chat.id}: {max_edit_time} minutes")
-    except Exception as e:
-        logger.error(f"Error getting max edit time setting for chat {chat.id}: {e}")
-        max_edit_time = 20  # Default to 20 minutes if error
+    if not channel_id:
+        logger.warning("No channel configured for chat %s", chat.id)
+        return
 
     # Check if the edit time exceeds the maximum allowed time
     if max_edit_time == 0:
         # No time limit - process all edits immediately (delete right away)
-        logger.info(f"No time limit for chat {chat.id} - processing edit immediately for message {edited_message.message_id}")
+        logger.info("No time limit for chat %s - processing edit immediately for message %s", chat.id, edited_message.message_id)
         # Continue to message processing below
     elif max_edit_time > 0:
         try:
@@ -372,132 +424,125 @@ async def handle_edited_message(update: Update, context: ContextTypes.DEFAULT_TY
                 max_allowed_time = timedelta(minutes=max_edit_time)
 
                 if time_diff <= max_allowed_time:
-                    logger.info(f"Edit time within limit for message {edited_message.message_id}: "
-                              f"{time_diff.total_seconds()/60:.1f} minutes vs {max_edit_time} minutes limit")
+                    logger.info("Edit time within limit for message %s: %.1f minutes vs %s minutes limit",
+                                edited_message.message_id, time_diff.total_seconds()/60, max_edit_time)
                     return  # Ignore this edit - it is within the allowed time
                 else:
-                    logger.info(f"Edit time exceeded limit: {time_diff.total_seconds()/60:.1f} minutes - processing deletion")
+                    logger.info("Edit time exceeded limit: %.1f minutes - processing deletion", time_diff.total_seconds()/60)
             else:
-                logger.warning(f"Missing date information for message {edited_message.message_id}")
+                logger.warning("Missing date information for message %s", edited_message.message_id)
         except Exception as e:
-            logger.error(f"Error checking edit time for message {edited_message.message_id}: {e}")
+            logger.error("Error checking edit time for message %s: %s", edited_message.message_id, e)
             # Continue processing even if time check fails
 
+    # Check if user is a moderator in the chat - moderators can edit without restrictions
+    try:
+        is_moderator = await db.is_moderator_async(chat.id, user.id)
+        logger.info("User %s moderator status: %s", user.id, is_moderator)
+        if is_moderator:
+            logger.info("Ignoring edited message from moderator %s in chat %s", user.id, chat.id)
+            return
+    except Exception as e:
+        logger.error("Error checking moderator status: %s", e)
+        # Continue processing if we can't check moderator status
+
+    # Check if user is admin in the chat - admins should also be able to edit without restrictions
+    try:
+        is_admin = await is_user_admin(chat.id, user.id, context)
+        logger.info("User %s admin status: %s", user.id, is_admin)
+        if is_admin:
+            logger.info("Ignoring edited message from admin %s in chat %s", user.id, chat.id)
+            return
+    except Exception as e:
+        logger.error("Error checking admin status: %s", e)
+        # Continue processing if we can't check admin status
+
     # Get edited message text and check for media
     edited_text = edited_message.text or edited_message.caption or 'Текст недоступен'
-    logger.info(f"Edited message text: {edited_text[:100]}...")
+    logger.info("Edited message text: %s...", edited_text[:100])
 
     # Check if message contains media
     has_media = False
     media_type = None
     media_info = {}
 
-    if hasattr(edited_message, 'photo') and edited_message.photo:
-        has_media = True
-        media_type = 'photo'
-        media_info = {
-            'type': 'photo',
-            'count': len(edited_message.photo),
-            'sizes': [{'file_id': p.file_id, 'width': p.width, 'height': p.height} for p in edited_message.photo]
-        }
-    elif hasattr(edited_message, 'video') and edited_message.video:
-        has_media = True
-        media_type = 'video'
-        media_info = {
-            'type': 'video',
-            'file_id': edited_message.video.file_id,
-            'duration': getattr(edited_message.video, 'duration', None),
-            'width': getattr(edited_message.video, 'width', None),
-            'height': getattr(edited_message.video, 'height', None),
-            'file_size': getattr(edited_message.video, 'file_size', None)
-        }
-    elif hasattr(edited_message, 'document') and edited_message.document:
-        has_media = True
-        media_type = 'document'
-        media_info = {
-            'type': 'document',
-            'file_id': edited_message.document.file_id,
-            'file_name': getattr(edited_message.document, 'file_name', None),
-            'mime_type': getattr(edited_message.document, 'mime_type', None),
-            'file_size': getattr(edited_message.document, 'file_size', None)
-        }
-    elif hasattr(edited_message, 'audio') and edited_message.audio:
-        has_media = True
-        media_type = 'audio'
-        media_info = {
-            'type': 'audio',
-            'file_id': edited_message.audio.file_id,
-            'duration': getattr(edited_message.audio, 'duration', None),
-            'title': getattr(edited_message.audio, 'title', None),
-            'performer': getattr(edited_message.audio, 'performer', None),
-            'file_size': getattr(edited_message.audio, 'file_size', None)
-        }
-    elif hasattr(edited_message, 'voice') and edited_message.voice:
-        has_media = True
-        media_type = 'voice'
-        media_info = {
-            'type': 'voice',
-            'file_id': edited_message.voice.file_id,
-            'duration': getattr(edited_message.voice, 'duration', None),
-            'file_size': getattr(edited_message.voice, 'file_size', None)
-        }
-
-    logger.info(f"Message has media: {has_media}, type: {media_type}")
+    for attr, extract in _MEDIA_EXTRACTORS.items():
+        media = getattr(edited_message, attr, None)
+        if media:
+            has_media = True
+            media_type = attr
+            media_info = extract(media)
+            break
+
+    logger.info("Message has media: %s, type: %s", has_media, media_type)
     if has_media:
-        logger.info(f"Media info: {media_info}")
+        logger.info("Media info: %s", media_info)
 
-    logger.info(f"Processing edited message from user {user.id} in chat {chat.id}")
+    logger.info("Processing edited message from user %s in chat %s", user.id, chat.id)
 
     # Delete the edited message from group chat if enabled
-    delete_success = False
-    if delete_enabled:
-        try:
-            delete_success = await safe_delete_message(context, chat.id, edited_message.message_id)
-            if delete_success:
-                logger.info(f"Deleted edited message {edited_message.message_id} from chat {chat.id}")
-            else:
-                logger.warning(f"Failed to delete edited message {edited_message.message_id} from chat {chat.id}")
-        except Exception as e:
-            logger.error(f"Error deleting message: {e}")
-
-        # Forward media to channel only if deletion is enabled
-        media_forward_success = False
-        if has_media:
-            try:
-                logger.info(f"Attempting to forward media message to channel {channel_id}")
-                forwarded_msg_id = await forward_message_to_channel(
-                    from_chat_id=chat.id,
-                    message_id=edited_message.message_id,
-                    to_chat_id=channel_id,
-                    context=context
-                )
-
-                if forwarded_msg_id:
-                    media_forward_success = True
-                    logger.info(f"Successfully forwarded media message to channel {channel_id}, forwarded message ID: {forwarded_msg_id}")
-                else:
-                    logger.warning(f"Failed to forward media message to channel {channel_id}")
-                    # Try to send media separately as fallback
-                    if await send_media_to_channel(edited_message, channel_id, context, edited_text):
-                        media_forward_success = True
-                        logger.info(f"Successfully sent media via fallback method to channel {channel_id}")
-            except Exception as e:
-                logger.error(f"Error forwarding media message: {e}")
-                # Try to send media separately as fallback
-                try:
-                    if await send_media_to_channel(edited_message, channel_id, context, edited_text):
-                        media_forward_success = True
-                        logger.info(f"Successfully sent media via fallback method to channel {channel_id}")
-                except Exception as fallback_error:
-                    logger.error(f"Fallback media sending also failed: {fallback_error}")
-
-        # Send notification to channel only if deletion was successful
-        await send_channel_notification(edited_message, chat, user, edited_text, has_media, media_type, media_info, media_forward_success, delete_success, channel_id, context)
-    else:
-        logger.info(f"Message deletion disabled for chat {chat.id}, skipping deletion and channel notification")
+    if not delete_enabled:
+        logger.info("Message deletion disabled for chat %s, skipping deletion and channel notification", chat.id)
         # If deletion is disabled, we don't send anything to channel
         return
 
+    # Deletion and media forwarding are independent; the chat worker keeps notifications in order
+    delete_result, forward_result = await asyncio.gather(
+        _delete_edited_message(context, chat.id, edited_message.message_id),
+        # Forward media to channel only if deletion is enabled
+        _forward_edited_media(edited_message, chat.id, channel_id, edited_text, context) if has_media else _no_media(),
+        return_exceptions=True
+    )
+    delete_success = delete_result is True
+    media_forward_success = forward_result is True
+
+    await send_channel_notification(edited_message, chat, user, edited_text, has_media, media_type, media_info, media_forward_success, delete_success, channel_id, context)
+
+
+async def _no_media() -> bool:
+    return False
+
+
+async def _delete_edited_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> bool:
+    """Delete the edited message from the group, logging the outcome"""
+    try:
+        deleted = await safe_delete_message(context, chat_id, message_id)
+        if deleted:
+            logger.info("Deleted edited message %s from chat %s", message_id, chat_id)
+        else:
+            logger.warning("Failed to delete edited message %s from chat %s", message_id, chat_id)
+        return deleted
+    except Exception as e:
+        logger.error("Error deleting message: %s", e)
+        return False
+
+
+async def _forward_edited_media(edited_message, chat_id: int, channel_id: int, edited_text: str, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Forward the media message to the channel, re-sending it by file_id if forwarding fails"""
+    try:
+        logger.info("Attempting to forward media message to channel %s", channel_id)
+        forwarded_msg_id = await forward_message_to_channel(
+            from_chat_id=chat_id,
+            message_id=edited_message.message_id,
+            to_chat_id=channel_id,
+            context=context
+        )
+
+        if forwarded_msg_id:
+            logger.info("Successfully forwarded media message to channel %s, forwarded message ID: %s", channel_id, forwarded_msg_id)
+            return True
+        logger.warning("Failed to forward media message to channel %s", channel_id)
+    except Exception as e:
+        logger.error("Error forwarding media message: %s", e)
+
+    # Try to send media separately as fallback
+    try:
+        if await send_media_to_channel(edited_message, channel_id, context, edited_text):
+            logger.info("Successfully sent media via fallback method to channel %s", channel_id)
+            return True
+    except Exception as fallback_error:
+        logger.error("Fallback media sending also failed: %s", fallback_error)
+    return False
 
 
 async def handle_new_chat_members(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -508,26 +553,23 @@ async def handle_new_chat_members(update: Update, context: ContextTypes.DEFAULT_
     # Check if our bot was added
     for member in update.message.new_chat_members:
         if member.username == bot_user:
-            logger.info(f"Bot added to chat {chat.id} via new_chat_members event")
+            logger.info("Bot added to chat %s via new_chat_members event", chat.id)
 
             # Check if chat already exists in database
-            cursor = db.connection.cursor()
-            check_query = "SELECT admin_user_id FROM bot_chats WHERE chat_id = %s AND is_active = TRUE"
-            cursor.execute(check_query, (chat.id,))
-            existing_chat = cursor.fetchone()
-            cursor.close()
+            existing_admin_id = await db.get_chat_admin_async(chat.id)
 
-            if existing_chat:
+            if existing_admin_id is not None:
                 # Chat already exists, don't add it again
-                logger.info(f"Chat {chat.id} already exists in database for admin {existing_chat[0]}, skipping add")
+                logger.info("Chat %s already exists in database for admin %s, skipping add", chat.id, existing_admin_id)
                 return
 
             # Try to add chat to database - always assign to admin user 415409454
             user_id = 415409454  # Default admin user for all new chats
-            success = db.add_chat(chat.id, chat.title, chat.type.value, user_id)
+            success = await db.add_chat_async(chat.id, chat.title, chat.type.value, user_id)
 
             if success:
-                logger.info(f"Successfully added chat {chat.id} to database")
+                logger.info("Successfully added chat %s to database", chat.id)
+                invalidate_cached_roles(context.application, chat.id)
 
                 # Send notification to admin if we have user_id
                 if user_id:
@@ -541,7 +583,7 @@ async def handle_new_chat_members(update: Update, context: ContextTypes.DEFAULT_
                             parse_mode='MarkdownV2'
                         )
                     except Exception as e:
-                        logger.error(f"Failed to send notification to user {user_id}: {e}")
+                        logger.error("Failed to send notification to user %s: %s", user_id, e)
             else:
-                logger.error(f"Failed to add chat {chat.id} to database")
+                logger.error("Failed to add chat %s to database", chat.id)
             break
\ No newline at end of file
@@ -9,7 +9,7 @@ from telegram.constants import ChatType, ChatMemberStatus
 import logging
 
 from bot.database.database import db
-from bot.utils.helpers import is_bot_admin, get_chat_admins
+from bot.utils.helpers import is_bot_admin, get_chat_admins, invalidate_bot_admin, invalidate_cached_roles
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +21,7 @@ async def handle_bot_added_to_chat(update: Update, context: ContextTypes.DEFAULT
     
     # Skip if message is from GroupAnonymousBot (not a real user action)
     if message.from_user and message.from_user.username == "GroupAnonymousBot":
-        logger.debug(f"Skipping GroupAnonymousBot message in chat {chat.id}")
+        logger.debug("Skipping GroupAnonymousBot message in chat %s", chat.id)
         return
     
     # Only process group/supergroup chats
@@ -35,13 +35,13 @@ async def handle_bot_added_to_chat(update: Update, context: ContextTypes.DEFAULT
     if not bot_added:
         return
     
-    logger.info(f"Bot added to chat {chat.id} via legacy method")
+    logger.info("Bot added to chat %s via legacy method", chat.id)
     
     # Check if bot is admin and handle accordingly
     if await is_bot_admin(chat.id, context):
         await handle_bot_promoted_to_admin(chat, context)
     else:
-        logger.warning(f"Bot added to chat {chat.id} but is not admin")
+        logger.warning("Bot added to chat %s but is not admin", chat.id)
 
 
 async def handle_bot_removed_from_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -51,7 +51,7 @@ async def handle_bot_removed_from_chat(update: Update, context: ContextTypes.DEF
     
     # Skip if message is from GroupAnonymousBot (not a real user action)
     if message.from_user and message.from_user.username == "GroupAnonymousBot":
-        logger.debug(f"Skipping GroupAnonymousBot message in chat {chat.id}")
+        logger.debug("Skipping GroupAnonymousBot message in chat %s", chat.id)
         return
     
     # Check if bot was removed
@@ -60,11 +60,11 @@ async def handle_bot_removed_from_chat(update: Update, context: ContextTypes.DEF
         return
     
     # Deactivate chat in database
-    success = db.deactivate_chat(chat.id)
+    success = await db.deactivate_chat_async(chat.id)
     if success:
-        logger.info(f"Deactivated chat {chat.id} via legacy method")
+        logger.info("Deactivated chat %s via legacy method", chat.id)
     else:
-        logger.error(f"Failed to deactivate chat {chat.id}")
+        logger.error("Failed to deactivate chat %s", chat.id)
 
 
 async def handle_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -78,114 +78,107 @@ async def handle_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TY
     new_member = my_chat_member.new_chat_member
     
     # Log the full update for debugging
-    logger.info(f"my_chat_member update received for chat {chat.id} ({chat.type})")
-    logger.debug(f"Old status: {old_member.status if old_member else 'None'}")
-    logger.debug(f"New status: {new_member.status}")
+    logger.info("my_chat_member update received for chat %s (%s)", chat.id, chat.type)
+    logger.debug("Old status: %s", old_member.status if old_member else 'None')
+    logger.debug("New status: %s", new_member.status)
     
     # Process groups, supergroups, and channels
     if chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP, ChatType.CHANNEL]:
-        logger.debug(f"Ignoring chat type {chat.type} for chat {chat.id}")
+        logger.debug("Ignoring chat type %s for chat %s", chat.type, chat.id)
         return
     
     # Check if this is about our bot
     if new_member.user.id != context.bot.id:
-        logger.debug(f"Update not about our bot (user {new_member.user.id})")
+        logger.debug("Update not about our bot (user %s)", new_member.user.id)
         return
     
+    # Our status changed, so any cached admin check for this chat is stale
+    invalidate_bot_admin(chat.id, context.bot.id)
+    invalidate_cached_roles(context.application, chat.id)
+
     old_status = old_member.status if old_member else ChatMemberStatus.LEFT
     new_status = new_member.status
     
-    logger.info(f"Bot status changed in chat {chat.id} ({chat.title}): {old_status} -> {new_status}")
+    logger.info("Bot status changed in chat %s (%s): %s -> %s", chat.id, chat.title, old_status, new_status)
     
     # Bot was added/promoted to admin
     if new_status == ChatMemberStatus.ADMINISTRATOR:
-        logger.info(f"Bot promoted to admin in chat {chat.id}")
+        logger.info("Bot promoted to admin in chat %s", chat.id)
         if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
             # Only groups and supergroups are added to bot_chats table
             await handle_bot_promoted_to_admin(chat, context)
         elif chat.type == ChatType.CHANNEL:
             # Channels are NOT added to bot_chats table
             # They are managed exclusively through chat_channel_bindings table
-            logger.info(f"Bot added as admin to channel {chat.id} - channels are managed via bindings only")
+            logger.info("Bot added as admin to channel %s - channels are managed via bindings only", chat.id)
     
     # Bot was removed, kicked, or left
     elif new_status in [ChatMemberStatus.LEFT, ChatMemberStatus.BANNED]:
-        logger.info(f"Bot removed from {chat.type.value} {chat.id} (status: {new_status})")
+        logger.info("Bot removed from %s %s (status: %s)", chat.type.value, chat.id, new_status)
         
         try:
             if chat.type == ChatType.CHANNEL:
                 # For channels, we only need to deactivate channel bindings
-                success = db.deactivate_channel_bindings(chat.id)
+                success = await db.deactivate_channel_bindings_async(chat.id)
                 if success:
-                    logger.info(f"Successfully deactivated channel bindings for channel {chat.id}")
+                    logger.info("Successfully deactivated channel bindings for channel %s", chat.id)
                 else:
-                    logger.warning(f"No active bindings found for channel {chat.id}")
+                    logger.warning("No active bindings found for channel %s", chat.id)
                     
             else:
                 # For groups and supergroups, handle as before
-                cursor = db.connection.cursor()
-                check_query = "SELECT COUNT(*) FROM bot_chats WHERE chat_id = %s"
-                cursor.execute(check_query, (chat.id,))
-                exists = cursor.fetchone()[0] > 0
-                cursor.close()
-                
-                if exists:
-                    success = db.deactivate_chat(chat.id)
+                if await db.chat_exists_async(chat.id):
+                    success = await db.deactivate_chat_async(chat.id)
                     if success:
-                        logger.info(f"Successfully deactivated {chat.type.value} {chat.id} in database")
+                        logger.info("Successfully deactivated %s %s in database", chat.type.value, chat.id)
                         
                         # Also deactivate channel bindings for this chat
-                        removed_bindings = db.remove_chat_channel_binding(chat.id)
+                        removed_bindings = await db.remove_chat_channel_binding_async(chat.id)
                         if removed_bindings:
-                            logger.info(f"Deactivated channel bindings for {chat.type.value} {chat.id}")
+                            logger.info("Deactivated channel bindings for %s %s", chat.type.value, chat.id)
                             
                     else:
-                        logger.error(f"Failed to deactivate {chat.type.value} {chat.id} in database")
+                        logger.error("Failed to deactivate %s %s in database", chat.type.value, chat.id)
                 else:
-                    logger.warning(f"{chat.type.value} {chat.id} not found in database (was never properly added)")
+                    logger.warning("%s %s not found in database (was never properly added)", chat.type.value, chat.id)
                 
         except Exception as e:
-            logger.error(f"Error deactivating {chat.type.value} {chat.id}: {e}")
+            logger.error("Error deactivating %s %s: %s", chat.type.value, chat.id, e)
     
     # Bot was demoted from admin to member
     elif old_status == ChatMemberStatus.ADMINISTRATOR and new_status == ChatMemberStatus.MEMBER:
-        logger.info(f"Bot demoted from admin in chat {chat.id}")
+        logger.info("Bot demoted from admin in chat %s", chat.id)
         
         try:
-            success = db.deactivate_chat(chat.id)
+            success = await db.deactivate_chat_async(chat.id)
             if success:
-                logger.info(f"Deactivated chat {chat.id} - bot demoted from admin")
+                logger.info("Deactivated chat %s - bot demoted from admin", chat.id)
                 
                 # Also remove channel bindings since bot lost admin rights
-                removed_bindings = db.remove_chat_channel_binding(chat.id)
+                removed_bindings = await db.remove_chat_channel_binding_async(chat.id)
                 if removed_bindings:
-                    logger.info(f"Removed channel bindings for demoted bot in chat {chat.id}")
+                    logger.info("Removed channel bindings for demoted bot in chat %s", chat.id)
                     
         except Exception as e:
-            logger.error(f"Error handling bot demotion in chat {chat.id}: {e}")
+            logger.error("Error handling bot demotion in chat %s: %s", chat.id, e)
     
     # Bot became member (was added but not as admin)
     elif new_status == ChatMemberStatus.MEMBER:
-        logger.warning(f"Bot added to chat {chat.id} as regular member (not admin)")
+        logger.warning("Bot added to chat %s as regular member (not admin)", chat.id)
         
     else:
-        logger.info(f"Unhandled status change in chat {chat.id}: {old_status} -> {new_status}")
+        logger.info("Unhandled status change in chat %s: %s -> %s", chat.id, old_status, new_status)
 
 
 async def handle_bot_promoted_to_admin(chat, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle when bot gets admin rights in a chat"""
     try:
         # Check if chat already exists in database
-        cursor = db.connection.cursor()
-        check_query = "SELECT admin_user_id FROM bot_chats WHERE chat_id = %s AND is_active = TRUE"
-        cursor.execute(check_query, (chat.id,))
-        existing_chat = cursor.fetchone()
-        cursor.close()
+        admin_user_id = await db.get_chat_admin_async(chat.id)
 
-        if existing_chat:
+        if admin_user_id is not None:
             # Chat already exists, just send notification to current owner
-            admin_user_id = existing_chat[0]
-            logger.info(f"Chat {chat.id} already exists for admin {admin_user_id}, sending notification")
+            logger.info("Chat %s already exists for admin %s, sending notification", chat.id, admin_user_id)
 
             # Send notification to current admin
             try:
@@ -201,14 +194,14 @@ async def handle_bot_promoted_to_admin(chat, context: ContextTypes.DEFAULT_TYPE)
                     ),
                     parse_mode='Markdown'
                 )
-                logger.info(f"Notification sent to admin {admin_user_id}")
+                logger.info("Notification sent to admin %s", admin_user_id)
             except Exception as e:
-                logger.warning(f"Could not send notification to admin {admin_user_id}: {e}")
+                logger.warning("Could not send notification to admin %s: %s", admin_user_id, e)
         else:
             # Chat doesn't exist, this shouldn't happen as bot should be added via new_chat_members first
-            logger.warning(f"Chat {chat.id} promoted to admin but not found in database")
+            logger.warning("Chat %s promoted to admin but not found in database", chat.id)
 
-        logger.info(f"Bot promoted to admin in chat {chat.id}")
+        logger.info("Bot promoted to admin in chat %s", chat.id)
         
     except Exception as e:
-        logger.error(f"Error handling bot promotion in chat {chat.id}: {e}")
\ No newline at end of file
+        logger.error("Error handling bot promotion in chat %s: %s", chat.id, e)
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+In-process caching utilities for the Telegram bot
+"""
+
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+_MISSING = object()
+
+
+class KeyedLock:
+    """One asyncio.Lock per key, dropped once no task holds or waits for it.
+
+    Usage: `async with locks(key): ...`. Waiters are counted, so a caller arriving while
+    others are still queued always gets the same lock rather than a fresh one.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, List] = {}  # key -> [lock, holders + waiters]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._entries[key]
+
+
+class TTLCache:
+    """Small dict-based cache where every entry expires after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load_locks = KeyedLock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or `default` if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    async def get_or_load(self, key: Hashable, loader: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Return the cached value, or await loader(*args) and cache it.
+
+        Concurrent misses for the same key share one call; exceptions are not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        async with self._load_locks(key):
+            # Another waiter may have loaded the value meanwhile
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = await loader(*args)
+                self[key] = value
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._data.pop(key, None)
+        if len(self._data) >= self.maxsize:
+            self._evict()
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value (expired or not)"""
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove all entries for which predicate(key, value) is true"""
+        stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones until there is room"""
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        while len(self._data) >= self.maxsize:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            del self._data[next(iter(self._data))]
+
+
+def cached(cache_attr: str, key: Callable[..., Hashable]):
+    """Cache an async method's result in the TTLCache at `self.<cache_attr>` under key(*args).
+
+    Concurrent misses for the same key share one call; exceptions are not cached.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args):
+            cache: TTLCache = getattr(self, cache_attr)
+            return await cache.get_or_load(key(*args), method, self, *args)
+        return wrapper
+    return decorator
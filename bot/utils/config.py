@@ -21,6 +21,13 @@ class Config:
     # Database Configuration
     DATABASE_URL = os.getenv('DATABASE_URL')
     
+    # Async database driver: 'aiomysql' (default) or 'asyncmy' (faster, must be installed separately)
+    DB_ASYNC_DRIVER = os.getenv('DB_ASYNC_DRIVER', 'aiomysql').lower()
+    
+    # Async connection pool size
+    DB_POOL_MINSIZE = int(os.getenv('DB_POOL_MINSIZE', 5))
+    DB_POOL_MAXSIZE = int(os.getenv('DB_POOL_MAXSIZE', 25))
+    
     # Webhook Configuration
     WEBHOOK_URL = os.getenv('WEBHOOK_URL')
     WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8000))
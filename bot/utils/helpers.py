@@ -6,9 +6,16 @@ from typing import List, Optional
 from telegram import ChatMember, Chat, User
 from telegram.ext import ContextTypes
 import logging
+import re
+from functools import lru_cache
+
+from bot.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Bot admin status per (chat_id, bot_id); invalidated on my_chat_member updates
+_bot_admin_cache = TTLCache(maxsize=10_000, ttl=300)
+
 
 async def is_user_admin(chat_id: int, user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if user is admin in the chat"""
@@ -16,20 +23,41 @@ async def is_user_admin(chat_id: int, user_id: int, context: ContextTypes.DEFAUL
         member = await context.bot.get_chat_member(chat_id, user_id)
         return member.status in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]
     except Exception as e:
-        logger.error(f"Error checking admin status: {e}")
+        logger.error("Error checking admin status: %s", e)
         return False
 
 
 async def is_bot_admin(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Check if bot is admin in the chat"""
+    """Check if bot is admin in the chat (cached for 5 minutes, one API call per chat at a time)"""
     try:
-        bot_member = await context.bot.get_chat_member(chat_id, context.bot.id)
-        return bot_member.status in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]
+        return await _bot_admin_cache.get_or_load((chat_id, context.bot.id), _fetch_bot_admin, chat_id, context)
     except Exception as e:
-        logger.error(f"Error checking bot admin status: {e}")
+        logger.error("Error checking bot admin status: %s", e)
         return False
 
 
+async def _fetch_bot_admin(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    bot_member = await context.bot.get_chat_member(chat_id, context.bot.id)
+    return bot_member.status in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]
+
+
+def invalidate_bot_admin(chat_id: int, bot_id: int) -> None:
+    """Forget the cached bot admin status for a chat (bot was promoted/demoted/removed)"""
+    _bot_admin_cache.pop((chat_id, bot_id))
+
+
+def role_cache_key(chat_id: int) -> str:
+    """user_data key under which a user's (role, expires_at) for a chat is memoized"""
+    return f"role:{chat_id}"
+
+
+def invalidate_cached_roles(application, chat_id: int) -> None:
+    """Forget every user's memoized role for a chat (the chat was added, removed or changed admin)"""
+    key = role_cache_key(chat_id)
+    for user_data in application.user_data.values():
+        user_data.pop(key, None)
+
+
 async def check_bot_channel_permissions(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> dict:
     """Check bot permissions in channel and return detailed status"""
     result = {
@@ -61,13 +89,13 @@ async def check_bot_channel_permissions(chat_id: int, context: ContextTypes.DEFA
             # Обычный участник - может отправлять сообщения если канал не restricted
             result['can_post_messages'] = True
             
-        logger.info(f"Bot permissions in {chat_id}: {result}")
+        logger.info("Bot permissions in %s: %s", chat_id, result)
         return result
         
     except Exception as e:
         error_msg = str(e)
         result['error'] = error_msg
-        logger.error(f"Error checking bot permissions in channel {chat_id}: {error_msg}")
+        logger.error("Error checking bot permissions in channel %s: %s", chat_id, error_msg)
         
         # Пытаемся определить тип ошибки
         if "not found" in error_msg.lower() or "chat not found" in error_msg.lower():
@@ -86,7 +114,7 @@ async def get_chat_admins(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> L
         admins = await context.bot.get_chat_administrators(chat_id)
         return [admin for admin in admins if not admin.user.is_bot]
     except Exception as e:
-        logger.error(f"Error getting chat admins: {e}")
+        logger.error("Error getting chat admins: %s", e)
         return []
 
 
@@ -110,22 +138,26 @@ def format_chat_title(chat: Chat) -> str:
         return f"Chat {chat.id}"
 
 
+# Специальные символы MarkdownV2 (включая сам backslash), экранируются за один проход
+_MARKDOWN_SPECIAL_RE = re.compile(r'([\\_*\[\]()~`>#+\-=|{}.!])')
+
+
+# Короткие строки (метки, ID, даты) повторяются постоянно, их результат кэшируется
+_ESCAPE_CACHE_MAX_LEN = 64
+
+
+@lru_cache(maxsize=4096)
+def _escape_markdown_cached(text: str) -> str:
+    return _MARKDOWN_SPECIAL_RE.sub(r'\\\1', text)
+
+
 def escape_markdown(text: str) -> str:
     """Escape special markdown characters for MarkdownV2"""
     if not text:
         return ""
-    
-    # Список специальных символов для MarkdownV2
-    special_chars = [
-        '\\', '_', '*', '[', ']', '(', ')', '~', '`', 
-        '>', '#', '+', '-', '=', '|', '{', '}', '.', '!'
-    ]
-    
-    # Экранируем символы в правильном порядке (backslash первым)
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
-    
-    return text
+    if len(text) <= _ESCAPE_CACHE_MAX_LEN:
+        return _escape_markdown_cached(text)
+    return _MARKDOWN_SPECIAL_RE.sub(r'\\\1', text)
 
 
 def escape_markdown_safe(text: str) -> str:
@@ -140,8 +172,9 @@ def escape_markdown_safe(text: str) -> str:
         # Заменяем переносы строк на пробелы для безопасности
         text = text.replace('\n', ' ').replace('\r', ' ')
         
-        # Удаляем непечатаемые символы
-        text = ''.join(char for char in text if char.isprintable() or char.isspace())
+        # Удаляем непечатаемые символы (посимвольный проход только если они есть)
+        if not text.isprintable():
+            text = ''.join(char for char in text if char.isprintable() or char.isspace())
         
         # Обрезаем до разумной длины
         if len(text) > 3000:
@@ -149,7 +182,7 @@ def escape_markdown_safe(text: str) -> str:
         
         return escape_markdown(text)
     except Exception as e:
-        logger.error(f"Error in escape_markdown_safe: {e}")
+        logger.error("Error in escape_markdown_safe: %s", e)
         # Возвращаем безопасную версию без специальных символов
         return ''.join(char for char in str(text) if char.isalnum() or char.isspace())[:1000]
 
@@ -164,26 +197,26 @@ def truncate_text(text: str, max_length: int = 4000) -> str:
 async def safe_delete_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> bool:
     """Safely delete a message"""
     try:
-        logger.info(f"Attempting to delete message {message_id} in chat {chat_id}")
+        logger.info("Attempting to delete message %s in chat %s", message_id, chat_id)
         
         # Проверяем, является ли бот администратором
         bot_member = await context.bot.get_chat_member(chat_id, context.bot.id)
-        logger.info(f"Bot status in chat {chat_id}: {bot_member.status}")
+        logger.info("Bot status in chat %s: %s", chat_id, bot_member.status)
         
         if bot_member.status not in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]:
-            logger.warning(f"Bot is not admin in chat {chat_id}, cannot delete message")
+            logger.warning("Bot is not admin in chat %s, cannot delete message", chat_id)
             return False
             
         # Проверяем права на удаление сообщений
         if hasattr(bot_member, 'can_delete_messages') and not bot_member.can_delete_messages:
-            logger.warning(f"Bot doesn't have can_delete_messages permission in chat {chat_id}")
+            logger.warning("Bot doesn't have can_delete_messages permission in chat %s", chat_id)
             return False
         
         await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-        logger.info(f"Successfully deleted message {message_id} in chat {chat_id}")
+        logger.info("Successfully deleted message %s in chat %s", message_id, chat_id)
         return True
     except Exception as e:
-        logger.error(f"Error deleting message {message_id} in chat {chat_id}: {e}")
+        logger.error("Error deleting message %s in chat %s: %s", message_id, chat_id, e)
         return False
 
 
@@ -193,7 +226,7 @@ async def safe_send_message(chat_id: int, text: str, context: ContextTypes.DEFAU
         message = await context.bot.send_message(chat_id=chat_id, text=text, **kwargs)
         return message.message_id
     except Exception as e:
-        logger.error(f"Error sending message to chat {chat_id}: {e}")
+        logger.error("Error sending message to chat %s: %s", chat_id, e)
         return None
 
 
@@ -204,11 +237,11 @@ async def safe_send_to_channel(chat_id: int, text: str, context: ContextTypes.DE
         permissions = await check_bot_channel_permissions(chat_id, context)
         
         if permissions['error']:
-            logger.error(f"Channel permissions error: {permissions['error']}")
+            logger.error("Channel permissions error: %s", permissions['error'])
             return False
             
         if not permissions['can_post_messages']:
-            logger.error(f"Bot cannot post messages to channel {chat_id}")
+            logger.error("Bot cannot post messages to channel %s", chat_id)
             return False
         
         # Пытаемся отправить с указанным parse_mode
@@ -219,10 +252,10 @@ async def safe_send_to_channel(chat_id: int, text: str, context: ContextTypes.DE
                     text=text,
                     parse_mode=parse_mode
                 )
-                logger.info(f"Successfully sent message to channel {chat_id} with {parse_mode}")
+                logger.info("Successfully sent message to channel %s with %s", chat_id, parse_mode)
                 return True
             except Exception as parse_error:
-                logger.warning(f"Failed to send with {parse_mode}: {parse_error}")
+                logger.warning("Failed to send with %s: %s", parse_mode, parse_error)
                 # Продолжаем к fallback
         
         # Fallback: отправляем без parse_mode
@@ -231,14 +264,14 @@ async def safe_send_to_channel(chat_id: int, text: str, context: ContextTypes.DE
                 chat_id=chat_id,
                 text=text
             )
-            logger.info(f"Successfully sent fallback message to channel {chat_id}")
+            logger.info("Successfully sent fallback message to channel %s", chat_id)
             return True
         except Exception as fallback_error:
-            logger.error(f"Failed to send fallback message: {fallback_error}")
+            logger.error("Failed to send fallback message: %s", fallback_error)
             return False
             
     except Exception as e:
-        logger.error(f"Unexpected error in safe_send_to_channel: {e}")
+        logger.error("Unexpected error in safe_send_to_channel: %s", e)
         return False
 
 
@@ -257,7 +290,7 @@ async def forward_message_to_channel(
         )
         return forwarded.message_id
     except Exception as e:
-        logger.error(f"Error forwarding message: {e}")
+        logger.error("Error forwarding message: %s", e)
         return None
 
 
@@ -272,7 +305,7 @@ async def send_media_to_channel(
         # Check bot permissions first
         permissions = await check_bot_channel_permissions(channel_id, context)
         if permissions['error'] or not permissions['can_post_messages']:
-            logger.error(f"Cannot send media to channel {channel_id}: {permissions.get('error', 'No permissions')}")
+            logger.error("Cannot send media to channel %s: %s", channel_id, permissions.get('error', 'No permissions'))
             return False
 
         # Determine media type and send accordingly
@@ -285,7 +318,7 @@ async def send_media_to_channel(
                 caption=caption[:1024] if caption else None,  # Telegram caption limit
                 parse_mode=None  # No parse mode for media captions to avoid issues
             )
-            logger.info(f"Successfully sent photo to channel {channel_id}")
+            logger.info("Successfully sent photo to channel %s", channel_id)
             return True
 
         elif hasattr(message, 'video') and message.video:
@@ -295,7 +328,7 @@ async def send_media_to_channel(
                 caption=caption[:1024] if caption else None,
                 parse_mode=None
             )
-            logger.info(f"Successfully sent video to channel {channel_id}")
+            logger.info("Successfully sent video to channel %s", channel_id)
             return True
 
         elif hasattr(message, 'document') and message.document:
@@ -305,7 +338,7 @@ async def send_media_to_channel(
                 caption=caption[:1024] if caption else None,
                 parse_mode=None
             )
-            logger.info(f"Successfully sent document to channel {channel_id}")
+            logger.info("Successfully sent document to channel %s", channel_id)
             return True
 
         elif hasattr(message, 'audio') and message.audio:
@@ -315,7 +348,7 @@ async def send_media_to_channel(
                 caption=caption[:1024] if caption else None,
                 parse_mode=None
             )
-            logger.info(f"Successfully sent audio to channel {channel_id}")
+            logger.info("Successfully sent audio to channel %s", channel_id)
             return True
 
         elif hasattr(message, 'voice') and message.voice:
@@ -325,7 +358,7 @@ async def send_media_to_channel(
                 caption=caption[:1024] if caption else None,
                 parse_mode=None
             )
-            logger.info(f"Successfully sent voice message to channel {channel_id}")
+            logger.info("Successfully sent voice message to channel %s", channel_id)
             return True
 
         else:
@@ -333,5 +366,5 @@ async def send_media_to_channel(
             return False
 
     except Exception as e:
-        logger.error(f"Error sending media to channel {channel_id}: {e}")
+        logger.error("Error sending media to channel %s: %s", channel_id, e)
         return False
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+JSON decoding for webhook updates and Bot API responses
+Uses orjson when it is installed and falls back to the standard library otherwise
+"""
+
+import json
+from typing import Any, Union
+from telegram.request import HTTPXRequest
+
+try:
+    # Optional fast JSON parser (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON, raising json.JSONDecodeError on invalid input (orjson's error subclasses it)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONRequest(HTTPXRequest):
+    """HTTPXRequest that parses Bot API responses with orjson when available"""
+
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> Any:
+        if orjson is not None:
+            try:
+                return orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                # Let the default parser decode invalid UTF-8 leniently and raise PTB's error
+                pass
+        return HTTPXRequest.parse_json_payload(payload)
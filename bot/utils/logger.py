@@ -2,10 +2,17 @@
 Logging configuration for the Telegram bot
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+from typing import Optional
 from bot.utils.config import Config
 
+# Background listener that writes queued log records, see setup_logging()
+_listener: Optional[logging.handlers.QueueListener] = None
+
 
 def setup_logging() -> None:
     """Setup logging configuration"""
@@ -15,14 +22,24 @@ def setup_logging() -> None:
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
-    # Configure root logger
+    global _listener
+    if _listener is not None:
+        return
+
+    # Console handler only; it is driven by the queue listener thread so that
+    # writing log lines never blocks the event loop
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    # Configure root logger to only enqueue records
     logging.basicConfig(
         level=getattr(logging, Config.LOG_LEVEL.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            # Console handler only
-            logging.StreamHandler()
-        ]
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
     
     # Set specific logger levels
@@ -31,6 +48,14 @@ def setup_logging() -> None:
     logging.getLogger('mysql.connector').setLevel(logging.WARNING)
 
 
+def stop_logging() -> None:
+    """Flush queued log records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance with the specified name"""
     return logging.getLogger(name)
\ No newline at end of file
@@ -16,6 +16,7 @@ import json
 # Import bot modules
 from bot.utils.logger import setup_logging
 from bot.utils.config import Config
+from bot.utils import json_codec
 from bot.handlers.commands import (
     start_command,
     chats_command,
@@ -37,9 +38,11 @@ from bot.handlers.commands import (
     remove_moderator_callback,
     confirm_remove_moderator_callback,
     handle_moderator_id_input,
-    moderator_info_callback
+    Op,
+    moderator_info_callback,
+    outdated_button_callback
 )
-from bot.handlers.messages import handle_edited_message, handle_new_chat_members
+from bot.handlers.messages import handle_edited_message, handle_new_chat_members, shutdown_edit_workers
 from bot.handlers.status import handle_my_chat_member
 
 
@@ -61,6 +64,9 @@ class CustomForwardedFilter(filters.BaseFilter):
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Seconds to let queued edited messages finish during shutdown
+EDIT_DRAIN_TIMEOUT = 30
+
 
 class TelegramBot:
     """Main bot class with webhook support"""
@@ -71,7 +77,17 @@ class TelegramBot:
         Config.validate()
         
         # Create application without updater for webhook mode
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).updater(None).build()
+        # (Bot API responses are parsed with orjson when it is installed)
+        self.application = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .updater(None)
+            .request(json_codec.FastJSONRequest(connection_pool_size=256))
+            # Webhook updates go through update_queue; keep handling them concurrently
+            .concurrent_updates(True)
+            .build()
+        )
+        self._stopped = False
         
         # Register handlers
         self._register_handlers()
@@ -96,15 +112,15 @@ class TelegramBot:
             CommandHandler("chats", chats_command, filters.ChatType.PRIVATE)
         )
         
-        # Callback query handlers
+        # Callback query handlers (anchored patterns: malformed callback data never dispatches)
         self.application.add_handler(
-            CallbackQueryHandler(setup_chat_callback, pattern="^setup_chat_")
+            CallbackQueryHandler(setup_chat_callback, pattern=rf"^{Op.SETUP_CHAT}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(setup_channel_callback, pattern="^setup_channel_")
+            CallbackQueryHandler(setup_channel_callback, pattern=rf"^{Op.SETUP_CHANNEL}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(toggle_delete_callback, pattern="^toggle_delete_")
+            CallbackQueryHandler(toggle_delete_callback, pattern=rf"^{Op.TOGGLE_DELETE}:-?\d+$")
         )
         self.application.add_handler(
             CallbackQueryHandler(back_to_chats_callback, pattern="^back_to_chats$")
@@ -116,35 +132,38 @@ class TelegramBot:
             CallbackQueryHandler(help_callback, pattern="^help$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(set_edit_time_callback, pattern="^set_edit_time_")
+            CallbackQueryHandler(set_edit_time_callback, pattern=rf"^{Op.SET_EDIT_TIME}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(set_time_callback, pattern="^set_time_")
+            CallbackQueryHandler(set_time_callback, pattern=rf"^{Op.SET_TIME}:-?\d+:\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(custom_time_callback, pattern="^custom_time_")
+            CallbackQueryHandler(custom_time_callback, pattern=rf"^{Op.CUSTOM_TIME}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(manage_moderators_callback, pattern="^manage_moderators_")
+            CallbackQueryHandler(manage_moderators_callback, pattern=rf"^{Op.MANAGE_MODERATORS}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(add_moderator_options_callback, pattern="^add_moderator_options_")
+            CallbackQueryHandler(add_moderator_options_callback, pattern=rf"^{Op.ADD_MODERATOR_OPTIONS}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(add_moderator_manual_callback, pattern="^add_moderator_manual_")
+            CallbackQueryHandler(add_moderator_manual_callback, pattern=rf"^{Op.ADD_MODERATOR_MANUAL}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(add_moderator_forward_callback, pattern="^add_moderator_forward_")
+            CallbackQueryHandler(add_moderator_forward_callback, pattern=rf"^{Op.ADD_MODERATOR_FORWARD}:-?\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(remove_moderator_callback, pattern="^remove_moderator_")
+            CallbackQueryHandler(remove_moderator_callback, pattern=rf"^{Op.REMOVE_MODERATOR}:-?\d+:\d+$")
         )
         self.application.add_handler(
-            CallbackQueryHandler(confirm_remove_moderator_callback, pattern="^confirm_remove_moderator_")
+            CallbackQueryHandler(confirm_remove_moderator_callback, pattern=rf"^{Op.CONFIRM_REMOVE_MODERATOR}:-?\d+:\d+$")
         )
         self.application.add_handler(
             CallbackQueryHandler(moderator_info_callback, pattern="^moderator_info$")
         )
+        # Anything left (e.g. buttons sent before the callback layout changed) is answered
+        # as outdated so the client spinner stops; must stay the last callback handler
+        self.application.add_handler(CallbackQueryHandler(outdated_button_callback))
 
         # Unified handler for forwarded messages (private chats)
         # Handles both channel setup and moderator addition
@@ -217,8 +236,8 @@ class TelegramBot:
                 
                 # Parse JSON
                 try:
-                    data = json.loads(body.decode('utf-8'))
-                    logger.debug(f"Received webhook data: {data}")
+                    data = json_codec.loads(body)
+                    logger.debug("Received webhook data: %s", data)
                 except json.JSONDecodeError:
                     logger.error("Failed to parse webhook JSON")
                     raise HTTPException(status_code=400, detail="Invalid JSON")
@@ -231,22 +250,23 @@ class TelegramBot:
                 
                 # Log update type for debugging
                 if update.edited_message:
-                    logger.info(f"Received edited_message update for chat {update.edited_message.chat.id}")
+                    logger.info("Received edited_message update for chat %s", update.edited_message.chat.id)
                 elif update.message:
-                    logger.info(f"Received message update for chat {update.message.chat.id}")
+                    logger.info("Received message update for chat %s", update.message.chat.id)
                     # Log forwarded message details
                     if hasattr(update.message, 'api_kwargs') and 'forward_origin' in update.message.api_kwargs:
-                        logger.info(f"Forwarded message detected with forward_origin in api_kwargs")
+                        logger.info("Forwarded message detected with forward_origin in api_kwargs")
                     elif hasattr(update.message, 'forward_from_chat'):
-                        logger.info(f"Forwarded message detected with forward_from_chat")
+                        logger.info("Forwarded message detected with forward_from_chat")
                 
-                # Process update
-                await self.application.process_update(update)
+                # Hand the update to the application and acknowledge right away, so
+                # Telegram does not wait for the handlers before sending the next update
+                await self.application.update_queue.put(update)
                 
                 return {"status": "ok"}
                 
             except Exception as e:
-                logger.error(f"Error processing webhook: {e}")
+                logger.error("Error processing webhook: %s", e)
                 raise HTTPException(status_code=500, detail="Internal server error")
         
         @self.app.get("/health")
@@ -262,6 +282,7 @@ class TelegramBot:
             # Initialize database async pool
             from bot.database.database import db
             await db.create_async_pool()
+            await db.load_chat_settings_async()
 
             # Initialize application
             await self.application.initialize()
@@ -274,7 +295,7 @@ class TelegramBot:
                 allowed_updates=['message', 'edited_message', 'callback_query', 'my_chat_member']
             )
             
-            logger.info(f"Webhook set to: {webhook_url}")
+            logger.info("Webhook set to: %s", webhook_url)
             logger.info("Bot started successfully")
             
             # Start FastAPI server with concurrency support
@@ -299,33 +320,40 @@ class TelegramBot:
             await server.serve()
             
         except Exception as e:
-            logger.error(f"Error starting bot: {e}")
+            logger.error("Error starting bot: %s", e)
             raise
     
-    async def stop(self):
-        """Stop the bot gracefully"""
-        logger.info("Stopping bot...")
-
-        # Close database connections
+    async def _close_database(self) -> None:
+        """Close database connections once pending updates and queued edits are done"""
         try:
             from bot.database.database import db
-            if db.pool:
-                db.pool.close()
-                await db.pool.wait_closed()
-                logger.info("Database connections closed")
+            await db.close_async()
         except Exception as e:
-            logger.error(f"Error closing database connections: {e}")
+            logger.error("Error closing database connections: %s", e)
 
-        # Delete webhook
+    async def stop(self):
+        """Stop the bot gracefully (safe to call more than once)"""
+        if self._stopped:
+            return
+        self._stopped = True
+        logger.info("Stopping bot...")
+
+        # Delete webhook first so no new updates arrive while shutting down
         try:
             await self.application.bot.delete_webhook()
             logger.info("Webhook deleted")
         except Exception as e:
-            logger.error(f"Error deleting webhook: {e}")
+            logger.error("Error deleting webhook: %s", e)
 
-        # Stop application
-        await self.application.stop()
+        # Stop application (waits for running handlers), then let queued edits finish
+        # while the bot can still make requests
+        if self.application.running:
+            await self.application.stop()
+        await shutdown_edit_workers(EDIT_DRAIN_TIMEOUT)
         await self.application.shutdown()
+
+        # post_shutdown hooks only run under run_polling/run_webhook, so close explicitly
+        await self._close_database()
         logger.info("Bot stopped")
 
 
@@ -335,7 +363,7 @@ async def main():
     
     # Setup signal handlers for graceful shutdown
     def signal_handler(signum, frame):
-        logger.info(f"Received signal {signum}, shutting down...")
+        logger.info("Received signal %s, shutting down...", signum)
         asyncio.create_task(bot.stop())
     
     signal.signal(signal.SIGINT, signal_handler)
@@ -346,7 +374,7 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
         sys.exit(1)
     finally:
         await bot.stop()
@@ -0,0 +1,194 @@
+"""
+Test script for the in-process TTL cache and per-key locks
+"""
+
+import asyncio
+import time
+
+from bot.utils.cache import KeyedLock, TTLCache, cached
+
+
+def test_hit_and_miss():
+    """Test that a stored value is returned until it is missing"""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    cache['a'] = 1
+    assert cache.get('a') == 1
+    assert 'a' in cache
+    assert cache.hits == 1 and cache.misses == 2
+
+    # Cached falsy values are hits, not misses
+    cache['none'] = None
+    assert cache.get('none', 'default') is None
+
+    print("✅ test_hit_and_miss passed")
+
+
+def test_expiry():
+    """Test that entries expire after the TTL"""
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache['a'] = 1
+    time.sleep(0.02)
+
+    assert 'a' not in cache
+    assert cache.get('a', 'expired') == 'expired'
+    assert len(cache) == 0
+
+    print("✅ test_expiry passed")
+
+
+def test_eviction():
+    """Test that the oldest entry is evicted when the cache is full"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache['a'] = 1
+    cache['b'] = 2
+    cache['c'] = 3
+
+    assert 'a' not in cache
+    assert cache.get('b') == 2 and cache.get('c') == 3
+
+    print("✅ test_eviction passed")
+
+
+def test_invalidation():
+    """Test pop, discard_where and clear, and that get_or_load reloads afterwards"""
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        return f"value-{len(calls)}"
+
+    async def run():
+        cache = TTLCache(maxsize=10, ttl=60)
+        assert await cache.get_or_load(('chat', 1), loader, 1) == 'value-1'
+        assert await cache.get_or_load(('chat', 1), loader, 1) == 'value-1'
+
+        assert cache.pop(('chat', 1)) == 'value-1'
+        assert await cache.get_or_load(('chat', 1), loader, 1) == 'value-2'
+
+        cache[('chat', 2)] = 'other'
+        assert cache.discard_where(lambda key, _: key[1] == 1) == 1
+        assert ('chat', 1) not in cache and ('chat', 2) in cache
+
+        cache.clear()
+        assert len(cache) == 0
+
+    asyncio.run(run())
+    assert calls == [1, 1]
+
+    print("✅ test_invalidation passed")
+
+
+def test_concurrent_loads_share_one_call():
+    """Test that concurrent misses for one key run the loader once and release the lock"""
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'loaded'
+
+    async def run():
+        cache = TTLCache(maxsize=10, ttl=60)
+        results = await asyncio.gather(*(cache.get_or_load('key', loader) for _ in range(10)))
+        assert results == ['loaded'] * 10
+        assert len(cache._load_locks) == 0
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+    print("✅ test_concurrent_loads_share_one_call passed")
+
+
+def test_errors_are_not_cached():
+    """Test that a failed load is retried by the next caller"""
+    attempts = []
+
+    async def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database unavailable")
+        return 'loaded'
+
+    async def run():
+        cache = TTLCache(maxsize=10, ttl=60)
+        try:
+            await cache.get_or_load('key', loader)
+            assert False, "expected RuntimeError"
+        except RuntimeError:
+            pass
+        assert 'key' not in cache
+        assert await cache.get_or_load('key', loader) == 'loaded'
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+
+    print("✅ test_errors_are_not_cached passed")
+
+
+def test_keyed_lock_keeps_lock_for_queued_waiters():
+    """Test that a caller arriving while others wait shares their lock, and the entry is dropped after"""
+    locks = KeyedLock()
+    active = []
+    max_active = []
+    late = []
+
+    async def worker(spawn_late=False):
+        async with locks('key'):
+            active.append(1)
+            max_active.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+        if spawn_late:
+            # Released, but the queued second worker has not resumed yet
+            late.append(asyncio.create_task(worker()))
+
+    async def run():
+        first = asyncio.create_task(worker(spawn_late=True))
+        second = asyncio.create_task(worker())
+        await asyncio.gather(first, second)
+        await asyncio.gather(*late)
+        assert len(locks) == 0
+
+    asyncio.run(run())
+    assert max(max_active) == 1
+
+    print("✅ test_keyed_lock_keeps_lock_for_queued_waiters passed")
+
+
+def test_cached_decorator():
+    """Test that @cached stores a method's result under the computed key"""
+    class Repository:
+        def __init__(self):
+            self._cache = TTLCache(maxsize=10, ttl=60)
+            self.calls = 0
+
+        @cached('_cache', key=lambda user_id: ('user', user_id))
+        async def load(self, user_id):
+            self.calls += 1
+            return user_id * 2
+
+    async def run():
+        repository = Repository()
+        assert await repository.load(3) == 6
+        assert await repository.load(3) == 6
+        assert repository.calls == 1
+        assert repository._cache.get(('user', 3)) == 6
+
+    asyncio.run(run())
+
+    print("✅ test_cached_decorator passed")
+
+
+if __name__ == "__main__":
+    test_hit_and_miss()
+    test_expiry()
+    test_eviction()
+    test_invalidation()
+    test_concurrent_loads_share_one_call()
+    test_errors_are_not_cached()
+    test_keyed_lock_keeps_lock_for_queued_waiters()
+    test_cached_decorator()
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,77 @@
+"""
+Test script for callback data parsing
+"""
+
+from bot.handlers.commands import CB_OPS, CallbackData, Op, parse_cb, parse_chat_cb
+
+
+def test_parse_valid_callback_data():
+    """Test parsing callback data with and without an argument"""
+    assert parse_cb(f"{Op.SETUP_CHAT}:-1003008079966") == CallbackData(Op.SETUP_CHAT, -1003008079966, None)
+    assert parse_cb(f"{Op.SET_TIME}:-100123:5") == CallbackData(Op.SET_TIME, -100123, 5)
+    assert parse_cb(f"{Op.REMOVE_MODERATOR}:-100123:415409454") == CallbackData(Op.REMOVE_MODERATOR, -100123, 415409454)
+
+    # Every opcode round-trips
+    for op in CB_OPS:
+        assert parse_cb(f"{op}:-1:2") == CallbackData(op, -1, 2)
+
+    print("✅ test_parse_valid_callback_data passed")
+
+
+def test_parse_missing_arg():
+    """Test that callback data without an argument parses with arg None"""
+    cb = parse_cb(f"{Op.SET_TIME}:-100123")
+    assert cb is not None
+    assert cb.arg is None
+
+    cb = parse_chat_cb(f"{Op.CONFIRM_REMOVE_MODERATOR}:-100123")
+    assert cb is not None
+    assert cb.chat_id == -100123 and cb.arg is None
+
+    print("✅ test_parse_missing_arg passed")
+
+
+def test_parse_malformed_callback_data():
+    """Test that malformed or outdated callback data is rejected"""
+    malformed = [
+        "",
+        ":",
+        Op.SETUP_CHAT,
+        f"{Op.SETUP_CHAT}:",
+        f"{Op.SETUP_CHAT}:abc",
+        f"{Op.SETUP_CHAT}:-1.5",
+        f"{Op.SET_TIME}:-100123:",
+        f"{Op.SET_TIME}:-100123:five",
+        f"{Op.SET_TIME}:-100123:5:6",
+        "XX:-100123",
+        "sc:-100123",
+        # Layout used before opcodes
+        "setup_chat_-100123",
+        "manage_moderators_-100123",
+        "set_time_-100123_5",
+        "back_to_chats",
+    ]
+    for data in malformed:
+        assert parse_cb(data) is None, f"parse_cb({data!r}) should be None"
+        assert parse_chat_cb(data) is None, f"parse_chat_cb({data!r}) should be None"
+
+    print("✅ test_parse_malformed_callback_data passed")
+
+
+def test_parse_chat_cb_rejects_non_group_chat_ids():
+    """Test that parse_chat_cb only accepts negative (group) chat ids"""
+    for data in [f"{Op.SETUP_CHAT}:415409454", f"{Op.SETUP_CHAT}:0", f"{Op.SET_TIME}:415409454:5"]:
+        assert parse_cb(data) is not None
+        assert parse_chat_cb(data) is None, f"parse_chat_cb({data!r}) should be None"
+
+    assert parse_chat_cb(f"{Op.SET_TIME}:-100123:5") == CallbackData(Op.SET_TIME, -100123, 5)
+
+    print("✅ test_parse_chat_cb_rejects_non_group_chat_ids passed")
+
+
+if __name__ == "__main__":
+    test_parse_valid_callback_data()
+    test_parse_missing_arg()
+    test_parse_malformed_callback_data()
+    test_parse_chat_cb_rejects_non_group_chat_ids()
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,66 @@
+"""
+Test script for binding a chat to a channel from a forwarded message
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from test_settings_invalidation import CHANNEL_ID, CHAT_ID, FakePool, make_manager
+
+from bot.handlers import commands
+
+
+def run_channel_setup(pool):
+    """Forward a channel post for the selected chat and return the texts the bot replied with"""
+    manager = make_manager(pool)
+    message = SimpleNamespace(
+        api_kwargs={
+            'forward_origin': {
+                'type': 'channel',
+                'chat': {'id': CHANNEL_ID, 'title': 'тест канал', 'type': 'channel'},
+                'message_id': 14,
+                'date': 1758436066
+            }
+        },
+        reply_text=mock.AsyncMock(),
+    )
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=415409454), message=message)
+    context = SimpleNamespace(bot=object(), user_data={'selected_chat_id': CHAT_ID, 'waiting_for_channel': True})
+
+    with mock.patch.object(commands, 'db', manager), \
+            mock.patch.object(commands, 'is_bot_admin', mock.AsyncMock(return_value=True)):
+        asyncio.run(commands._handle_channel_setup_internal(update, context))
+
+    assert 'selected_chat_id' not in context.user_data
+    return [call.args[0] for call in message.reply_text.await_args_list], manager
+
+
+def test_successful_bind_sends_only_confirmation():
+    """Test that a bind that succeeds is confirmed once, without a correction"""
+    replies, manager = run_channel_setup(FakePool())
+
+    assert len(replies) == 1
+    assert replies[0].startswith("✅ **Настройка завершена!**")
+    assert any(sql.startswith("INSERT INTO chat_channel_bindings") for sql in manager.pool.executed)
+    assert CHAT_ID not in manager._chat_settings
+
+    print("✅ test_successful_bind_sends_only_confirmation passed")
+
+
+def test_failed_bind_sends_correction():
+    """Test that the correction follows the confirmation only when the bind fails"""
+    replies, manager = run_channel_setup(FakePool(error=RuntimeError("database unavailable")))
+
+    assert len(replies) == 2
+    assert replies[0].startswith("✅ **Настройка завершена!**")
+    assert replies[1].startswith("❌ Произошла ошибка при сохранении настроек")
+    assert CHAT_ID in manager._chat_settings
+
+    print("✅ test_failed_bind_sends_correction passed")
+
+
+if __name__ == "__main__":
+    test_successful_bind_sends_only_confirmation()
+    test_failed_bind_sends_correction()
+    print("\n🎉 All tests passed!")